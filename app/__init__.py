@@ -7,12 +7,18 @@ __version__ = '1.0.0'
 __author__ = 'QUANTUM MIND Team'
 __description__ = 'Advanced AI Research Assistant powered by Google Gemini'
 
+import os
+
 from flask import Flask, render_template
 from flask_cors import CORS
 
+from .compression import StaticAssets, StaticShell, init_compression
+from .metrics import init_metrics
+
 def create_app(config=None):
     """Factory function pour créer l'application Flask"""
-    app = Flask(__name__, template_folder='templates', static_folder='static')
+    # /static is served by StaticAssets below, with content-hashed file names
+    app = Flask(__name__, template_folder='templates', static_folder=None)
     
     # Configuration
     if config:
@@ -31,11 +37,39 @@ def create_app(config=None):
     # CORS
     CORS(app)
     
+    # gzip/brotli for API responses and exports
+    init_compression(app)
+    
+    # Request timing and the Prometheus /metrics endpoint
+    init_metrics(app)
+    
+    # Assets and the shell are read, hashed and compressed once, except when templates reload
+    static_dir = os.path.join(app.root_path, 'static')
+    reload = app.debug or app.config.get('TEMPLATES_AUTO_RELOAD')
+    assets = None if reload else StaticAssets(static_dir)
+    
+    def get_assets():
+        return assets or StaticAssets(static_dir)
+    
+    app.jinja_env.globals['asset_url'] = lambda name: get_assets().url(name)
+    
+    @app.route('/static/<path:filename>')
+    def static(filename):
+        """Serve a static file, immutable when requested by its fingerprinted name"""
+        return get_assets().response(filename)
+    
+    shell = None
+    if not reload:
+        with app.app_context():
+            shell = StaticShell.render('index.html')
+    
     # Serve main page
     @app.route('/')
     def index():
         """Serve the main application page"""
-        return render_template('index.html')
+        if shell is None:
+            return render_template('index.html')
+        return shell.response()
     
     # Enregistrer les blueprints (routes)
     # from app.routes import api_bp
@@ -0,0 +1,144 @@
+"""
+Admission control for chat turns in QUANTUM MIND
+
+Caps the number of chat turns running at once, per user and for the whole
+process, with a short bounded queue in front. Requests that cannot get a
+slot in time are rejected straight away so the route can answer 429 with
+a Retry-After hint instead of piling up upstream tool and Gemini calls.
+"""
+
+import math
+import os
+import threading
+import time
+
+from .metrics import ADMISSION_DECISIONS
+
+CHAT_MAX_IN_FLIGHT = int(os.getenv('CHAT_MAX_IN_FLIGHT', '16'))
+CHAT_MAX_IN_FLIGHT_PER_USER = int(os.getenv('CHAT_MAX_IN_FLIGHT_PER_USER', '2'))
+CHAT_ADMISSION_QUEUE = int(os.getenv('CHAT_ADMISSION_QUEUE', '16'))
+CHAT_ADMISSION_TIMEOUT = float(os.getenv('CHAT_ADMISSION_TIMEOUT', '2'))
+
+
+class AdmissionRejected(Exception):
+    """No slot was available; ``retry_after`` is a hint in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-user and global in-flight limits with a bounded wait queue"""
+
+    def __init__(self, max_in_flight=CHAT_MAX_IN_FLIGHT, max_per_user=CHAT_MAX_IN_FLIGHT_PER_USER,
+                 max_queue=CHAT_ADMISSION_QUEUE, queue_timeout=CHAT_ADMISSION_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._per_user = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {'user_limit': 0, 'queue_full': 0, 'timeout': 0}
+        self.max_queued_seen = 0
+        # Moving average of turn duration, used for Retry-After
+        self._avg_turn_seconds = 5.0
+
+    def _has_slot(self, user_id):
+        return (
+            self.in_flight < self.max_in_flight
+            and self._per_user.get(user_id, 0) < self.max_per_user
+        )
+
+    def _retry_after(self):
+        waves = (self.queued + 1) / max(self.max_in_flight, 1)
+        return max(1, min(60, math.ceil(self._avg_turn_seconds * max(waves, 1))))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        ADMISSION_DECISIONS.inc(outcome=reason)
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def acquire(self, user_id, timeout=None, wait_for_user=False):
+        """Take a slot for ``user_id``, waiting in the queue up to ``timeout``
+
+        Raises AdmissionRejected when the user already has too many turns
+        queued or running, the queue is full, or the wait times out. With
+        ``wait_for_user`` a user at their limit queues for one of their own
+        slots instead of being rejected (used by batch items).
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._cond:
+            if self._has_slot(user_id):
+                self._admit(user_id)
+                return
+
+            if not wait_for_user and self._per_user.get(user_id, 0) >= self.max_per_user:
+                self._reject('user_limit')
+            if self.queued >= self.max_queue or timeout <= 0:
+                self._reject('queue_full')
+
+            self.queued += 1
+            self.max_queued_seen = max(self.max_queued_seen, self.queued)
+            deadline = time.monotonic() + timeout
+            try:
+                while not self._has_slot(user_id):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('timeout')
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self._admit(user_id)
+
+    def _admit(self, user_id):
+        self.in_flight += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self.admitted += 1
+        ADMISSION_DECISIONS.inc(outcome='admitted')
+
+    def release(self, user_id, duration=None):
+        """Give back a slot; ``duration`` (seconds) feeds the Retry-After estimate"""
+        with self._cond:
+            self.in_flight -= 1
+            remaining = self._per_user.get(user_id, 1) - 1
+            if remaining > 0:
+                self._per_user[user_id] = remaining
+            else:
+                self._per_user.pop(user_id, None)
+            if duration is not None:
+                self._avg_turn_seconds += 0.2 * (duration - self._avg_turn_seconds)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Current occupancy and counters, for monitoring and sizing"""
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'users_in_flight': len(self._per_user),
+                'max_in_flight': self.max_in_flight,
+                'max_per_user': self.max_per_user,
+                'max_queue': self.max_queue,
+                'max_queued_seen': self.max_queued_seen,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'avg_turn_seconds': round(self._avg_turn_seconds, 3),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Return the process-wide chat admission controller"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
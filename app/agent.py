@@ -1,5 +1,7 @@
 """Agent management utilities for QUANTUM MIND."""
 
+import importlib.util
+import json
 import logging
 import os
 import re
@@ -7,25 +9,98 @@ import threading
 import time
 import unicodedata
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, List
 
 try:
     import requests
 except ImportError:
     requests = None
 
-try:
-    import google.generativeai as genai
-    from google.generativeai.types import GenerationConfig
-    GENAI_AVAILABLE = True
-except ImportError:
-    genai = None
-    GenerationConfig = None
-    GENAI_AVAILABLE = False
+from .metrics import CACHE_REQUESTS, GEMINI_REQUESTS, GEMINI_TOKENS, TOOL_CALLS, TOOL_SECONDS, record_job_run
+from .tracing import span
+
+
+def _module_available(name: str) -> bool:
+    """Whether ``name`` can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+# The Gemini SDK (grpc, protobuf) is the slowest import of the app, so it is
+# only imported on the first model call, see _load_genai()
+genai = None
+GenerationConfig = None
+GENAI_AVAILABLE = _module_available('google.generativeai')
+_genai_lock = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
 
+def _load_genai():
+    """Import the Gemini SDK on first use; None when it is not installed"""
+    global genai, GenerationConfig, GENAI_AVAILABLE
+    with _genai_lock:
+        if genai is None and GENAI_AVAILABLE:
+            try:
+                import google.generativeai as module
+                from google.generativeai.types import GenerationConfig as config_class
+            except ImportError:
+                GENAI_AVAILABLE = False
+            else:
+                genai, GenerationConfig = module, config_class
+    return genai
+
+
+class ToolLookupScope:
+    """Share identical upstream lookups between concurrent chat turns
+
+    Inside a scope (see ``use_lookup_scope``) every HTTP lookup made by the
+    tools is keyed by URL and parameters; the first caller fetches, later
+    or concurrent callers with the same key get the same response.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._results: Dict[Hashable, Future] = {}
+        self.requested = 0
+        self.deduplicated = 0
+
+    def fetch(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.requested += 1
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+            else:
+                self.deduplicated += 1
+
+        if owner:
+            try:
+                future.set_result(load())
+            except Exception as exc:  # noqa: BLE001 - re-raised to every caller below
+                future.set_exception(exc)
+        return future.result()
+
+
+_lookup_scope: ContextVar[ToolLookupScope | None] = ContextVar('quantum_mind_lookup_scope', default=None)
+
+
+@contextmanager
+def use_lookup_scope(scope: ToolLookupScope):
+    """Route this thread's tool lookups through ``scope``."""
+    token = _lookup_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _lookup_scope.reset(token)
+
+
 class QuantumMindAgent:
     """AI Agent with tool selection and search capabilities."""
 
@@ -78,9 +153,8 @@ class QuantumMindAgent:
             {'model': 'Qwen2.5-72B-Instruct', 'size': '72B', 'mt_bench': 8.41, 'mmlu': 85.3, 'source': 'Alibaba', 'date': '2024-09', 'link': 'https://qwenlm.github.io/blog/qwen2.5/', 'aliases': {'qwen2.5-72b', 'qwen-72b'}},
         ]
         
-        # Configure Google AI if available
-        if GENAI_AVAILABLE and self.api_key:
-            genai.configure(api_key=self.api_key)
+        # Google AI is configured on the first model call, see chat()
+        self._genai_configured = False
         
         # Build tool configurations
         self.tool_configs = self._build_tool_configs()
@@ -357,12 +431,21 @@ class QuantumMindAgent:
         return {name: enabled for name, enabled in self.tools_enabled.items() if enabled}
 
     def chat(self, messages: List[Dict[str, Any]], session_id: str | None = None) -> Dict[str, Any]:
-        """Generate a response from the configured model given conversation history."""
+        """Generate a response from the configured model given conversation history.
 
-        search_context = self._maybe_search(messages)
+        The result carries a ``timings`` dict (seconds): ``tools`` for the
+        whole tool phase, ``tool_calls`` per executed tool and ``llm`` for
+        the model call when one was made.
+        """
+
+        timings: Dict[str, Any] = {'tool_calls': {}}
+        tools_started = time.perf_counter()
+        with span('agent.tools'):
+            search_context = self._maybe_search(messages, timings['tool_calls'])
+        timings['tools'] = time.perf_counter() - tools_started
 
         # Provide a graceful fallback when GenAI SDK or API key is absent
-        if not GENAI_AVAILABLE or not self.api_key:
+        if not self.api_key or _load_genai() is None:
             fallback = self._generate_offline_reply(messages)
             if search_context:
                 fallback = f"{fallback}\n\n{self._strip_markdown_links(search_context)}"
@@ -370,10 +453,14 @@ class QuantumMindAgent:
                 'content': fallback,
                 'tokens_used': len(fallback.split()),
                 'model': self.model,
+                'timings': timings,
             }
 
         try:
-            model = genai.GenerativeModel(self.model)  # type: ignore[attr-defined]
+            if not self._genai_configured:
+                genai.configure(api_key=self.api_key)  # type: ignore[union-attr]
+                self._genai_configured = True
+            model = genai.GenerativeModel(self.model)  # type: ignore[union-attr]
 
             request_messages = []
             for message in messages:
@@ -394,10 +481,19 @@ class QuantumMindAgent:
                 temperature=self.temperature,
             ) if GenerationConfig else None
 
-            response = model.generate_content(  # type: ignore[attr-defined]
-                request_messages,
-                generation_config=generation_config,
-            )
+            llm_started = time.perf_counter()
+            try:
+                with span('gemini.generate_content', model=self.model, messages=len(request_messages)):
+                    response = model.generate_content(  # type: ignore[attr-defined]
+                        request_messages,
+                        generation_config=generation_config,
+                    )
+            except Exception:
+                GEMINI_REQUESTS.inc(model=self.model, status='error')
+                raise
+            finally:
+                timings['llm'] = time.perf_counter() - llm_started
+            GEMINI_REQUESTS.inc(model=self.model, status='ok')
 
             text = (response.text or '').strip()
             if not text:
@@ -408,11 +504,13 @@ class QuantumMindAgent:
 
             usage = getattr(response, 'usage_metadata', None)
             tokens_used = getattr(usage, 'total_token_count', None) if usage else None
+            self._record_token_usage(usage)
 
             return {
                 'content': text,
                 'tokens_used': tokens_used or len(text.split()),
                 'model': self.model,
+                'timings': timings,
             }
         except Exception as exc:  # pragma: no cover - network dependent
             fallback = self._generate_offline_reply(messages)
@@ -422,8 +520,21 @@ class QuantumMindAgent:
                 'error': str(exc),
                 'content': fallback,
                 'tokens_used': len(fallback.split()),
+                'timings': timings,
             }
 
+    def _record_token_usage(self, usage: Any) -> None:
+        if not usage:
+            return
+        for kind, attribute in (
+            ('prompt', 'prompt_token_count'),
+            ('completion', 'candidates_token_count'),
+            ('total', 'total_token_count'),
+        ):
+            count = getattr(usage, attribute, None)
+            if count:
+                GEMINI_TOKENS.inc(count, model=self.model, kind=kind)
+
     def get_config(self) -> Dict[str, Any]:
         return {
             'model': self.model,
@@ -496,11 +607,36 @@ class QuantumMindAgent:
                     return candidate
         return ""
 
+    def _http_get(self, url: str, **kwargs: Any) -> Any:
+        """``requests.get`` recorded as an ``http.get`` span of the current trace.
+
+        Inside a ToolLookupScope, identical requests are made only once.
+        """
+        def load() -> Any:
+            with span('http.get', url=url) as http_span:
+                response = requests.get(url, **kwargs)
+                http_span.set('status', getattr(response, 'status_code', None))
+                return response
+
+        scope = _lookup_scope.get()
+        if scope is None:
+            return load()
+        key = (url, json.dumps(kwargs.get('params'), sort_keys=True, default=str))
+        return scope.fetch(key, load)
+
     def _strip_markdown_links(self, text: str) -> str:
         return re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)
 
-    def _maybe_search(self, messages: List[Dict[str, Any]]) -> str | None:
-        """Optionally perform external lookups and return formatted snippets."""
+    def _maybe_search(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_timings: Dict[str, float] | None = None,
+    ) -> str | None:
+        """Optionally perform external lookups and return formatted snippets.
+
+        When ``tool_timings`` is given, the duration (seconds) of each executed
+        tool is stored in it under the tool name.
+        """
 
         query = self._extract_last_user_message(messages)
         if not query:
@@ -530,15 +666,31 @@ class QuantumMindAgent:
             if predicate and not predicate():
                 continue
 
-            assessment = self._assess_tool_query(tool_name, query, normalized, tokens)
+            # Cooldowns pace one conversation; a lookup scope already dedupes a batch
+            assessment = self._assess_tool_query(
+                tool_name, query, normalized, tokens, consider_cooldown=_lookup_scope.get() is None
+            )
             if not assessment['should_run']:
                 if assessment.get('reason') == 'cooldown' and config.get('cooldown_message'):
                     if config['cooldown_message'] not in notes:
                         notes.append(config['cooldown_message'])
                 continue
 
-            raw_results = config['handler'](query)
-            formatted = config['formatter'](raw_results)
+            tool_started = time.perf_counter()
+            try:
+                with span(f'tool.{tool_name}', score=assessment.get('score')) as tool_span:
+                    raw_results = config['handler'](query)
+                    formatted = config['formatter'](raw_results)
+                    tool_span.set('results', len(raw_results) if isinstance(raw_results, (list, dict)) else None)
+            except Exception:
+                TOOL_CALLS.inc(tool=tool_name, outcome='error')
+                raise
+            finally:
+                tool_elapsed = time.perf_counter() - tool_started
+                TOOL_SECONDS.observe(tool_elapsed, tool=tool_name)
+            TOOL_CALLS.inc(tool=tool_name, outcome='ok' if formatted else 'no_data')
+            if tool_timings is not None:
+                tool_timings[tool_name] = tool_elapsed
             if formatted:
                 contexts.append(f"{config['label']}\n{formatted}")
                 self._register_tool_usage(tool_name)
@@ -594,7 +746,7 @@ class QuantumMindAgent:
             }
         
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://chat.lmsys.org/api/leaderboard',
                 timeout=10,
             )
@@ -764,7 +916,9 @@ class QuantumMindAgent:
             cached = self._result_cache[cache_key]
             if time.time() - cached['timestamp'] < self._cache_ttl:
                 logger.debug("Using cached HF results for '%s'", terms)
+                CACHE_REQUESTS.inc(cache='tool_results', result='hit')
                 return cached['data']
+        CACHE_REQUESTS.inc(cache='tool_results', result='miss')
 
         logger.debug("Hugging Face search with terms '%s' from query '%s'", terms, original_query)
 
@@ -773,7 +927,7 @@ class QuantumMindAgent:
             headers['Authorization'] = f'Bearer {self.hf_token}'
 
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://huggingface.co/api/models',
                 params={
                     'search': terms,
@@ -843,7 +997,7 @@ class QuantumMindAgent:
         logger.debug("AI benchmark search with terms '%s'", terms)
 
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://huggingface.co/api/datasets',
                 params={
                     'search': terms,
@@ -1095,7 +1249,7 @@ class QuantumMindAgent:
         # 1. GitHub Trending AI/ML repos
         try:
             # Utiliser API GitHub publique (pas besoin de token)
-            resp = requests.get(
+            resp = self._http_get(
                 'https://api.github.com/search/repositories',
                 params={
                     'q': 'machine learning OR deep learning OR artificial intelligence',
@@ -1122,7 +1276,7 @@ class QuantumMindAgent:
         
         # 2. Papers With Code - SOTA methods
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://paperswithcode.com/api/v1/papers/',
                 params={'ordering': '-stars', 'page': 1},
                 timeout=8
@@ -1145,7 +1299,7 @@ class QuantumMindAgent:
         for category in ai_categories[:3]:  # Top 3 catégories
             try:
                 search_query = f'cat:{category}'
-                resp = requests.get(
+                resp = self._http_get(
                     'https://export.arxiv.org/api/query',
                     params={
                         'search_query': search_query,
@@ -1173,7 +1327,7 @@ class QuantumMindAgent:
 
     def _perform_web_search(self, query: str) -> List[Dict[str, Any]]:
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://serpapi.com/search.json',
                 params={
                     'engine': 'google',
@@ -1521,7 +1675,7 @@ class QuantumMindAgent:
             return []
 
         try:
-            resp = requests.get(
+            resp = self._http_get(
                 'https://export.arxiv.org/api/query',
                 params={
                     'search_query': search_query,
@@ -1608,11 +1762,16 @@ def start_mt_bench_scheduler(interval_seconds: int | None = None) -> threading.T
     def _worker() -> None:
         agent = get_agent()
         while True:
+            started = time.perf_counter()
             try:
-                agent.refresh_mt_bench_cache(force=True)
+                result = agent.refresh_mt_bench_cache(force=True)
                 logger.debug('MT-Bench cache refreshed automatically')
             except Exception as exc:  # noqa: BLE001
                 logger.warning('MT-Bench auto-refresh failed: %s', exc)
+                record_job_run('mt-bench-refresh', started, error=exc)
+            else:
+                # Fetch failures are reported in the result, not raised
+                record_job_run('mt-bench-refresh', started, error=result.get('error'))
             time.sleep(interval_seconds)
 
     _mt_bench_scheduler_thread = threading.Thread(
@@ -1,88 +1,258 @@
 """
 Authentication Module for QUANTUM MIND
 Handles user registration, login, and password management
+
+Password hashing is deliberately slow and CPU-bound, so it runs on a small
+dedicated thread pool (hashlib releases the GIL while hashing) with its own
+concurrency cap and wait queue: a burst of logins can use at most
+``PASSWORD_HASH_WORKERS`` cores and never starves chat traffic. Stored
+hashes record their algorithm and cost, and are upgraded to the configured
+ones on the next successful login.
 """
 
 import hashlib
+import hmac
+import logging
+import os
 import secrets
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .database import get_db_connection, run_write
+from .metrics import PASSWORD_HASH_DECISIONS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_SECONDS, PASSWORD_HASH_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_ALGORITHM = os.getenv('PASSWORD_HASH_ALGORITHM', 'pbkdf2_sha256')
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', '100000'))
+PASSWORD_HASH_SCRYPT_N = int(os.getenv('PASSWORD_HASH_SCRYPT_N', '16384'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '32'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+# Hashes written before the format recorded its parameters: "<salt>$<hex>"
+LEGACY_ITERATIONS = 100000
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is busy and the wait queue is full"""
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p, maxmem=256 * n * r
+    ).hex()
+
 
-from .database import get_db_connection
+def _current_parameters():
+    if PASSWORD_HASH_ALGORITHM == 'scrypt':
+        return ('scrypt', PASSWORD_HASH_SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    if PASSWORD_HASH_ALGORITHM == 'pbkdf2_sha256':
+        return ('pbkdf2_sha256', PASSWORD_HASH_ITERATIONS)
+    raise ValueError(f'Unknown PASSWORD_HASH_ALGORITHM: {PASSWORD_HASH_ALGORITHM}')
+
+
+def _parse_hash(password_hash):
+    """(parameters, salt, digest) of a stored hash; parameters start with the algorithm"""
+    parts = password_hash.split('$')
+    if len(parts) == 2:
+        return ('pbkdf2_sha256', LEGACY_ITERATIONS), parts[0], parts[1]
+    if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+        return ('pbkdf2_sha256', int(parts[1])), parts[2], parts[3]
+    if parts[0] == 'scrypt' and len(parts) == 6:
+        return ('scrypt', int(parts[1]), int(parts[2]), int(parts[3])), parts[4], parts[5]
+    raise ValueError('Unrecognized password hash format')
+
+
+def _digest(parameters, password, salt):
+    if parameters[0] == 'scrypt':
+        return _scrypt(password, salt, *parameters[1:])
+    return _pbkdf2(password, salt, parameters[1])
 
 
 def hash_password(password):
-    """Hash a password with SHA256"""
+    """Hash a password with the configured algorithm and cost"""
+    parameters = _current_parameters()
     salt = secrets.token_hex(16)
-    pwdhash = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt.encode('utf-8'),
-        100000
-    )
-    return f"{salt}${pwdhash.hex()}"
+    fields = [str(value) for value in parameters] + [salt, _digest(parameters, password, salt)]
+    return '$'.join(fields)
 
 
 def verify_password(password, password_hash):
     """Verify a password against its hash"""
     try:
-        salt, pwdhash = password_hash.split('$')
-        
-        new_hash = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt.encode('utf-8'),
-            100000
-        )
-        
-        return new_hash.hex() == pwdhash
-    except:
+        parameters, salt, expected = _parse_hash(password_hash)
+        return hmac.compare_digest(_digest(parameters, password, salt), expected)
+    except (ValueError, TypeError):
+        return False
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with another algorithm, cost or format"""
+    try:
+        parameters, _, _ = _parse_hash(password_hash)
+    except ValueError:
         return False
+    return parameters != _current_parameters() or password_hash.count('$') == 1
+
+
+class PasswordHasher:
+    """Bounded thread pool running password hashing off the request threads"""
+
+    def __init__(self, max_workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_QUEUE_SIZE,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.Semaphore(max_workers + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='password-hash'
+                )
+            return self._executor
+
+    def _update(self, running=0, queued=0):
+        with self._lock:
+            self.running += running
+            self.queued += queued
+            PASSWORD_HASH_QUEUE.set(self.running, state='running')
+            PASSWORD_HASH_QUEUE.set(self.queued, state='queued')
+
+    def _call(self, submitted, func, args):
+        PASSWORD_HASH_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        self._update(running=1, queued=-1)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started, operation=func.__name__)
+            self._update(running=-1)
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and return its result
+
+        Raises PasswordHasherBusy when the pool and its queue are full, or
+        when the call does not finish within ``timeout`` seconds. A call
+        that timed out keeps its slot until the worker is done with it.
+        """
+        if not self._slots.acquire(blocking=False):
+            PASSWORD_HASH_DECISIONS.inc(outcome='rejected')
+            raise PasswordHasherBusy()
+        PASSWORD_HASH_DECISIONS.inc(outcome='admitted')
+        self._update(queued=1)
+        try:
+            future = self._get_executor().submit(self._call, time.perf_counter(), func, args)
+        except BaseException:
+            self._update(queued=-1)
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.cancel():
+                self._update(queued=-1)
+            raise PasswordHasherBusy()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """Return the process-wide password hasher"""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
+
+
+def _update_password_hash(conn, user_id, old_hash, new_hash):
+    # Only replace the hash that was verified, never a concurrent password change
+    conn.execute(
+        'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+        (new_hash, user_id, old_hash),
+    )
+
+
+def _insert_user(conn, username, password_hash):
+    """Insert a user row and return its id"""
+    cursor = conn.execute('''
+        INSERT INTO users (username, password_hash)
+        VALUES (?, ?)
+    ''', (username, password_hash))
+    return cursor.lastrowid
 
 
 def create_user(username, password):
-    """Create a new user account"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Create a new user account
+
+    Raises PasswordHasherBusy when the hashing pool is saturated.
+    """
+    password_hash = get_password_hasher().run(hash_password, password)
     
     try:
-        password_hash = hash_password(password)
-        cursor.execute('''
-            INSERT INTO users (username, password_hash)
-            VALUES (?, ?)
-        ''', (username, password_hash))
-        
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        
+        user_id = run_write(_insert_user, username, password_hash)
         return {'success': True, 'user_id': user_id, 'username': username}
     except sqlite3.IntegrityError:
-        conn.close()
         return {'success': False, 'error': 'Username already exists'}
     except Exception as e:
-        conn.close()
         return {'success': False, 'error': str(e)}
 
 
 def verify_user(username, password):
-    """Verify user credentials"""
+    """Verify user credentials
+
+    Upgrades the stored hash to the configured algorithm and cost after a
+    successful check; the upgrade is best-effort and retried on the next
+    login if it fails. Raises PasswordHasherBusy when the hashing pool is
+    saturated for the check itself.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT id, username, password_hash FROM users WHERE username = ?
+        SELECT id, username, password_hash, created_at FROM users WHERE username = ?
     ''', (username,))
     
     user = cursor.fetchone()
-    conn.close()
     
     if not user:
         return None
     
-    if verify_password(password, user[2]):
-        return {'id': user[0], 'username': user[1]}
-    
-    return None
+    hasher = get_password_hasher()
+    if not hasher.run(verify_password, password, user[2]):
+        return None
+
+    if needs_rehash(user[2]):
+        try:
+            new_hash = hasher.run(hash_password, password)
+            run_write(_update_password_hash, user[0], user[2], new_hash)
+        except (PasswordHasherBusy, sqlite3.Error) as exc:
+            logger.warning('Password hash upgrade for user %s skipped: %r', user[0], exc)
+
+    return {'id': user[0], 'username': user[1], 'created_at': user[3]}
 
 
 def get_user_by_id(user_id):
@@ -95,7 +265,6 @@ def get_user_by_id(user_id):
     ''', (user_id,))
     
     row = cursor.fetchone()
-    conn.close()
     
     return dict(row) if row else None
 
@@ -107,6 +276,5 @@ def user_exists(username):
     
     cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
     exists = cursor.fetchone() is not None
-    conn.close()
     
     return exists
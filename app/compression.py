@@ -0,0 +1,206 @@
+"""
+HTTP response compression for QUANTUM MIND
+
+Negotiates brotli (when the optional ``brotli`` package is installed) or
+gzip for responses above a size threshold, compresses streamed responses
+chunk by chunk, and serves the single-page shell and the files under
+``static/`` from bytes rendered and compressed once at startup. Static files
+are fingerprinted with a content hash so the browser can cache them forever.
+"""
+
+import functools
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import zlib
+
+from flask import Response, abort, render_template, request
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+SHELL_MAX_AGE = int(os.getenv('SHELL_MAX_AGE', '0'))
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/markdown',
+    'text/plain',
+}
+
+
+def choose_encoding(accept_encoding):
+    """Best encoding the client accepts: 'br', 'gzip' or None"""
+    if BROTLI_AVAILABLE and accept_encoding['br'] > 0:
+        return 'br'
+    if accept_encoding['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, static=False):
+    """Compress ``data`` with ``encoding``; ``static`` trades time for size"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of chunks on the fly, flushing after each one
+
+    Every input chunk produces output immediately, so streamed exports and
+    NDJSON stay incremental for the client.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = functools.partial(compressor.flush, zlib.Z_SYNC_FLUSH)
+    
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield process(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _add_vary(response):
+    if 'Accept-Encoding' not in response.vary:
+        response.vary.add('Accept-Encoding')
+
+
+def compress_response(response, min_size=None):
+    """Compress a buffered response in place when it is worth it"""
+    min_size = COMPRESS_MIN_SIZE if min_size is None else min_size
+
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    _add_vary(response)
+    if response.is_streamed:
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is not None:
+            response.response = compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+
+    data = response.get_data()
+    encoding = choose_encoding(request.accept_encodings)
+    if len(data) < min_size or encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # A strong validator must differ between representations
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+class StaticShell:
+    """A static body (the rendered index page, an asset) plus its precompressed variants"""
+
+    def __init__(self, body, mimetype='text/html'):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {None: body}
+        if mimetype in COMPRESSIBLE_MIMETYPES:
+            self.variants['gzip'] = compress(body, 'gzip', static=True)
+            if BROTLI_AVAILABLE:
+                self.variants['br'] = compress(body, 'br', static=True)
+
+    @classmethod
+    def render(cls, template='index.html'):
+        return cls(render_template(template).encode('utf-8'))
+
+    def response(self, cache_control=None):
+        """Serve the best variant for the current request, or a 304"""
+        if request.if_none_match.contains_weak(self.etag):
+            response = Response(status=304)
+        else:
+            encoding = choose_encoding(request.accept_encodings)
+            if encoding not in self.variants:
+                encoding = None
+            response = Response(self.variants[encoding], mimetype=self.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        # Weak: the same content hash covers every encoding of the body
+        response.set_etag(self.etag, weak=True)
+        response.headers['Cache-Control'] = (
+            cache_control or f'public, max-age={SHELL_MAX_AGE}, must-revalidate'
+        )
+        _add_vary(response)
+        return response
+
+
+class StaticAssets:
+    """Files of a static directory, fingerprinted by content and precompressed
+
+    ``css/app.css`` is also served as ``css/app.<hash>.css``; templates link
+    the fingerprinted name through ``url()``, which is cached as immutable.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.fingerprinted = {}
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, '/')
+                with open(path, 'rb') as handle:
+                    body = handle.read()
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                asset = StaticShell(body, mimetype)
+                stem, ext = posixpath.splitext(name)
+                hashed_name = f'{stem}.{asset.etag[:12]}{ext}'
+                self.files[name] = (hashed_name, asset)
+                self.fingerprinted[hashed_name] = asset
+
+    def url(self, name):
+        return f'/static/{self.files[name][0]}'
+
+    def response(self, filename):
+        asset = self.fingerprinted.get(filename)
+        if asset is not None:
+            return asset.response(ASSET_CACHE_CONTROL)
+        if filename in self.files:
+            # Unversioned URL: the content can change under it
+            return self.files[filename][1].response('no-cache')
+        abort(404)
+
+
+def init_compression(app):
+    """Compress eligible responses of ``app`` after each request"""
+    app.after_request(compress_response)
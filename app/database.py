@@ -4,27 +4,345 @@ Handles all SQLite database operations
 """
 
 import sqlite3
+import functools
+import html
 import json
+import logging
+import lzma
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
 import os
 
+from .latency import DEFAULT_QUANTILES, LatencySketch
+from .metrics import CACHE_REQUESTS, SQLITE_QUERY_SECONDS, record_job_run
+from .tracing import span
+
 # Database path
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'quantum_mind.db')
+DB_PATH = os.getenv('DATABASE_PATH', os.path.join(os.path.dirname(__file__), '..', 'data', 'quantum_mind.db'))
 
+# Connection tuning (applied once per connection, see _open_connection)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))
+SQLITE_STATEMENT_CACHE_SIZE = 256
 
-def get_db_connection():
-    """Get database connection"""
-    Path(os.path.dirname(DB_PATH)).mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+# Group commit: batch write transactions from concurrent requests into one commit
+SQLITE_GROUP_COMMIT = os.getenv('SQLITE_GROUP_COMMIT', 'false').lower() in ('1', 'true', 'yes')
+SQLITE_GROUP_COMMIT_MAX_BATCH = int(os.getenv('SQLITE_GROUP_COMMIT_MAX_BATCH', '64'))
+SQLITE_GROUP_COMMIT_DELAY_MS = float(os.getenv('SQLITE_GROUP_COMMIT_DELAY_MS', '2'))
+
+# Latency rollups: one quantile sketch per metric/name/model and time window
+LATENCY_WINDOW_SECONDS = int(os.getenv('LATENCY_WINDOW_SECONDS', '300'))
+# Raw latencies and sketches older than this are deleted (0 keeps everything)
+LATENCY_RETENTION_DAYS = float(os.getenv('LATENCY_RETENTION_DAYS', '30'))
+
+# Archival of cold conversations into compressed blobs (0 days disables it)
+ARCHIVE_AFTER_DAYS = float(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv('ARCHIVE_INTERVAL_SECONDS', '86400'))
+ARCHIVE_CODEC = os.getenv('ARCHIVE_CODEC', 'zlib')
+
+ARCHIVE_CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+# Read-through cache of conversation metadata (owner, model, temperature).
+# The TTL bounds staleness when several processes share the database.
+CONVERSATION_CACHE_SIZE = int(os.getenv('CONVERSATION_CACHE_SIZE', '1024'))
+CONVERSATION_CACHE_TTL = float(os.getenv('CONVERSATION_CACHE_TTL', '30'))
+
+# Finished chat jobs are kept this long for late pollers (seconds)
+CHAT_JOB_RETENTION_SECONDS = int(os.getenv('CHAT_JOB_RETENTION_SECONDS', '86400'))
+
+# Rows read per query when streaming a conversation (exports)
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '200'))
+
+# Largest SQLite rowid, used as the open upper bound for keyset pagination
+_MAX_ROWID = 2 ** 63 - 1
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationNotFound(LookupError):
+    """The conversation a write targets no longer exists"""
+
+
+# One connection per thread, reused by every helper below
+_local = threading.local()
+_prepared_dirs = set()
+
+
+def _open_connection(path):
+    """Open a new connection on path with the tuned pragmas applied"""
+    if path != ':memory:':
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory not in _prepared_dirs:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            _prepared_dirs.add(directory)
+
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+
+    # Only takes effect on a new file (or on VACUUM): freed pages can then be
+    # returned to the OS with PRAGMA incremental_vacuum after archiving
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
+    # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
     return conn
 
 
+def get_db_connection():
+    """Get the database connection owned by the current thread
+
+    The connection is opened on first use and kept for the lifetime of the
+    thread, so callers must not close it. Writes should go through
+    ``with conn:`` so they are committed or rolled back as a unit.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _open_connection(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+
+
+def close_db_connection():
+    """Close the current thread's connection, if any"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.path = None
+
+
+class GroupCommitWriter:
+    """Background thread that commits many write transactions at once
+
+    Each submitted write runs inside its own SAVEPOINT, so one failing
+    write is rolled back alone while the rest of the batch still shares a
+    single COMMIT (and a single fsync). Callers block on the returned
+    future, so a write is durable once ``submit(...).result()`` returns.
+    """
+
+    def __init__(self, max_batch=SQLITE_GROUP_COMMIT_MAX_BATCH, max_delay_ms=SQLITE_GROUP_COMMIT_DELAY_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self.commits = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._stop = object()
+        self._thread = threading.Thread(target=self._run, name='sqlite-group-commit', daemon=True)
+        self._thread.start()
+
+    @property
+    def thread(self):
+        return self._thread
+
+    def submit(self, func, *args):
+        """Queue ``func(conn, *args)`` and return a Future with its result"""
+        future = Future()
+        self._queue.put((func, args, future))
+        return future
+
+    def stop(self):
+        """Flush pending writes and stop the writer thread"""
+        self._queue.put(self._stop)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._stop:
+                break
+            
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._stop:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._commit(batch)
+            if stopping:
+                break
+        
+        close_db_connection()
+
+    def _commit(self, batch):
+        conn = get_db_connection()
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for func, args, future in batch:
+                conn.execute('SAVEPOINT group_write')
+                try:
+                    result = func(conn, *args)
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO group_write')
+                    conn.execute('RELEASE group_write')
+                    outcomes.append((future, None, exc))
+                else:
+                    conn.execute('RELEASE group_write')
+                    outcomes.append((future, result, None))
+            conn.commit()
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+        
+        self.commits += 1
+        self.writes += len(batch)
+        for future, result, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+_group_writer = None
+_group_writer_lock = threading.Lock()
+
+
+def start_group_commit_writer(**kwargs):
+    """Start (or return) the process-wide group commit writer"""
+    global _group_writer
+    with _group_writer_lock:
+        if _group_writer is None:
+            _group_writer = GroupCommitWriter(**kwargs)
+        return _group_writer
+
+
+def stop_group_commit_writer():
+    """Flush and stop the group commit writer; writes go direct again"""
+    global _group_writer
+    with _group_writer_lock:
+        writer, _group_writer = _group_writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def run_write(func, *args):
+    """Run ``func(conn, *args)`` in a write transaction and return its result
+
+    Writes go through the group commit writer when it is running (or when
+    SQLITE_GROUP_COMMIT is set), otherwise they run on this thread's
+    connection inside ``BEGIN IMMEDIATE`` so the write lock is taken up
+    front instead of failing on a read-to-write upgrade.
+    """
+    operation = func.__name__.lstrip('_')
+    started = time.perf_counter()
+    try:
+        with span('sqlite.write', operation=operation):
+            return _run_write(func, args)
+    finally:
+        SQLITE_QUERY_SECONDS.observe(time.perf_counter() - started, operation=operation, kind='write')
+
+
+def _run_write(func, args):
+    writer = _group_writer
+    if writer is None and SQLITE_GROUP_COMMIT:
+        writer = start_group_commit_writer()
+    if writer is not None and threading.current_thread() is not writer.thread:
+        return writer.submit(func, *args).result()
+    
+    conn = get_db_connection()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        return func(conn, *args)
+
+
+def _timed_read(operation):
+    """Record a read helper's duration as a metric and a trace span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with span('sqlite.read', operation=operation):
+                    return func(*args, **kwargs)
+            finally:
+                SQLITE_QUERY_SECONDS.observe(time.perf_counter() - started, operation=operation, kind='read')
+        return wrapper
+    return decorator
+
+
 def init_database():
-    """Initialize database with tables"""
+    """Initialize database with tables and bring the schema up to date
+
+    A database already at SCHEMA_VERSION costs one PRAGMA read, so every
+    entry point can call this at startup.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+    with conn:
+        _create_tables(conn.cursor())
+    apply_migrations(conn)
+
+
+def get_schema_version(conn=None):
+    """Return the schema version recorded in the database"""
+    conn = conn or get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn=None):
+    """Apply pending schema migrations, each one in its own transaction
+
+    The applied version is tracked with ``PRAGMA user_version`` so every
+    migration runs exactly once per database file. Each step takes the
+    write lock up front and re-reads the version under it: when several
+    processes start together, the ones that waited skip what the first
+    one applied.
+    """
+    conn = conn or get_db_connection()
+    current = get_schema_version(conn)
+    
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            current = get_schema_version(conn)
+            if version <= current:
+                continue
+            migrate(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {version}')
+        current = version
+    
+    return current
+
+
+def _create_tables(cursor):
+    """Create the base tables if they do not exist yet"""
     
     # Create users table
     cursor.execute('''
@@ -76,48 +394,564 @@ def init_database():
             FOREIGN KEY(session_id) REFERENCES conversations(session_id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
 
 
-def save_message(session_id, role, content, tokens_used=0):
-    """Save a message to the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _migration_001_indexes(cursor):
+    """Index per-session message lookups and per-user conversation listings"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_session_timestamp
+        ON messages (session_id, timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+        ON conversations (user_id, updated_at DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_statistics_session
+        ON statistics (session_id)
+    ''')
+
+
+def _migration_002_messages_fts(cursor):
+    """Full-text index over message content, kept in sync by triggers"""
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                content,
+                content='messages',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search_conversations falls back to LIKE
+        return
     
     cursor.execute('''
-        INSERT INTO messages (session_id, role, content, tokens_used)
-        VALUES (?, ?, ?, ?)
-    ''', (session_id, role, content, tokens_used))
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
     
-    # Update conversation timestamp
+    # Backfill messages written before the index existed
+    cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+
+def _migration_003_messages_keyset(cursor):
+    """Index for newest-first keyset pagination of a conversation"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_session_id
+        ON messages (session_id, id)
+    ''')
+
+
+def _migration_004_statistics_per_session(cursor):
+    """One statistics row per conversation, with a response counter"""
+    cursor.execute('''
+        DELETE FROM statistics
+        WHERE id NOT IN (SELECT MAX(id) FROM statistics GROUP BY session_id)
+    ''')
+    cursor.execute('ALTER TABLE statistics ADD COLUMN response_count INTEGER DEFAULT 0')
+    cursor.execute('DROP INDEX IF EXISTS idx_statistics_session')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_statistics_session
+        ON statistics (session_id)
+    ''')
+
+
+def _migration_005_statistics_counters(cursor):
+    """Per-role message counters, latency max and last message id"""
+    cursor.execute('ALTER TABLE statistics ADD COLUMN user_messages INTEGER DEFAULT 0')
+    cursor.execute('ALTER TABLE statistics ADD COLUMN assistant_messages INTEGER DEFAULT 0')
+    cursor.execute('ALTER TABLE statistics ADD COLUMN response_time_max REAL DEFAULT 0.0')
+    cursor.execute('ALTER TABLE statistics ADD COLUMN last_message_id INTEGER')
+    _backfill_statistics(cursor.connection)
+
+
+def _migration_006_latency_tables(cursor):
+    """Raw per-turn latencies and the windowed quantile sketches"""
     cursor.execute('''
+        CREATE TABLE IF NOT EXISTS turn_latencies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recorded_at INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            model TEXT,
+            total_ms INTEGER,
+            tools_ms INTEGER,
+            llm_ms INTEGER,
+            tool_ms TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_turn_latencies_recorded
+        ON turn_latencies (recorded_at)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latency_sketches (
+            metric TEXT NOT NULL,
+            window_start INTEGER NOT NULL,
+            name TEXT NOT NULL DEFAULT '',
+            model TEXT NOT NULL DEFAULT '',
+            sketch TEXT NOT NULL,
+            PRIMARY KEY (metric, window_start, name, model)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_007_archived_conversations(cursor):
+    """Compressed archive of cold conversations, one blob per conversation"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_conversations (
+            session_id TEXT PRIMARY KEY,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            codec TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            raw_bytes INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        )
+    ''')
+
+
+def _migration_008_chat_jobs(cursor):
+    """Asynchronous chat jobs, visible to every worker process"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            result TEXT,
+            error TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chat_jobs_finished
+        ON chat_jobs (finished_at)
+    ''')
+
+
+def _migration_009_message_html(cursor):
+    """Rendered HTML stored next to assistant messages"""
+    cursor.execute('ALTER TABLE messages ADD COLUMN content_html TEXT')
+
+
+def _migration_010_conversation_versions(cursor):
+    """Per-user counter bumped by triggers on every conversation write"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS conversations_version_{event.lower()}
+            AFTER {event} ON conversations BEGIN
+                INSERT INTO conversation_versions (user_id, version) VALUES ({row}.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            END
+        ''')
+
+
+# Ordered (version, description, callable) triples; never edit a released entry
+MIGRATIONS = [
+    (1, 'indexes for session and user lookups', _migration_001_indexes),
+    (2, 'FTS5 index over message content', _migration_002_messages_fts),
+    (3, 'keyset pagination index on messages', _migration_003_messages_keyset),
+    (4, 'unique statistics row per conversation', _migration_004_statistics_per_session),
+    (5, 'incrementally maintained statistics counters', _migration_005_statistics_counters),
+    (6, 'latency time series and quantile sketches', _migration_006_latency_tables),
+    (7, 'compressed archive of cold conversations', _migration_007_archived_conversations),
+    (8, 'asynchronous chat jobs', _migration_008_chat_jobs),
+    (9, 'rendered HTML of assistant messages', _migration_009_message_html),
+    (10, 'per-user conversation list versions', _migration_010_conversation_versions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _insert_message(conn, session_id, role, content, tokens_used, content_html=None):
+    """Insert one message row and return its id"""
+    cursor = conn.execute('''
+        INSERT INTO messages (session_id, role, content, tokens_used, content_html)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (session_id, role, content, tokens_used, content_html))
+    return cursor.lastrowid
+
+
+def _touch_conversation(conn, session_id):
+    """Bump the conversation's updated_at timestamp
+
+    Raises ConversationNotFound, rolling back the caller's write, when the
+    conversation is gone: another process may have deleted it while this
+    one still had it in its metadata cache, and nothing else stops orphan
+    messages from being written.
+    """
+    cursor = conn.execute('''
         UPDATE conversations SET updated_at = CURRENT_TIMESTAMP
         WHERE session_id = ?
     ''', (session_id,))
+    if cursor.rowcount == 0:
+        raise ConversationNotFound(session_id)
+
+
+def _record_response_time(conn, session_id, response_time):
+    """Fold one response time (seconds) into the running average and max"""
+    conn.execute('''
+        INSERT INTO statistics (session_id, response_count, response_time_avg, response_time_max)
+        VALUES (?, 1, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            response_time_avg = response_time_avg
+                + (excluded.response_time_avg - response_time_avg) / (response_count + 1),
+            response_time_max = MAX(response_time_max, excluded.response_time_max),
+            response_count = response_count + 1
+    ''', (session_id, response_time, response_time))
+
+
+def _bump_statistics(conn, session_id, total_messages, user_messages, assistant_messages,
+                     tokens, last_message_id):
+    """Add freshly inserted messages to the conversation's counters"""
+    conn.execute('''
+        INSERT INTO statistics (
+            session_id, total_messages, user_messages, assistant_messages,
+            total_tokens, last_message_id
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            total_messages = total_messages + excluded.total_messages,
+            user_messages = user_messages + excluded.user_messages,
+            assistant_messages = assistant_messages + excluded.assistant_messages,
+            total_tokens = total_tokens + excluded.total_tokens,
+            last_message_id = MAX(COALESCE(last_message_id, 0), excluded.last_message_id)
+    ''', (
+        session_id,
+        total_messages,
+        user_messages,
+        assistant_messages,
+        tokens or 0,
+        last_message_id,
+    ))
+
+
+def _backfill_statistics(conn, session_id=None):
+    where = 'WHERE session_id = ?' if session_id is not None else 'WHERE 1'
+    cursor = conn.execute(f'''
+        INSERT INTO statistics (
+            session_id, total_messages, user_messages, assistant_messages,
+            total_tokens, last_message_id
+        )
+        SELECT session_id, COUNT(*), SUM(role = 'user'), SUM(role = 'assistant'),
+               COALESCE(SUM(tokens_used), 0), MAX(id)
+        FROM messages
+        {where}
+        GROUP BY session_id
+        ON CONFLICT (session_id) DO UPDATE SET
+            total_messages = excluded.total_messages,
+            user_messages = excluded.user_messages,
+            assistant_messages = excluded.assistant_messages,
+            total_tokens = excluded.total_tokens,
+            last_message_id = excluded.last_message_id
+    ''', () if session_id is None else (session_id,))
+    return cursor.rowcount
+
+
+def _write_message(conn, session_id, role, content, tokens_used):
+    _touch_conversation(conn, session_id)
+    _rehydrate_conversation(conn, session_id)
+    message_id = _insert_message(conn, session_id, role, content, tokens_used)
+    _bump_statistics(
+        conn, session_id, 1,
+        1 if role == 'user' else 0,
+        1 if role == 'assistant' else 0,
+        tokens_used, message_id,
+    )
+    return message_id
+
+
+def _run_conversation_write(func, session_id, *args):
+    """``run_write`` for a write into a conversation that may have been deleted"""
+    try:
+        return run_write(func, session_id, *args)
+    except ConversationNotFound:
+        invalidate_conversation_cache(session_id)
+        raise
+
+
+def save_message(session_id, role, content, tokens_used=0):
+    """Save a message to the database and return its id
+
+    Raises ConversationNotFound when the conversation does not exist.
+    """
+    return _run_conversation_write(_write_message, session_id, role, content, tokens_used)
+
+
+def _write_chat_turn(conn, session_id, user_content, assistant_content,
+                     user_tokens, assistant_tokens, response_time, model, timings, assistant_html=None):
+    _touch_conversation(conn, session_id)
+    # The archiver may have packed the conversation while the reply was generated:
+    # restore it first so the new rows never hide the archived history
+    _rehydrate_conversation(conn, session_id)
+    user_id = _insert_message(conn, session_id, 'user', user_content, user_tokens)
+    assistant_id = _insert_message(
+        conn, session_id, 'assistant', assistant_content, assistant_tokens, assistant_html
+    )
+    _bump_statistics(conn, session_id, 2, 1, 1, (user_tokens or 0) + (assistant_tokens or 0), assistant_id)
+    if response_time is not None:
+        _record_response_time(conn, session_id, response_time)
+    if timings:
+        _record_turn_latency(conn, session_id, model, timings)
+    return {'user_message_id': user_id, 'assistant_message_id': assistant_id}
+
+
+def save_chat_turn(session_id, user_content, assistant_content,
+                   user_tokens=0, assistant_tokens=0, response_time=None,
+                   model=None, timings=None, assistant_html=None):
+    """Save a user message and the assistant reply in one transaction
+
+    Either both messages (plus the timestamp, response-time and latency
+    updates) are stored or none of them is, and the turn costs a single
+    commit. ``response_time`` is the turn duration in seconds; ``timings``
+    is the phase breakdown described in ``record_turn_latency``;
+    ``assistant_html`` is the reply rendered for display, if available.
+    Raises ConversationNotFound when the conversation does not exist.
+    """
+    return _run_conversation_write(
+        _write_chat_turn, session_id, user_content, assistant_content,
+        user_tokens, assistant_tokens, response_time, model, timings, assistant_html,
+    )
+
+
+def _to_ms(seconds):
+    return None if seconds is None else int(round(seconds * 1000))
+
+
+# Window of this process's last retention sweep, see _record_turn_latency
+_latency_pruned_window = None
+
+
+def _prune_latencies(conn, cutoff):
+    """Delete raw latencies and sketch windows recorded before ``cutoff``"""
+    conn.execute('DELETE FROM turn_latencies WHERE recorded_at < ?', (cutoff,))
+    # The metric list lets SQLite walk the primary key instead of the table
+    conn.execute('''
+        DELETE FROM latency_sketches
+        WHERE metric IN ('turn', 'tools', 'llm', 'tool') AND window_start < ?
+    ''', (cutoff - cutoff % LATENCY_WINDOW_SECONDS,))
+
+
+def _record_turn_latency(conn, session_id, model, timings, recorded_at=None):
+    global _latency_pruned_window
+    recorded_at = int(recorded_at if recorded_at is not None else time.time())
+    model = model or ''
+    tool_calls = timings.get('tool_calls') or {}
+    window_start = recorded_at - recorded_at % LATENCY_WINDOW_SECONDS
+
+    # Retention sweep at most once per window: the window's first turn pays it
+    if LATENCY_RETENTION_DAYS > 0 and window_start != _latency_pruned_window:
+        _prune_latencies(conn, recorded_at - int(LATENCY_RETENTION_DAYS * 86400))
+        _latency_pruned_window = window_start
+
+    conn.execute('''
+        INSERT INTO turn_latencies (recorded_at, session_id, model, total_ms, tools_ms, llm_ms, tool_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        recorded_at, session_id, model,
+        _to_ms(timings.get('total')),
+        _to_ms(timings.get('tools')),
+        _to_ms(timings.get('llm')),
+        json.dumps({name: _to_ms(value) for name, value in tool_calls.items()}) if tool_calls else None,
+    ))
     
-    conn.commit()
-    conn.close()
+    samples = [
+        (metric, '', timings.get(key))
+        for metric, key in (('turn', 'total'), ('tools', 'tools'), ('llm', 'llm'))
+    ]
+    samples += [('tool', name, value) for name, value in tool_calls.items()]
+
+    for metric, name, seconds in samples:
+        if seconds is None:
+            continue
+        row = conn.execute('''
+            SELECT sketch FROM latency_sketches
+            WHERE metric = ? AND window_start = ? AND name = ? AND model = ?
+        ''', (metric, window_start, name, model)).fetchone()
+        sketch = LatencySketch.from_json(row[0]) if row else LatencySketch()
+        sketch.add(seconds * 1000)
+        conn.execute('''
+            INSERT OR REPLACE INTO latency_sketches (metric, window_start, name, model, sketch)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (metric, window_start, name, model, sketch.to_json()))
 
 
-def get_conversation_history(session_id):
-    """Get all messages for a conversation"""
+def record_turn_latency(session_id, model, timings, recorded_at=None):
+    """Record the latency breakdown of one chat turn
+
+    ``timings`` holds durations in seconds: ``total`` (whole turn),
+    ``tools`` (tool phase), ``llm`` (model call) and ``tool_calls``
+    (``{tool_name: seconds}``). A compact raw row is stored and the
+    per-window sketches used by ``get_latency_percentiles`` are updated.
+    """
+    return run_write(_record_turn_latency, session_id, model, timings, recorded_at)
+
+
+@_timed_read('get_latency_percentiles')
+def get_latency_percentiles(metric='turn', group_by='model', since=None, until=None,
+                            window=None, quantiles=DEFAULT_QUANTILES):
+    """Latency percentiles (milliseconds) merged from the stored sketches
+
+    ``metric`` is one of turn, tools, llm or tool. ``group_by`` is model,
+    tool, window (buckets of ``window`` seconds) or None for one overall
+    group. Only sketch rows are read, never the raw per-turn rows.
+    """
+    conn = get_db_connection()
+    since = int(since) if since is not None else 0
+    until = int(until) if until is not None else _MAX_ROWID
+    
+    cursor = conn.execute('''
+        SELECT window_start, name, model, sketch FROM latency_sketches
+        WHERE metric = ? AND window_start >= ? AND window_start < ?
+    ''', (metric, since - since % LATENCY_WINDOW_SECONDS, until))
+    
+    bucket = max(int(window or LATENCY_WINDOW_SECONDS), LATENCY_WINDOW_SECONDS)
+    groups = {}
+    for row in cursor:
+        if group_by == 'model':
+            key = row['model']
+        elif group_by == 'tool':
+            key = row['name']
+        elif group_by == 'window':
+            key = row['window_start'] - row['window_start'] % bucket
+        else:
+            key = 'all'
+        sketch = LatencySketch.from_json(row['sketch'])
+        if key in groups:
+            groups[key].merge(sketch)
+        else:
+            groups[key] = sketch
+    
+    return [
+        {'key': key, **groups[key].summary(quantiles)}
+        for key in sorted(groups)
+    ]
+
+
+def get_conversation_history(session_id, before_id=None, limit=None, with_html=False):
+    """Get messages for a conversation, oldest first
+
+    Without arguments the whole conversation is returned. With ``limit``
+    (and optionally ``before_id``) only the newest ``limit`` messages whose
+    id is below ``before_id`` are read, using the (session_id, id) index;
+    pass the smallest returned id as the next ``before_id`` to page back.
+    ``with_html`` adds the stored rendered HTML as ``html`` (None when the
+    message has none). An archived conversation is rehydrated on first
+    access (and by any write to it, see ``_write_chat_turn``).
+    """
+    messages = _read_history(session_id, before_id, limit, with_html)
+    if not messages and is_conversation_archived(session_id):
+        rehydrate_conversation(session_id)
+        messages = _read_history(session_id, before_id, limit, with_html)
+    return messages
+
+
+@_timed_read('read_history')
+def _read_history(session_id, before_id, limit, with_html=False):
     conn = get_db_connection()
     cursor = conn.cursor()
+    columns = 'id, role, content, timestamp, content_html AS html' if with_html else 'id, role, content, timestamp'
     
-    cursor.execute('''
-        SELECT role, content, timestamp FROM messages
-        WHERE session_id = ?
-        ORDER BY timestamp ASC
-    ''', (session_id,))
+    if before_id is None and limit is None:
+        cursor.execute(f'''
+            SELECT {columns} FROM messages
+            WHERE session_id = ?
+            ORDER BY timestamp ASC
+        ''', (session_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute(f'''
+        SELECT {columns} FROM messages
+        WHERE session_id = ? AND id < ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (
+        session_id,
+        before_id if before_id is not None else _MAX_ROWID,
+        limit if limit is not None else -1,
+    ))
     
     messages = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    messages.reverse()
     
     return messages
 
 
+def _store_message_html(conn, rendered):
+    conn.executemany(
+        'UPDATE messages SET content_html = ? WHERE id = ? AND content_html IS NULL',
+        [(html, message_id) for message_id, html in rendered],
+    )
+
+
+def store_message_html(rendered):
+    """Save HTML rendered on read, as ``(message id, html)`` pairs
+
+    Best-effort: a failed write is logged and the messages are simply
+    rendered again on their next read.
+    """
+    if not rendered:
+        return
+    try:
+        run_write(_store_message_html, rendered)
+    except sqlite3.Error as exc:
+        logger.warning('Storing rendered HTML for %d message(s) skipped: %r', len(rendered), exc)
+
+
+def iter_conversation_messages(session_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield a conversation's messages oldest first, ``batch_size`` rows at a time
+
+    Each batch is a short keyset query on the (session_id, id) index, so no
+    read snapshot stays open while a slow consumer (a streamed download)
+    works through the rows, and at most one batch is held in memory.
+    """
+    if is_conversation_archived(session_id):
+        rehydrate_conversation(session_id)
+    
+    last_id = 0
+    while True:
+        rows = _read_message_batch(session_id, last_id, batch_size)
+        for row in rows:
+            yield dict(row)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]['id']
+
+
+@_timed_read('read_message_batch')
+def _read_message_batch(session_id, after_id, limit):
+    return get_db_connection().execute('''
+        SELECT id, role, content, timestamp FROM messages
+        WHERE session_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (session_id, after_id, limit)).fetchall()
+
+
+@_timed_read('get_all_conversations')
 def get_all_conversations(user_id):
     """Get all conversations for a user"""
     conn = get_db_connection()
@@ -131,97 +965,373 @@ def get_all_conversations(user_id):
     ''', (user_id,))
     
     conversations = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return conversations
 
 
-def create_conversation(user_id, user_name, session_id, model='gemini-2.5-flash', temperature=0.5):
-    """Create a new conversation"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+def _create_conversation(conn, user_id, user_name, session_id, model, temperature):
+    conn.execute('''
         INSERT INTO conversations (user_id, user_name, session_id, model, temperature)
         VALUES (?, ?, ?, ?, ?)
     ''', (user_id, user_name, session_id, model, temperature))
-    
-    conn.commit()
-    conn.close()
+
+
+def create_conversation(user_id, user_name, session_id, model='gemini-2.5-flash', temperature=0.5):
+    """Create a new conversation"""
+    run_write(_create_conversation, user_id, user_name, session_id, model, temperature)
+    invalidate_conversation_cache(session_id)
+
+
+def _delete_conversation(conn, session_id):
+    conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+    conn.execute('DELETE FROM statistics WHERE session_id = ?', (session_id,))
+    conn.execute('DELETE FROM archived_conversations WHERE session_id = ?', (session_id,))
+    conn.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
 
 
 def delete_conversation(session_id):
     """Delete a conversation and all its messages"""
+    run_write(_delete_conversation, session_id)
+    invalidate_conversation_cache(session_id)
+
+
+def _archive_conversation(conn, session_id, cutoff, codec):
+    """Move one conversation's messages into a compressed blob"""
+    # Re-checked inside the write transaction: a turn may have landed since
+    still_cold = conn.execute('''
+        SELECT 1 FROM conversations
+        WHERE session_id = ? AND updated_at < datetime('now', ?)
+    ''', (session_id, cutoff)).fetchone()
+    if not still_cold or conn.execute(
+        'SELECT 1 FROM archived_conversations WHERE session_id = ?', (session_id,)
+    ).fetchone():
+        return 0
+    
+    rows = conn.execute('''
+        SELECT id, role, content, tokens_used, timestamp, content_html FROM messages
+        WHERE session_id = ?
+        ORDER BY id
+    ''', (session_id,)).fetchall()
+    if not rows:
+        return 0
+    
+    raw = json.dumps([tuple(row) for row in rows], ensure_ascii=False).encode('utf-8')
+    compress, _ = ARCHIVE_CODECS[codec]
+    conn.execute('''
+        INSERT INTO archived_conversations (session_id, codec, message_count, raw_bytes, payload)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (session_id, codec, len(rows), len(raw), compress(raw)))
+    conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+    return len(rows)
+
+
+def archive_cold_conversations(older_than_days=None, codec=None, vacuum=True):
+    """Archive conversations not updated for ``older_than_days`` days
+
+    Messages of each cold conversation are packed into one compressed row
+    of ``archived_conversations`` (each conversation in its own short write
+    transaction) and removed from the hot ``messages`` table, its FTS index
+    included; the conversation row and its statistics are kept. Freed pages
+    are then returned with ``reclaim_free_pages``. Returns the number of
+    conversations and messages archived and the pages reclaimed.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    codec = codec or ARCHIVE_CODEC
+    if codec not in ARCHIVE_CODECS:
+        raise ValueError(f'Unknown archive codec: {codec}')
+    cutoff = f'-{float(days)} days'
+    
     conn = get_db_connection()
-    cursor = conn.cursor()
+    candidates = [row[0] for row in conn.execute('''
+        SELECT session_id FROM conversations c
+        WHERE updated_at < datetime('now', ?)
+          AND EXISTS (SELECT 1 FROM messages m WHERE m.session_id = c.session_id)
+    ''', (cutoff,))]
     
-    cursor.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
-    cursor.execute('DELETE FROM statistics WHERE session_id = ?', (session_id,))
-    cursor.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
+    result = {'conversations': 0, 'messages': 0, 'pages_reclaimed': 0}
+    for session_id in candidates:
+        archived = run_write(_archive_conversation, session_id, cutoff, codec)
+        if archived:
+            result['conversations'] += 1
+            result['messages'] += archived
+    
+    if vacuum and result['conversations']:
+        result['pages_reclaimed'] = reclaim_free_pages()
+    return result
+
+
+def is_conversation_archived(session_id):
+    """Check whether a conversation's messages live in the archive table"""
+    row = get_db_connection().execute(
+        'SELECT 1 FROM archived_conversations WHERE session_id = ?', (session_id,)
+    ).fetchone()
+    return row is not None
+
+
+def _rehydrate_conversation(conn, session_id):
+    row = conn.execute(
+        'SELECT codec, payload FROM archived_conversations WHERE session_id = ?',
+        (session_id,),
+    ).fetchone()
+    if row is None:
+        return 0
     
-    conn.commit()
-    conn.close()
+    _, decompress = ARCHIVE_CODECS[row['codec']]
+    messages = json.loads(decompress(row['payload']).decode('utf-8'))
+    # Original ids are kept so keyset cursors and statistics stay valid;
+    # archives packed before content_html was kept have five fields
+    conn.executemany('''
+        INSERT INTO messages (id, session_id, role, content, tokens_used, timestamp, content_html)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(msg_id, session_id, role, content, tokens, ts, rest[0] if rest else None)
+          for msg_id, role, content, tokens, ts, *rest in messages])
+    conn.execute('DELETE FROM archived_conversations WHERE session_id = ?', (session_id,))
+    return len(messages)
 
 
-def search_conversations(user_id, query):
-    """Search conversations by keyword"""
+def rehydrate_conversation(session_id):
+    """Move an archived conversation back into the messages table
+
+    Returns the number of restored messages (0 if it was not archived).
+    """
+    return run_write(_rehydrate_conversation, session_id)
+
+
+def reclaim_free_pages(max_pages=None):
+    """Return free pages to the filesystem with ``PRAGMA incremental_vacuum``
+
+    Only works once the file uses ``auto_vacuum = INCREMENTAL`` (new
+    databases do, older ones need ``enable_incremental_vacuum``). Returns
+    the number of pages released.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return 0
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    pages = '' if max_pages is None else f'({int(max_pages)})'
+    # incremental_vacuum frees one page per step; executescript steps it to
+    # completion where execute() would stop after the first page
+    conn.executescript(f'PRAGMA incremental_vacuum{pages};')
+    return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def enable_incremental_vacuum():
+    """Switch an existing database to incremental auto-vacuum
+
+    Rewrites the whole file with ``VACUUM``; run it once, offline.
+    """
+    conn = get_db_connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+_archive_scheduler_thread = None
+
+
+def start_archive_scheduler(interval_seconds=None, older_than_days=None):
+    """Start the background thread archiving cold conversations"""
+    global _archive_scheduler_thread
+    
+    interval_seconds = ARCHIVE_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    if interval_seconds <= 0 or days <= 0:
+        return None
+    
+    if _archive_scheduler_thread and _archive_scheduler_thread.is_alive():
+        return _archive_scheduler_thread
+    
+    def _worker():
+        while True:
+            started = time.perf_counter()
+            try:
+                result = archive_cold_conversations(days)
+                if result['conversations']:
+                    logger.info('Archived %(conversations)d conversation(s), %(messages)d message(s)', result)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning('Conversation archiving failed: %s', exc)
+                record_job_run('conversation-archiver', started, error=exc)
+            else:
+                record_job_run('conversation-archiver', started)
+            finally:
+                close_db_connection()
+            time.sleep(interval_seconds)
+    
+    _archive_scheduler_thread = threading.Thread(
+        target=_worker,
+        name='conversation-archiver',
+        daemon=True,
+    )
+    _archive_scheduler_thread.start()
+    return _archive_scheduler_thread
+
+
+# Snippet markers: control characters that cannot collide with message text
+_SNIPPET_OPEN = '\x02'
+_SNIPPET_CLOSE = '\x03'
+
+
+def _has_fts_index(conn):
+    """Check whether the messages_fts index exists in this database"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _build_fts_query(query):
+    """Turn free text into an FTS5 query: every word required, last one as prefix"""
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlight_snippet(raw_snippet):
+    """Escape a raw FTS snippet and turn its markers into <mark> tags"""
+    escaped = html.escape(raw_snippet or '')
+    return escaped.replace(_SNIPPET_OPEN, '<mark>').replace(_SNIPPET_CLOSE, '</mark>')
+
+
+@_timed_read('search_conversations')
+def search_conversations(user_id, query, limit=20, offset=0):
+    """Search a user's conversations by keyword
+
+    Results are ranked by BM25 (best matching message per conversation)
+    and carry a highlighted ``snippet`` of that message. ``limit + 1``
+    rows are read so callers can tell whether another page exists.
+    """
+    conn = get_db_connection()
+    
+    fts_query = _build_fts_query(query)
+    if fts_query is None:
+        return []
+    
+    if not _has_fts_index(conn):
+        return _search_conversations_like(conn, user_id, query, limit, offset)
+    
+    cursor = conn.execute('''
+        WITH hits AS (
+            SELECT rowid AS message_id, rank AS score
+            FROM messages_fts
+            WHERE messages_fts MATCH ?
+        )
+        SELECT c.id, c.session_id, c.user_name, c.model, c.created_at, c.updated_at,
+               hits.message_id, MIN(hits.score) AS score
+        FROM hits
+        JOIN messages m ON m.id = hits.message_id
+        JOIN conversations c ON c.session_id = m.session_id
+        WHERE c.user_id = ?
+        GROUP BY c.session_id
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', (fts_query, user_id, limit, offset))
     
+    conversations = [dict(row) for row in cursor.fetchall()]
+    
+    # Snippets are only computed for the page being returned
+    for conversation in conversations:
+        row = conn.execute('''
+            SELECT snippet(messages_fts, 0, ?, ?, '…', 16)
+            FROM messages_fts
+            WHERE messages_fts MATCH ? AND rowid = ?
+        ''', (_SNIPPET_OPEN, _SNIPPET_CLOSE, fts_query, conversation['message_id'])).fetchone()
+        conversation['snippet'] = _highlight_snippet(row[0] if row else '')
+    
+    return conversations
+
+
+def _search_conversations_like(conn, user_id, query, limit, offset):
+    """Unranked LIKE search used when SQLite has no FTS5 support"""
     search_query = f"%{query}%"
-    cursor.execute('''
-        SELECT DISTINCT c.id, c.session_id, c.user_name, c.model, c.created_at
+    cursor = conn.execute('''
+        SELECT DISTINCT c.id, c.session_id, c.user_name, c.model, c.created_at, c.updated_at
         FROM conversations c
         LEFT JOIN messages m ON c.session_id = m.session_id
         WHERE c.user_id = ? AND (m.content LIKE ? OR c.user_name LIKE ?)
         ORDER BY c.updated_at DESC
-    ''', (user_id, search_query, search_query))
+        LIMIT ? OFFSET ?
+    ''', (user_id, search_query, search_query, limit, offset))
     
     conversations = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    for conversation in conversations:
+        conversation.update({'message_id': None, 'score': None, 'snippet': None})
     
     return conversations
 
 
+@_timed_read('get_statistics')
 def get_statistics(session_id):
     """Get statistics for a conversation"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    # Counters are maintained on every message write, see _bump_statistics
     cursor.execute('''
-        SELECT role, tokens_used FROM messages WHERE session_id = ?
+        SELECT total_messages, user_messages, assistant_messages, total_tokens,
+               response_time_avg, response_time_max
+        FROM statistics WHERE session_id = ?
     ''', (session_id,))
     
-    messages = cursor.fetchall()
-    
-    total_messages = len(messages)
-    total_tokens = sum(row[1] for row in messages)
-    user_messages = sum(1 for row in messages if row[0] == 'user')
-    assistant_messages = sum(1 for row in messages if row[0] == 'assistant')
-    
-    cursor.execute('''
-        SELECT response_time_avg FROM statistics WHERE session_id = ?
-    ''', (session_id,))
-    
-    stat_row = cursor.fetchone()
-    response_time = stat_row[0] if stat_row else 0.0
-    
-    conn.close()
+    row = cursor.fetchone()
+    stats = dict(row) if row else {}
     
     return {
-        'total_messages': total_messages,
-        'user_messages': user_messages,
-        'assistant_messages': assistant_messages,
-        'total_tokens': total_tokens,
-        'response_time_avg': response_time
+        'total_messages': stats.get('total_messages') or 0,
+        'user_messages': stats.get('user_messages') or 0,
+        'assistant_messages': stats.get('assistant_messages') or 0,
+        'total_tokens': stats.get('total_tokens') or 0,
+        'response_time_avg': stats.get('response_time_avg') or 0.0,
+        'response_time_max': stats.get('response_time_max') or 0.0,
     }
 
 
+def get_conversation_version(session_id):
+    """Cheap version marker for a conversation's messages and statistics
+
+    Read from the single statistics row; it changes whenever a message is
+    written or a response time recorded.
+    """
+    row = get_db_connection().execute('''
+        SELECT last_message_id, total_messages, total_tokens, response_count
+        FROM statistics WHERE session_id = ?
+    ''', (session_id,)).fetchone()
+    return tuple(row) if row else (None, 0, 0, 0)
+
+
+def get_conversations_version(user_id):
+    """Cheap version marker for a user's conversation list
+
+    A counter bumped by triggers on every insert, update and delete of the
+    user's conversations, so two writes within the same second still give
+    distinct versions (``updated_at`` only has one-second resolution).
+    """
+    row = get_db_connection().execute('''
+        SELECT version FROM conversation_versions WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    return (row[0] if row else 0,)
+
+
+def backfill_statistics(session_id=None):
+    """Recompute message and token counters from the messages table
+
+    Meant as a one-off job (and a repair tool): response-time aggregates
+    are kept since they cannot be derived from stored messages. Returns
+    the number of conversations refreshed.
+    """
+    return run_write(_backfill_statistics, session_id)
+
+
+def _update_conversation_settings(conn, session_id, updates, values):
+    conn.execute(f"UPDATE conversations SET {', '.join(updates)} WHERE session_id = ?", (*values, session_id))
+
+
 def update_conversation_settings(session_id, **kwargs):
     """Update conversation settings (model, temperature)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     updates = []
     values = []
     
@@ -235,13 +1345,8 @@ def update_conversation_settings(session_id, **kwargs):
     
     if updates:
         updates.append('updated_at = CURRENT_TIMESTAMP')
-        values.append(session_id)
-        
-        query = f"UPDATE conversations SET {', '.join(updates)} WHERE session_id = ?"
-        cursor.execute(query, values)
-        conn.commit()
-    
-    conn.close()
+        run_write(_update_conversation_settings, session_id, updates, values)
+        invalidate_conversation_cache(session_id)
 
 
 def get_conversation_by_id(session_id):
@@ -254,11 +1359,109 @@ def get_conversation_by_id(session_id):
     ''', (session_id,))
     
     row = cursor.fetchone()
-    conn.close()
     
     return dict(row) if row else None
 
 
+_conversation_cache = OrderedDict()
+_conversation_cache_lock = threading.Lock()
+
+
+def get_conversation_meta(session_id):
+    """Get a conversation's owner, model and temperature, cached in process
+
+    Entries expire after CONVERSATION_CACHE_TTL seconds and are dropped by
+    ``update_conversation_settings`` and ``delete_conversation``; unknown
+    conversations are not cached. Returns a dict with session_id, user_id,
+    user_name, model and temperature, or None.
+    """
+    now = time.monotonic()
+    with _conversation_cache_lock:
+        entry = _conversation_cache.get(session_id)
+        if entry is not None and entry[0] > now:
+            _conversation_cache.move_to_end(session_id)
+            CACHE_REQUESTS.inc(cache='conversation_meta', result='hit')
+            return dict(entry[1])
+    
+    CACHE_REQUESTS.inc(cache='conversation_meta', result='miss')
+    row = _read_conversation_meta(session_id)
+    if row is None:
+        return None
+    
+    meta = dict(row)
+    if CONVERSATION_CACHE_SIZE > 0:
+        with _conversation_cache_lock:
+            _conversation_cache[session_id] = (now + CONVERSATION_CACHE_TTL, meta)
+            _conversation_cache.move_to_end(session_id)
+            while len(_conversation_cache) > CONVERSATION_CACHE_SIZE:
+                _conversation_cache.popitem(last=False)
+    return dict(meta)
+
+
+@_timed_read('conversation_meta')
+def _read_conversation_meta(session_id):
+    return get_db_connection().execute('''
+        SELECT session_id, user_id, user_name, model, temperature
+        FROM conversations WHERE session_id = ?
+    ''', (session_id,)).fetchone()
+
+
+def invalidate_conversation_cache(session_id=None):
+    """Drop one conversation (or, without argument, all) from the metadata cache"""
+    with _conversation_cache_lock:
+        if session_id is None:
+            _conversation_cache.clear()
+        else:
+            _conversation_cache.pop(session_id, None)
+
+
+def _create_chat_job(conn, job_id, user_id, session_id, now):
+    conn.execute(
+        'DELETE FROM chat_jobs WHERE finished_at < ?',
+        (now - CHAT_JOB_RETENTION_SECONDS,),
+    )
+    conn.execute('''
+        INSERT INTO chat_jobs (id, user_id, session_id, status, created_at)
+        VALUES (?, ?, ?, 'queued', ?)
+    ''', (job_id, user_id, session_id, now))
+
+
+def create_chat_job(job_id, user_id, session_id):
+    """Record a queued chat job (and drop jobs past their retention)"""
+    run_write(_create_chat_job, job_id, user_id, session_id, time.time())
+
+
+def _update_chat_job(conn, job_id, status, result, error, now):
+    if status == 'running':
+        conn.execute(
+            "UPDATE chat_jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (now, job_id),
+        )
+    else:
+        conn.execute('''
+            UPDATE chat_jobs SET status = ?, finished_at = ?, result = ?, error = ?
+            WHERE id = ?
+        ''', (status, now, json.dumps(result) if result is not None else None, error, job_id))
+
+
+def update_chat_job(job_id, status, result=None, error=None):
+    """Move a chat job to running, done (with ``result``) or error"""
+    run_write(_update_chat_job, job_id, status, result, error, time.time())
+
+
+def get_chat_job(job_id):
+    """Get a chat job with its decoded result, or None"""
+    row = get_db_connection().execute('''
+        SELECT id, user_id, session_id, status, created_at, started_at, finished_at, result, error
+        FROM chat_jobs WHERE id = ?
+    ''', (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
 def toggle_tool(session_id, tool_name, enabled):
     """Toggle tool for a conversation"""
     # Note: This would require a tools table in production
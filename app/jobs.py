@@ -0,0 +1,328 @@
+"""
+Chat turns and asynchronous chat jobs for QUANTUM MIND
+
+``run_chat_turn`` is the whole of one chat turn (context, agent, storage).
+Routes either run it inline or hand it to the ChatJobPool, a bounded
+thread pool sized separately from the web server, and return a job id
+that clients poll through ``/api/jobs/<id>``. Job state lives in SQLite so
+any worker process can answer for it.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .admission import AdmissionRejected
+from .agent import ToolLookupScope, get_agent, use_lookup_scope
+from .database import (
+    close_db_connection, create_chat_job, get_conversation_history, save_chat_turn, update_chat_job,
+)
+from .rendering import render_markdown
+from .tracing import attach, current_context, span
+
+logger = logging.getLogger(__name__)
+
+CHAT_JOB_WORKERS = int(os.getenv('CHAT_JOB_WORKERS', '4'))
+CHAT_JOB_QUEUE_SIZE = int(os.getenv('CHAT_JOB_QUEUE_SIZE', '32'))
+# Unfinished jobs older than this are reported as lost (process restarted)
+CHAT_JOB_TIMEOUT_SECONDS = int(os.getenv('CHAT_JOB_TIMEOUT_SECONDS', '600'))
+
+# Batch chat: prompts per request and turns run at once per batch
+CHAT_BATCH_MAX_PROMPTS = int(os.getenv('CHAT_BATCH_MAX_PROMPTS', '200'))
+CHAT_BATCH_CONCURRENCY = int(os.getenv('CHAT_BATCH_CONCURRENCY', '4'))
+# Longest wait of a batch item for one of the user's admission slots (seconds)
+CHAT_BATCH_ADMISSION_TIMEOUT = float(os.getenv('CHAT_BATCH_ADMISSION_TIMEOUT', '60'))
+
+FALLBACK_REPLY = 'Je ne peux pas répondre pour le moment, veuillez réessayer plus tard.'
+
+
+class ChatTurnError(Exception):
+    """The agent produced neither content nor a usable fallback"""
+
+
+class JobQueueFull(Exception):
+    """The chat job pool already holds its maximum number of jobs"""
+
+
+def run_chat_turn(session_id, message, conversation, context_size, history=None):
+    """Generate the reply to ``message`` and store the turn
+
+    ``history`` is the context to send instead of the latest stored
+    messages (batches share one snapshot taken before they start).
+
+    Returns ``{'message': ..., 'html': ..., 'tokens_used': ...}``; raises
+    ChatTurnError when the agent failed without any content.  The reply is
+    rendered to HTML once here and stored with it.
+    """
+    started = time.perf_counter()
+    user_tokens = len(message.split())
+
+    # Generate assistant response using agent
+    agent = get_agent(model=conversation['model'])
+    agent.set_model(conversation['model'])
+    agent.set_temperature(conversation['temperature'])
+
+    # Only the most recent messages are sent to the model; the new user
+    # message is not stored yet, it is written together with the reply
+    if history is None:
+        history = get_conversation_history(session_id, limit=max(context_size - 1, 0))
+    history = history + [{'role': 'user', 'content': message}]
+    with span('agent.chat', model=conversation['model'], history=len(history)):
+        response = agent.chat(history, session_id=session_id)
+
+    if response.get('error') and not response.get('content'):
+        raise ChatTurnError(response['error'])
+
+    content = response.get('content', FALLBACK_REPLY)
+    tokens_used = response.get('tokens_used', len(content.split()))
+    html = render_markdown(content)
+
+    # User message, reply, response time and latency breakdown are committed together
+    elapsed = time.perf_counter() - started
+    timings = response.get('timings') or {}
+    timings['total'] = elapsed
+    save_chat_turn(
+        session_id,
+        message,
+        content,
+        user_tokens=user_tokens,
+        assistant_tokens=tokens_used,
+        response_time=elapsed,
+        model=conversation['model'],
+        timings=timings,
+        assistant_html=html,
+    )
+
+    return {
+        'message': content,
+        'html': html,
+        'tokens_used': tokens_used
+    }
+
+
+class BatchAdmission:
+    """Admission slots for the items of one chat batch
+
+    Every running item holds its own slot of the admission controller, so
+    a batch counts against CHAT_MAX_IN_FLIGHT and the per-user limit like
+    that many interactive turns. The route reserves the first slot with
+    ``reserve()`` (a user at their limit gets a 429 straight away); later
+    items wait for the user's slots to free up. ``close()`` gives back a
+    reservation no item used.
+    """
+
+    def __init__(self, controller, user_id, timeout=CHAT_BATCH_ADMISSION_TIMEOUT):
+        self.controller = controller
+        self.user_id = user_id
+        self.timeout = timeout
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take the first slot now; raises AdmissionRejected"""
+        self.controller.acquire(self.user_id)
+        with self._lock:
+            self._reserved += 1
+
+    def acquire(self):
+        with self._lock:
+            if self._reserved:
+                self._reserved -= 1
+                return
+        self.controller.acquire(self.user_id, timeout=self.timeout, wait_for_user=True)
+
+    def release(self, duration=None):
+        self.controller.release(self.user_id, duration)
+
+    def close(self):
+        with self._lock:
+            spare, self._reserved = self._reserved, 0
+        for _ in range(spare):
+            self.controller.release(self.user_id)
+
+
+def _run_batch_item(scope, trace, slots, session_id, message, conversation, context_size, history):
+    try:
+        with attach(trace), use_lookup_scope(scope), span('chat.batch_item'):
+            if slots is None:
+                return run_chat_turn(session_id, message, conversation, context_size, history)
+            try:
+                slots.acquire()
+            except AdmissionRejected as exc:
+                raise ChatTurnError(f'Too many concurrent chat requests ({exc.reason})') from exc
+            started = time.perf_counter()
+            try:
+                return run_chat_turn(session_id, message, conversation, context_size, history)
+            finally:
+                slots.release(time.perf_counter() - started)
+    finally:
+        close_db_connection()
+
+
+def run_chat_batch(session_id, prompts, conversation, context_size, concurrency=CHAT_BATCH_CONCURRENCY,
+                   trace=None, slots=None):
+    """Run many chat turns concurrently, yielding one result dict per prompt as it finishes
+
+    Every prompt gets the same context (the conversation as it was before
+    the batch) and identical tool lookups are made once for the whole
+    batch. Failures are reported per item (``status: error``) and a final
+    summary dict (``done: True``) closes the sequence. Closing the
+    generator early cancels the prompts not started yet.
+
+    The body only runs while the response streams, after the route has
+    returned: pass the route's ``current_context()`` as ``trace``. With
+    ``slots`` (a BatchAdmission) each item holds an admission slot while
+    it runs, and no more items run at once than the user may have.
+    """
+    scope = ToolLookupScope()
+    with attach(trace):
+        history = get_conversation_history(session_id, limit=max(context_size - 1, 0))
+    errors = 0
+
+    if slots is not None:
+        concurrency = min(concurrency, slots.controller.max_per_user)
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='chat-batch')
+    try:
+        pending = {}
+        for index, prompt in enumerate(prompts):
+            if not isinstance(prompt, str) or not prompt.strip():
+                errors += 1
+                yield {'index': index, 'status': 'error', 'error': 'Message required'}
+                continue
+            future = executor.submit(
+                _run_batch_item, scope, trace, slots, session_id, prompt, conversation, context_size, history
+            )
+            pending[future] = index
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    errors += 1
+                    yield {'index': index, 'status': 'error', 'error': str(exc) or type(exc).__name__}
+                else:
+                    yield {'index': index, 'status': 'done', **result}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    yield {
+        'done': True,
+        'count': len(prompts),
+        'errors': errors,
+        'lookups': {'requested': scope.requested, 'deduplicated': scope.deduplicated},
+    }
+
+
+class ChatJobPool:
+    """Bounded pool running chat turns in the background
+
+    At most ``max_workers`` turns run at once and at most ``max_queue``
+    more wait; ``submit`` raises JobQueueFull beyond that instead of
+    letting the backlog grow without limit.
+    """
+
+    def __init__(self, max_workers=CHAT_JOB_WORKERS, max_queue=CHAT_JOB_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-job')
+        self._slots = threading.Semaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._events = {}
+        self.pending = 0
+
+    def submit(self, user_id, session_id, message, conversation, context_size, on_finish=None):
+        """Queue one chat turn and return its job id
+
+        ``on_finish`` is called with no argument once the job has ended.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull()
+
+        job_id = uuid.uuid4().hex
+        try:
+            create_chat_job(job_id, user_id, session_id)
+            with self._lock:
+                self._events[job_id] = threading.Event()
+                self.pending += 1
+            self._executor.submit(
+                self._run, job_id, session_id, message, conversation, context_size, on_finish, current_context()
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, job_id, session_id, message, conversation, context_size, on_finish=None, trace=None):
+        try:
+            # The job continues the trace of the request that submitted it
+            with attach(trace), span('chat.job', job_id=job_id):
+                update_chat_job(job_id, 'running')
+                try:
+                    result = run_chat_turn(session_id, message, conversation, context_size)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning('Chat job %s failed: %s', job_id, exc)
+                    update_chat_job(job_id, 'error', error=str(exc))
+                else:
+                    update_chat_job(job_id, 'done', result=result)
+        finally:
+            with self._lock:
+                event = self._events.pop(job_id, None)
+                self.pending -= 1
+            if on_finish is not None:
+                on_finish()
+            if event is not None:
+                event.set()
+            self._slots.release()
+            close_db_connection()
+
+    def wait(self, job_id, timeout):
+        """Block until a job run by this process finishes; False if unknown here"""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is None:
+            return False
+        return event.wait(timeout)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_job_pool = None
+_job_pool_lock = threading.Lock()
+
+
+def get_job_pool():
+    """Return the process-wide chat job pool, creating it on first use"""
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ChatJobPool()
+        return _job_pool
+
+
+def job_view(job):
+    """Public representation of a stored job, flagging lost ones"""
+    status = job['status']
+    error = job['error']
+    if status in ('queued', 'running') and time.time() - job['created_at'] > CHAT_JOB_TIMEOUT_SECONDS:
+        status, error = 'error', 'Job expired'
+
+    view = {
+        'job_id': job['id'],
+        'session_id': job['session_id'],
+        'status': status,
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+    if status == 'done':
+        view['result'] = job['result']
+    if status == 'error':
+        view['error'] = error
+    return view
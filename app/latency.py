@@ -0,0 +1,123 @@
+"""
+Streaming latency quantiles for QUANTUM MIND
+
+LatencySketch is a small DDSketch-style histogram: values land in
+logarithmic buckets, so any quantile is answered within a fixed relative
+error, sketches merge by adding bucket counts and their size depends on
+the value range rather than on the number of samples.
+"""
+
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+# Relative accuracy of reported quantiles (2%)
+DEFAULT_RELATIVE_ACCURACY = 0.02
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencySketch:
+    """Mergeable quantile sketch for positive durations (milliseconds)"""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Record ``count`` occurrences of ``value``"""
+        if count <= 0:
+            return
+        value = float(value)
+        if value <= 0:
+            self.zero_count += count
+            value = 0.0
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencySketch') -> None:
+        """Fold another sketch (same accuracy) into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('cannot merge sketches with different accuracy')
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile ``q`` (0..1), None when empty"""
+        if self.count == 0:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError('quantile must be between 0 and 1')
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                # Never report outside the observed range
+                return min(max(value, self.min or 0.0), self.max or value)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Count, mean, max and the requested quantiles as ``p50``-style keys"""
+        result: Dict[str, Optional[float]] = {
+            'count': self.count,
+            'mean': self.mean,
+            'max': self.max,
+        }
+        for q in quantiles:
+            result[f'p{q * 100:g}'] = self.quantile(q)
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'a': self.relative_accuracy,
+            'b': {str(index): count for index, count in self.buckets.items()},
+            'z': self.zero_count,
+            'n': self.count,
+            's': self.total,
+            'lo': self.min,
+            'hi': self.max,
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'LatencySketch':
+        data = json.loads(payload)
+        sketch = cls(data.get('a', DEFAULT_RELATIVE_ACCURACY))
+        sketch.buckets = {int(index): count for index, count in data.get('b', {}).items()}
+        sketch.zero_count = data.get('z', 0)
+        sketch.count = data.get('n', 0)
+        sketch.total = data.get('s', 0.0)
+        sketch.min = data.get('lo')
+        sketch.max = data.get('hi')
+        return sketch
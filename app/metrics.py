@@ -0,0 +1,575 @@
+"""
+Prometheus metrics for QUANTUM MIND
+
+A small in-process registry of counters, gauges and histograms, cheap
+enough to update on the request path (one lock and a dict lookup per
+observation), rendered in the Prometheus text exposition format on
+``/metrics``. Under Gunicorn every worker publishes a snapshot of its
+values to ``METRICS_MULTIPROC_DIR`` and a scrape, whichever worker serves
+it, returns the sum over all workers; counters and histograms of recycled
+workers are kept so totals never go backwards.
+"""
+
+import bisect
+import hmac
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from flask import Response, g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_MULTIPROC_DIR = os.getenv(
+    'METRICS_MULTIPROC_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'metrics')
+)
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '1'))
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOOL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+SQLITE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+    # Whether values of a dead worker still count (see ``_SharedDirectory``)
+    persistent = True
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        try:
+            key = tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            key = None
+        if key is None or len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """``[[labels, value], ...]``, JSON-ready"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, totals, key, value):
+        """Add one process's ``value`` for ``key`` into ``totals``"""
+        totals[key] = totals.get(key, 0) + value
+
+    def items(self):
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self, items=None):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, value in self.items() if items is None else items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or tokens"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set at update or scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in ('livesum', 'max'):
+            raise ValueError(f'Unknown multiprocess mode: {multiprocess_mode}')
+        # livesum: occupancy summed over live workers; max: timestamps,
+        # kept after the worker that set them exits
+        self.multiprocess_mode = multiprocess_mode
+        self.persistent = multiprocess_mode == 'max'
+
+    def merge(self, totals, key, value):
+        if self.multiprocess_mode == 'max':
+            totals[key] = max(totals.get(key, value), value)
+        else:
+            super().merge(totals, key, value)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets, with the running sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[:-1]) if state else 0
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(state)] for key, state in self._values.items()]
+
+    def merge(self, totals, key, value):
+        state = totals.get(key)
+        if state is None:
+            totals[key] = list(value)
+        elif len(state) == len(value):
+            totals[key] = [a + b for a, b in zip(state, value)]
+
+    def items(self):
+        with self._lock:
+            return sorted((key, list(state)) for key, state in self._values.items())
+
+    def render(self, items=None):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, state in self.items() if items is None else items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += hits
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _SharedDirectory:
+    """Per-process snapshot files summed at scrape time
+
+    Each process replaces its own ``<pid>-<start>.json`` atomically, so
+    writers never need a lock. Readers hold an exclusive ``flock`` on
+    ``.lock`` while they fold the files of dead processes into
+    ``merged.json``: counters, histograms and ``max`` gauges survive a
+    recycled worker, occupancy gauges (``livesum``) do not.
+    """
+
+    MERGED = 'merged.json'
+
+    def __init__(self, path):
+        self.path = path
+        self._name = None
+        self._name_pid = None
+        os.makedirs(path, exist_ok=True)
+
+    def reset(self):
+        for name in os.listdir(self.path):
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(self.path, name))
+
+    def _own_name(self):
+        # Recomputed after a fork, and unique even when a pid is reused
+        pid = os.getpid()
+        if self._name_pid != pid:
+            self._name, self._name_pid = f'{pid}-{time.time_ns()}.json', pid
+        return self._name
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.path, name), encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, name, data):
+        target = os.path.join(self.path, name)
+        temp = f'{target}.{os.getpid()}.tmp'
+        with open(temp, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle)
+        os.replace(temp, target)
+
+    def flush(self, metrics):
+        self._write(self._own_name(), {metric.name: metric.snapshot() for metric in metrics})
+
+    def collect(self, metrics):
+        """``{metric name: sorted [(labels, value), ...]}`` over every process"""
+        import fcntl
+
+        by_name = {metric.name: metric for metric in metrics}
+
+        def fold(totals, snapshot, persistent_only):
+            for metric_name, items in snapshot.items():
+                metric = by_name.get(metric_name)
+                if metric is None or (persistent_only and not metric.persistent):
+                    continue
+                for key, value in items:
+                    metric.merge(totals.setdefault(metric_name, {}), tuple(key), value)
+
+        with open(os.path.join(self.path, '.lock'), 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            merged, live, dead = {}, [], []
+            fold(merged, self._read(self.MERGED), True)
+            for name in sorted(os.listdir(self.path)):
+                pid = name.split('-', 1)[0]
+                if name.endswith('.json') and pid.isdigit():
+                    (live if _pid_alive(int(pid)) else dead).append(name)
+            for name in dead:
+                fold(merged, self._read(name), True)
+            if dead:
+                self._write(self.MERGED, {
+                    metric_name: [[list(key), value] for key, value in values.items()]
+                    for metric_name, values in merged.items()
+                })
+                for name in dead:
+                    os.remove(os.path.join(self.path, name))
+
+            totals = {metric_name: dict(values) for metric_name, values in merged.items()}
+            for name in live:
+                fold(totals, self._read(name), False)
+        return {metric_name: sorted(values.items()) for metric_name, values in totals.items()}
+
+
+class Registry:
+    """Named metrics plus collectors refreshing gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._shared = None
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        return self._add(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=HTTP_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def _collect(self):
+        for collector in list(self._collectors):
+            collector()
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def enable_multiprocess(self, path):
+        """Share values with the other processes through ``path``
+
+        Call once in the Gunicorn master before workers are forked: it
+        empties ``path`` and drops what the master recorded while warming
+        up, which every worker would otherwise inherit and report again.
+        """
+        shared = _SharedDirectory(path)
+        shared.reset()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+        self._shared = shared
+
+    def flush(self):
+        """Publish this process's values to the shared directory, if any"""
+        if self._shared is not None:
+            self._shared.flush(self._collect())
+
+    def render(self):
+        """All metrics in the text exposition format"""
+        metrics = self._collect()
+        totals = None
+        if self._shared is not None:
+            self._shared.flush(metrics)
+            totals = self._shared.collect(metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(None if totals is None else totals.get(metric.name, [])))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'quantum_mind_http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status'), HTTP_BUCKETS,
+)
+TOOL_CALLS = REGISTRY.counter(
+    'quantum_mind_tool_calls_total', 'Agent tool executions by outcome (ok, no_data, error)',
+    ('tool', 'outcome'),
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    'quantum_mind_tool_duration_seconds', 'Agent tool latency', ('tool',), TOOL_BUCKETS,
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'quantum_mind_cache_requests_total', 'Cache lookups by result (hit, miss)', ('cache', 'result'),
+)
+GEMINI_TOKENS = REGISTRY.counter(
+    'quantum_mind_gemini_tokens_total', 'Gemini tokens reported by usage metadata', ('model', 'kind'),
+)
+GEMINI_REQUESTS = REGISTRY.counter(
+    'quantum_mind_gemini_requests_total', 'Gemini generate_content calls by status', ('model', 'status'),
+)
+SQLITE_QUERY_SECONDS = REGISTRY.histogram(
+    'quantum_mind_sqlite_query_duration_seconds', 'SQLite operation latency, including lock waits',
+    ('operation', 'kind'), SQLITE_BUCKETS,
+)
+SCHEDULER_RUNS = REGISTRY.counter(
+    'quantum_mind_scheduler_runs_total', 'Background job runs by status', ('job', 'status'),
+)
+SCHEDULER_LAST_RUN = REGISTRY.gauge(
+    'quantum_mind_scheduler_last_run_timestamp_seconds', 'Unix time the job last finished', ('job',),
+    multiprocess_mode='max',
+)
+SCHEDULER_LAST_SUCCESS = REGISTRY.gauge(
+    'quantum_mind_scheduler_last_success_timestamp_seconds', 'Unix time the job last succeeded', ('job',),
+    multiprocess_mode='max',
+)
+SCHEDULER_LAST_DURATION = REGISTRY.gauge(
+    'quantum_mind_scheduler_last_duration_seconds', 'Duration of the last job run', ('job',),
+)
+SCHEDULER_RUNNING = REGISTRY.gauge(
+    'quantum_mind_scheduler_thread_alive', '1 when the job thread runs in this process', ('job',),
+)
+SCHEDULER_LEADER = REGISTRY.gauge(
+    'quantum_mind_scheduler_leader', '1 when this process holds the scheduler lock',
+)
+ADMISSION_GAUGE = REGISTRY.gauge(
+    'quantum_mind_chat_admission', 'Chat admission occupancy (in_flight, queued, users_in_flight)', ('state',),
+)
+ADMISSION_DECISIONS = REGISTRY.counter(
+    'quantum_mind_chat_admissions_total', 'Chat admission decisions (admitted or the rejection reason)',
+    ('outcome',),
+)
+CHAT_JOBS_PENDING = REGISTRY.gauge(
+    'quantum_mind_chat_jobs_pending', 'Asynchronous chat jobs queued or running in this process',
+)
+CONVERSATION_CACHE_ENTRIES = REGISTRY.gauge(
+    'quantum_mind_conversation_cache_entries', 'Entries in the conversation metadata cache',
+)
+PASSWORD_HASH_QUEUE = REGISTRY.gauge(
+    'quantum_mind_password_hash_queue', 'Password hashing pool occupancy (running, queued)', ('state',),
+)
+PASSWORD_HASH_DECISIONS = REGISTRY.counter(
+    'quantum_mind_password_hash_requests_total', 'Password hashing requests admitted or rejected by the pool',
+    ('outcome',),
+)
+PASSWORD_HASH_WAIT_SECONDS = REGISTRY.histogram(
+    'quantum_mind_password_hash_wait_seconds', 'Time password hashing calls waited for a pool worker',
+    buckets=SQLITE_BUCKETS,
+)
+PASSWORD_HASH_SECONDS = REGISTRY.histogram(
+    'quantum_mind_password_hash_seconds', 'Password hash and verify duration', ('operation',),
+    buckets=TOOL_BUCKETS,
+)
+
+
+def record_job_run(job, started, error=None):
+    """Record one background job run that began at ``started`` (perf_counter)"""
+    now = time.time()
+    SCHEDULER_RUNS.inc(job=job, status='error' if error else 'ok')
+    SCHEDULER_LAST_RUN.set(now, job=job)
+    SCHEDULER_LAST_DURATION.set(time.perf_counter() - started, job=job)
+    if not error:
+        SCHEDULER_LAST_SUCCESS.set(now, job=job)
+
+
+def _collect_runtime():
+    """Copy admission, job pool, cache and scheduler state into gauges"""
+    from . import agent, database, jobs, server
+    from .admission import get_admission_controller
+
+    stats = get_admission_controller().stats()
+    for state in ('in_flight', 'queued', 'users_in_flight'):
+        ADMISSION_GAUGE.set(stats[state], state=state)
+
+    pool = jobs._job_pool
+    CHAT_JOBS_PENDING.set(pool.pending if pool is not None else 0)
+    CONVERSATION_CACHE_ENTRIES.set(len(database._conversation_cache))
+
+    for job, thread in (
+        ('mt-bench-refresh', agent._mt_bench_scheduler_thread),
+        ('conversation-archiver', database._archive_scheduler_thread),
+    ):
+        SCHEDULER_RUNNING.set(int(bool(thread and thread.is_alive())), job=job)
+    SCHEDULER_LEADER.set(int(server._leader_lock_file is not None))
+
+
+REGISTRY.add_collector(_collect_runtime)
+
+_flush_thread = None
+
+
+def start_metrics_flusher(interval=None):
+    """Publish this process's metrics every ``interval`` seconds (Gunicorn workers)
+
+    Idle workers keep their snapshot fresh, so the gauges they contribute
+    to a scrape served by another worker are at most one interval old.
+    """
+    global _flush_thread
+
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return _flush_thread
+    interval = interval or METRICS_FLUSH_SECONDS
+
+    def _worker():
+        while True:
+            time.sleep(interval)
+            try:
+                REGISTRY.flush()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning('Metrics flush failed: %s', exc)
+
+    _flush_thread = threading.Thread(target=_worker, name='metrics-flush', daemon=True)
+    _flush_thread.start()
+    return _flush_thread
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        # The URL rule, not the path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method, route=route, status=response.status_code,
+        )
+    return response
+
+
+def _authorized():
+    """``Bearer METRICS_TOKEN`` was supplied, or no token is configured"""
+    if not METRICS_TOKEN:
+        return True
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    return hmac.compare_digest(supplied, f'Bearer {METRICS_TOKEN}'.encode('utf-8'))
+
+
+def metrics_view():
+    """Serve the registry; requires ``Bearer METRICS_TOKEN`` when one is set"""
+    if not _authorized():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    response = Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def latency_view():
+    """Chat latency percentiles (p50/p95/p99, milliseconds) of every user
+
+    Operator data, so it sits next to ``/metrics`` behind the same token
+    rather than under the user API.
+    """
+    from .database import get_latency_percentiles
+
+    if not _authorized():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    metric = request.args.get('metric', 'turn')
+    group_by = request.args.get('group_by', 'model')
+    if metric not in ('turn', 'tools', 'llm', 'tool'):
+        return jsonify({'error': 'Invalid metric'}), 400
+    if group_by not in ('model', 'tool', 'window', 'all'):
+        return jsonify({'error': 'Invalid group_by'}), 400
+    try:
+        hours = float(request.args.get('hours', 24))
+        window = int(request.args.get('window', 0)) or None
+    except ValueError:
+        return jsonify({'error': 'Invalid hours or window'}), 400
+
+    groups = get_latency_percentiles(
+        metric=metric,
+        group_by=None if group_by == 'all' else group_by,
+        since=time.time() - hours * 3600,
+        window=window,
+    )
+    response = jsonify({'metric': metric, 'group_by': group_by, 'hours': hours, 'groups': groups})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def init_metrics(app):
+    """Time every request of ``app`` and expose ``/metrics`` and ``/metrics/latency``"""
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    app.add_url_rule('/metrics/latency', 'metrics_latency', latency_view)
@@ -0,0 +1,210 @@
+"""
+PDF export rendering for QUANTUM MIND
+
+ReportLab rendering is CPU-bound and holds the GIL for the whole build, so
+it runs in a small process pool instead of the request thread. Rendered
+files are kept in a disk cache keyed by conversation and last message id:
+exporting an unchanged conversation again is a file read. The cache is
+bounded in bytes and trimmed least recently used first.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from .database import get_conversation_history, get_conversation_version, get_statistics
+from .metrics import CACHE_REQUESTS
+from .tracing import span
+from .utils import REPORTLAB_AVAILABLE, render_pdf
+
+logger = logging.getLogger(__name__)
+
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '2'))
+PDF_QUEUE_SIZE = int(os.getenv('PDF_QUEUE_SIZE', '8'))
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', '60'))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'pdf_cache'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', '200')) * 1024 * 1024
+
+# Bump when the document layout changes so cached files are not reused
+PDF_LAYOUT_VERSION = 2
+
+
+class PdfUnavailable(Exception):
+    """ReportLab is not installed"""
+
+
+class PdfQueueFull(Exception):
+    """Every render slot is busy and the wait queue is full"""
+
+
+class PdfCache:
+    """Directory of rendered PDFs bounded to ``max_bytes``, LRU by mtime"""
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prefix(session_id):
+        return hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:32]
+
+    def path(self, session_id, last_message_id):
+        name = f'{self._prefix(session_id)}-{last_message_id or 0}-v{PDF_LAYOUT_VERSION}.pdf'
+        return os.path.join(self.directory, name)
+
+    def get(self, session_id, last_message_id):
+        path = self.path(session_id, last_message_id)
+        try:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            # Reads refresh the mtime, which orders the LRU cleanup
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, session_id, last_message_id, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(session_id, last_message_id)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+        # Older renders of the same conversation can never be hit again
+        self.invalidate(session_id, keep=path)
+        self.trim()
+
+    def invalidate(self, session_id, keep=None):
+        prefix = self._prefix(session_id) + '-'
+        for entry in self._entries():
+            if entry.name.startswith(prefix) and entry.path != keep:
+                self._remove(entry.path)
+
+    def trim(self):
+        """Delete least recently used files until the cache fits ``max_bytes``"""
+        with self._lock:
+            files = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        try:
+            return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _pool_context():
+    # Never fork a threaded server process: forkserver where available
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PdfRenderer:
+    """Bounded process pool rendering conversation PDFs through the disk cache"""
+
+    def __init__(self, max_workers=PDF_WORKERS, max_queue=PDF_QUEUE_SIZE, timeout=PDF_RENDER_TIMEOUT,
+                 cache=None, render_func=render_pdf):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache or PdfCache()
+        self.render_func = render_func
+        self.renders = 0
+        self._slots = threading.Semaphore(max_workers + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context())
+            return self._executor
+
+    def render(self, session_id, user_name):
+        """PDF bytes for a conversation, from the cache or a worker process
+
+        Raises PdfUnavailable, PdfQueueFull, or TimeoutError when the
+        render takes longer than ``timeout`` seconds.
+        """
+        if self.render_func is render_pdf and not REPORTLAB_AVAILABLE:
+            raise PdfUnavailable()
+
+        last_message_id = get_conversation_version(session_id)[0]
+        cached = self.cache.get(session_id, last_message_id)
+        if cached is not None:
+            CACHE_REQUESTS.inc(cache='pdf', result='hit')
+            return cached
+        CACHE_REQUESTS.inc(cache='pdf', result='miss')
+
+        if not self._slots.acquire(blocking=False):
+            raise PdfQueueFull()
+        future = None
+        try:
+            stats = get_statistics(session_id)
+            history = get_conversation_history(session_id)
+            with span('pdf.render', messages=len(history)):
+                # The file is cached: no export time in it, see render_pdf
+                future = self._get_executor().submit(
+                    self.render_func, user_name, stats, history, timestamped=False
+                )
+                # The slot is held until the worker is done, even past a timeout
+                future.add_done_callback(lambda _: self._slots.release())
+                self.renders += 1
+                try:
+                    data = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    future.cancel()
+                    raise TimeoutError(f'PDF render exceeded {self.timeout}s')
+        finally:
+            if future is None:
+                self._slots.release()
+
+        self.cache.put(session_id, last_message_id, data)
+        return data
+
+    def invalidate(self, session_id):
+        self.cache.invalidate(session_id)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer():
+    """Return the process-wide PDF renderer"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer()
+        return _renderer
@@ -0,0 +1,103 @@
+"""
+Markdown rendering for QUANTUM MIND
+
+Converts message Markdown to HTML with one configured ``markdown.Markdown``
+instance per thread (building the extension set is most of the cost of a
+``markdown.markdown`` call) and memoizes the output by content hash in an
+LRU bounded in bytes of HTML, since tool output is often rendered more
+than once.
+"""
+
+import hashlib
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+
+from .database import store_message_html
+from .metrics import CACHE_REQUESTS
+
+# Optional dependency, imported by the first converter (see _get_markdown)
+MARKDOWN_AVAILABLE = importlib.util.find_spec('markdown') is not None
+
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite']
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_MB', '16')) * 1024 * 1024
+
+_local = threading.local()
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _get_markdown():
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        import markdown
+
+        converter = _local.converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return converter
+
+
+def render_markdown(content):
+    """HTML for ``content``, or None when the markdown package is missing"""
+    if not MARKDOWN_AVAILABLE:
+        return None
+
+    key = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+    if entry is not None:
+        CACHE_REQUESTS.inc(cache='markdown', result='hit')
+        return entry[0]
+    CACHE_REQUESTS.inc(cache='markdown', result='miss')
+
+    converter = _get_markdown()
+    try:
+        html = converter.convert(content)
+    finally:
+        # Clears per-document state (footnotes, abbreviations) for the next call
+        converter.reset()
+
+    size = len(html.encode('utf-8'))
+    # A document larger than the whole cache would only evict everything else
+    if size <= RENDER_CACHE_MAX_BYTES:
+        _cache_put(key, html, size)
+    return html
+
+
+def _cache_put(key, html, size):
+    global _cache_bytes
+    with _cache_lock:
+        previous = _cache.pop(key, None)
+        if previous is not None:
+            _cache_bytes -= previous[1]
+        _cache[key] = (html, size)
+        _cache_bytes += size
+        while _cache_bytes > RENDER_CACHE_MAX_BYTES:
+            _, (_, evicted) = _cache.popitem(last=False)
+            _cache_bytes -= evicted
+
+
+def add_message_html(messages):
+    """Fill ``html`` on assistant messages stored without it (rows older than content_html)
+
+    The HTML is saved back so each legacy row is rendered once, not on
+    every history load.
+    """
+    rendered = []
+    for message in messages:
+        if message['role'] == 'assistant' and not message.get('html'):
+            message['html'] = render_markdown(message['content'])
+            if message['html'] is not None and 'id' in message:
+                rendered.append((message['id'], message['html']))
+    store_message_html(rendered)
+    return messages
+
+
+def clear_render_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
@@ -2,52 +2,106 @@
 Flask Routes and API Endpoints for QUANTUM MIND
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, current_app, g, request, jsonify, session
 from functools import wraps
-from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import time
 import uuid
 import os
 
 from .database import (
-    init_database, create_conversation, save_message, get_conversation_history,
+    ConversationNotFound, create_conversation, get_conversation_history,
     get_all_conversations, delete_conversation, search_conversations, get_statistics,
-    get_conversation_by_id, update_conversation_settings
+    get_conversation_meta, update_conversation_settings,
+    get_conversation_version, get_conversations_version, get_chat_job, iter_conversation_messages
 )
-from .auth import create_user, verify_user, get_user_by_id
+from .auth import PasswordHasherBusy, create_user, verify_user, get_user_by_id
 from .utils import (
-    export_to_markdown, export_to_json, export_to_pdf,
+    stream_markdown, stream_json,
     format_tokens, truncate_text, validate_username, validate_password
 )
 from .agent import get_agent
+from .admission import AdmissionRejected, get_admission_controller
+from .jobs import (
+    CHAT_BATCH_MAX_PROMPTS, BatchAdmission, ChatTurnError, JobQueueFull, get_job_pool, job_view, run_chat_batch,
+    run_chat_turn,
+)
+from .rendering import add_message_html
+from .pdf import PdfQueueFull, PdfUnavailable, get_pdf_renderer
+from .tracing import current_context, trace_route
+from . import tokens
 
 # Create blueprint
 api = Blueprint('api', __name__, url_prefix='/api')
 
 
-# Initialize database on first run
-init_database()
+def _current_user():
+    """User from a bearer access token or the session cookie, or None
+
+    Neither path touches the database. ``created_at`` is only known for
+    token-authenticated requests.
+    """
+    token = tokens.bearer_token(request) if tokens.AUTH_TOKENS else None
+    if token is not None:
+        try:
+            return tokens.decode_token(token)
+        except tokens.InvalidToken:
+            return None
+    if 'user_id' in session:
+        return {'id': session['user_id'], 'username': session.get('username'), 'created_at': None}
+    return None
 
 
 def login_required(f):
-    """Decorator to check if user is logged in"""
+    """Decorator to check if user is logged in
+
+    Sets ``g.user_id``, ``g.username`` and ``g.user`` for the view.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        user = _current_user()
+        if user is None:
             return jsonify({'error': 'Unauthorized'}), 401
+        g.user = user
+        g.user_id = user['id']
+        g.username = user['username']
         return f(*args, **kwargs)
     return decorated_function
 
 
+def _etag(*parts):
+    """Weak ETag value derived from cheap version markers"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def conditional_json(etag, build_payload):
+    """JSON response with a weak ETag, or 304 if the client copy is current
+
+    ``build_payload`` is only called when the client's ``If-None-Match``
+    does not match, so unchanged resources skip the expensive queries.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag, weak=True)
+    # Let the browser keep the copy but revalidate it on every request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # ==================== Authentication Routes ====================
 
 @api.route('/check-auth', methods=['GET'])
 def check_auth():
     """Check if user is authenticated"""
-    if 'user_id' in session:
+    user = _current_user()
+    if user is not None:
         return jsonify({
             'authenticated': True,
-            'user_id': session.get('user_id'),
-            'username': session.get('username')
+            'user_id': user['id'],
+            'username': user['username']
         }), 200
     else:
         return jsonify({
@@ -55,6 +109,12 @@ def check_auth():
         }), 200
 
 
+def _auth_busy():
+    response = jsonify({'error': 'Authentication service busy, retry later'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @api.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -73,7 +133,10 @@ def register():
         return jsonify({'error': error_msg}), 400
     
     # Create user
-    result = create_user(data['username'], data['password'])
+    try:
+        result = create_user(data['username'], data['password'])
+    except PasswordHasherBusy:
+        return _auth_busy()
     
     if result['success']:
         return jsonify({
@@ -92,18 +155,24 @@ def login():
     if not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Username and password required'}), 400
     
-    user = verify_user(data['username'], data['password'])
+    try:
+        user = verify_user(data['username'], data['password'])
+    except PasswordHasherBusy:
+        return _auth_busy()
     
     if user:
         session['user_id'] = user['id']
         session['username'] = user['username']
         session.permanent = True
         
-        return jsonify({
+        payload = {
             'message': 'Logged in successfully',
             'user_id': user['id'],
             'username': user['username']
-        }), 200
+        }
+        if tokens.AUTH_TOKENS:
+            payload.update(tokens.issue_tokens(user))
+        return jsonify(payload), 200
     else:
         return jsonify({'error': 'Invalid username or password'}), 401
 
@@ -116,11 +185,37 @@ def logout():
     return jsonify({'message': 'Logged out successfully'}), 200
 
 
+@api.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new access/refresh token pair"""
+    if not tokens.AUTH_TOKENS:
+        return jsonify({'error': 'Token authentication disabled'}), 404
+
+    data = request.get_json(silent=True) or {}
+    token = data.get('refresh_token') or tokens.bearer_token(request)
+    if not token:
+        return jsonify({'error': 'refresh_token required'}), 400
+    try:
+        claims = tokens.decode_token(token, kind='refresh')
+    except tokens.InvalidToken:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+
+    # The only lookup of the token flow: deleted accounts stop refreshing
+    user = get_user_by_id(claims['id'])
+    if not user:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    return jsonify(tokens.issue_tokens(user)), 200
+
+
 @api.route('/user', methods=['GET'])
 @login_required
 def get_user():
     """Get current user info"""
-    user = get_user_by_id(session['user_id'])
+    if g.user['created_at'] is not None:
+        # Token claims carry everything this route returns
+        return jsonify({key: g.user[key] for key in ('id', 'username', 'created_at')}), 200
+
+    user = get_user_by_id(g.user_id)
     
     if user:
         return jsonify(user), 200
@@ -134,12 +229,16 @@ def get_user():
 @login_required
 def get_conversations():
     """Get all conversations for current user"""
-    conversations = get_all_conversations(session['user_id'])
+    user_id = g.user_id
     
-    return jsonify({
-        'conversations': conversations,
-        'count': len(conversations)
-    }), 200
+    def build():
+        conversations = get_all_conversations(user_id)
+        return {
+            'conversations': conversations,
+            'count': len(conversations)
+        }
+    
+    return conditional_json(_etag('conversations', user_id, get_conversations_version(user_id)), build)
 
 
 @api.route('/conversations', methods=['POST'])
@@ -153,8 +252,8 @@ def new_conversation():
     temperature = float(data.get('temperature', 0.5))
     
     create_conversation(
-        session['user_id'],
-        session['username'],
+        g.user_id,
+        g.username,
         session_id,
         model,
         temperature
@@ -171,62 +270,236 @@ def new_conversation():
 @api.route('/history/<session_id>', methods=['GET'])
 @login_required
 def get_history(session_id):
-    """Get conversation history"""
-    conversation = get_conversation_by_id(session_id)
+    """Get conversation history
+
+    ``?limit=N`` returns the newest N messages and ``?before_id=X`` pages
+    further back; without either the full conversation is returned.
+    """
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
-    history = get_conversation_history(session_id)
-    stats = get_statistics(session_id)
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', type=int)
+    paginated = before_id is not None or limit is not None
     
-    return jsonify({
-        'session_id': session_id,
-        'messages': history,
-        'statistics': stats,
-        'model': conversation['model'],
-        'temperature': conversation['temperature']
-    }), 200
+    if paginated:
+        max_page = current_app.config.get('MAX_HISTORY_PAGE_SIZE', 200)
+        limit = min(max(limit or current_app.config.get('HISTORY_PAGE_SIZE', 50), 1), max_page)
+    
+    def build():
+        if paginated:
+            # One extra row tells us whether older messages remain
+            history = get_conversation_history(session_id, before_id=before_id, limit=limit + 1, with_html=True)
+            has_more = len(history) > limit
+            history = history[-limit:]
+        else:
+            history = get_conversation_history(session_id, with_html=True)
+            has_more = False
+        add_message_html(history)
+        
+        payload = {
+            'session_id': session_id,
+            'messages': history,
+            'statistics': get_statistics(session_id),
+            'model': conversation['model'],
+            'temperature': conversation['temperature']
+        }
+        if paginated:
+            payload['has_more'] = has_more
+            payload['next_before_id'] = history[0]['id'] if has_more and history else None
+        return payload
+    
+    etag = _etag(
+        'history', session_id, before_id, limit,
+        conversation['model'], conversation['temperature'],
+        get_conversation_version(session_id),
+    )
+    return conditional_json(etag, build)
 
 
 @api.route('/chat/<session_id>', methods=['POST'])
 @login_required
+@trace_route('chat')
 def chat(session_id):
-    """Send a message and get response"""
+    """Send a message and get response
+
+    With ``"async": true`` in the body (or ``?mode=job``) the turn runs on
+    the chat job pool and a job id is returned at once (202).
+    """
     data = request.get_json()
     
     if not data.get('message'):
         return jsonify({'error': 'Message required'}), 400
     
     # Verify conversation belongs to user
-    conversation = get_conversation_by_id(session_id)
-    if not conversation or conversation['user_id'] != session['user_id']:
+    conversation = get_conversation_meta(session_id)
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
-    # Save user message
-    user_tokens = len(data['message'].split())
-    save_message(session_id, 'user', data['message'], tokens_used=user_tokens)
+    context_size = current_app.config.get('MAX_CONTEXT_MESSAGES', 20)
+    user_id = g.user_id
     
-    # Generate assistant response using agent
-    agent = get_agent(model=conversation['model'])
-    agent.set_model(conversation['model'])
-    agent.set_temperature(conversation['temperature'])
+    # Each turn (inline or as a job) holds an admission slot until it ends
+    admission = get_admission_controller()
+    try:
+        admission.acquire(user_id)
+    except AdmissionRejected as exc:
+        response = jsonify({'error': 'Too many concurrent chat requests', 'reason': exc.reason})
+        response.headers['Retry-After'] = str(exc.retry_after)
+        return response, 429
+    started = time.monotonic()
+    
+    def release():
+        admission.release(user_id, time.monotonic() - started)
+    
+    if data.get('async') or request.args.get('mode') == 'job':
+        try:
+            job_id = get_job_pool().submit(
+                user_id, session_id, data['message'], conversation, context_size, on_finish=release
+            )
+        except JobQueueFull:
+            release()
+            response = jsonify({'error': 'Too many pending chat jobs, retry later'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        except Exception:
+            # No job was queued, so on_finish will never give the slot back
+            release()
+            raise
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events',
+        }), 202
+    
+    try:
+        result = run_chat_turn(session_id, data['message'], conversation, context_size)
+    except ChatTurnError as exc:
+        return jsonify({'error': str(exc)}), 500
+    except ConversationNotFound:
+        # Deleted by another process while this one still had it cached
+        return jsonify({'error': 'Conversation not found'}), 404
+    finally:
+        release()
     
-    history = get_conversation_history(session_id)
-    response = agent.chat(history, session_id=session_id)
+    return jsonify(result), 200
+
+
+@api.route('/chat/batch', methods=['POST'])
+@login_required
+@trace_route('chat.batch')
+def chat_batch():
+    """Run many prompts against one conversation, streaming NDJSON results
+
+    One line per prompt in completion order (``index`` gives the position
+    in the request, failed prompts carry ``status: error``), then a final
+    summary line with ``done: true``.
+    """
+    data = request.get_json(silent=True) or {}
+    prompts = data.get('prompts')
+    
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({'error': 'Prompts required'}), 400
+    if len(prompts) > CHAT_BATCH_MAX_PROMPTS:
+        return jsonify({'error': f'At most {CHAT_BATCH_MAX_PROMPTS} prompts per batch'}), 400
+    
+    session_id = data.get('session_id')
+    conversation = get_conversation_meta(session_id) if isinstance(session_id, str) else None
+    if not conversation or conversation['user_id'] != g.user_id:
+        return jsonify({'error': 'Conversation not found'}), 404
     
-    if response.get('error') and not response.get('content'):
-        return jsonify({'error': response['error']}), 500
+    # Each running item holds an admission slot; the first one is taken now
+    slots = BatchAdmission(get_admission_controller(), g.user_id)
+    try:
+        slots.reserve()
+    except AdmissionRejected as exc:
+        response = jsonify({'error': 'Too many concurrent chat requests', 'reason': exc.reason})
+        response.headers['Retry-After'] = str(exc.retry_after)
+        return response, 429
+    
+    context_size = current_app.config.get('MAX_CONTEXT_MESSAGES', 20)
+    # The generator runs after this view returns: hand it the request's trace
+    results = run_chat_batch(
+        session_id, prompts, conversation, context_size, trace=current_context(), slots=slots
+    )
     
-    content = response.get('content', 'Je ne peux pas répondre pour le moment, veuillez réessayer plus tard.')
-    tokens_used = response.get('tokens_used', len(content.split()))
+    def generate():
+        try:
+            for item in results:
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+        finally:
+            results.close()
     
-    save_message(session_id, 'assistant', content, tokens_used=tokens_used)
+    response = Response(generate(), mimetype='application/x-ndjson')
+    # Runs when the stream ends or the client goes away, even before it starts
+    response.call_on_close(slots.close)
+    return response
+
+
+@api.route('/admission', methods=['GET'])
+@login_required
+def get_admission():
+    """Chat admission control occupancy and counters"""
+    return jsonify(get_admission_controller().stats()), 200
+
+
+def _get_own_job(job_id):
+    job = get_chat_job(job_id)
+    if not job or job['user_id'] != g.user_id:
+        return None
+    return job
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Get the status (and result once done) of a chat job"""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
     
-    return jsonify({
-        'message': content,
-        'tokens_used': tokens_used
-    }), 200
+    return jsonify(job_view(job)), 200
+
+
+@api.route('/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def job_events(job_id):
+    """Server-Sent Events stream of a chat job's status changes"""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    pool = get_job_pool()
+    
+    def stream():
+        last_status = None
+        last_sent = time.monotonic()
+        current = job
+        while True:
+            view = job_view(current)
+            if view['status'] != last_status:
+                last_status = view['status']
+                last_sent = time.monotonic()
+                yield f"event: {last_status}\ndata: {json.dumps(view)}\n\n"
+                if last_status in ('done', 'error'):
+                    return
+            elif time.monotonic() - last_sent > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            
+            # Jobs run by this process wake us up; others are polled
+            if not pool.wait(job_id, 1.0):
+                time.sleep(0.5)
+            current = get_chat_job(job_id) or current
+    
+    response = current_app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api.route('/mt-bench/refresh', methods=['POST'])
@@ -245,13 +518,15 @@ def refresh_mt_bench():
         return jsonify({'error': f'Impossible de rafraîchir: {exc}'}), 500
 
 
-@api.route('/mt-bench/local-mirror', methods=['GET'])
-def mt_bench_local_mirror():
-    """Expose curated MT-Bench data via HTTP to bypass DNS restrictions."""
-    agent = get_agent()
-    timestamp = datetime.now(timezone.utc).isoformat()
-    models = []
+def _build_mt_bench_mirror(agent):
+    """ETag and payload of the curated MT-Bench snapshot
 
+    The ETag hashes the serialized models, so every worker (and every
+    restart) serving the same data returns the same validator. The list is
+    a handful of entries: rebuilding it per request costs less than
+    tracking when it changes.
+    """
+    models = []
     for entry in agent.CURATED_MT_BENCH:
         raw_link = entry.get('link') or ''
         slug = None
@@ -278,23 +553,34 @@ def mt_bench_local_mirror():
             'size': entry.get('size'),
         })
 
-    return jsonify({
+    serialized = json.dumps(models, sort_keys=True, ensure_ascii=False)
+    payload = {
         'source': 'local_curated_snapshot',
-        'updated_at': timestamp,
+        # Newest entry date, not a build time, so the body matches the ETag
+        'updated_at': max((entry['last_updated'] or '' for entry in models), default=None),
         'models': models,
-    })
+    }
+    return _etag('mt-bench', hashlib.sha1(serialized.encode('utf-8')).hexdigest()), payload
+
+
+@api.route('/mt-bench/local-mirror', methods=['GET'])
+def mt_bench_local_mirror():
+    """Expose curated MT-Bench data via HTTP to bypass DNS restrictions."""
+    etag, payload = _build_mt_bench_mirror(get_agent())
+    return conditional_json(etag, lambda: payload)
 
 
 @api.route('/delete/<session_id>', methods=['DELETE'])
 @login_required
 def delete_conv(session_id):
     """Delete a conversation"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
     delete_conversation(session_id)
+    get_pdf_renderer().invalidate(session_id)
     
     return jsonify({'message': 'Conversation deleted'}), 200
 
@@ -302,17 +588,26 @@ def delete_conv(session_id):
 @api.route('/search', methods=['GET'])
 @login_required
 def search():
-    """Search conversations"""
+    """Search conversations (ranked, paginated)"""
     query = request.args.get('q', '')
-    
+
     if not query:
         return jsonify({'error': 'Search query required'}), 400
-    
-    results = search_conversations(session['user_id'], query)
-    
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+
+    # Fetch one extra row to know whether a next page exists
+    results = search_conversations(g.user_id, query, limit=limit + 1, offset=(page - 1) * limit)
+    has_more = len(results) > limit
+    results = results[:limit]
+
     return jsonify({
         'results': results,
-        'count': len(results)
+        'count': len(results),
+        'page': page,
+        'limit': limit,
+        'has_more': has_more
     }), 200
 
 
@@ -322,9 +617,9 @@ def search():
 @login_required
 def get_settings(session_id):
     """Get conversation settings"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
     return jsonify({
@@ -337,9 +632,9 @@ def get_settings(session_id):
 @login_required
 def update_settings(session_id):
     """Update conversation settings"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
     data = request.get_json()
@@ -359,14 +654,13 @@ def update_settings(session_id):
 @login_required
 def get_stats(session_id):
     """Get conversation statistics"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
-    stats = get_statistics(session_id)
-    
-    return jsonify(stats), 200
+    etag = _etag('statistics', session_id, get_conversation_version(session_id))
+    return conditional_json(etag, lambda: get_statistics(session_id))
 
 
 # ==================== Export Routes ====================
@@ -375,27 +669,32 @@ def get_stats(session_id):
 @login_required
 def export(session_id, format):
     """Export conversation"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
-    history = get_conversation_history(session_id)
-    
-    if format == 'markdown':
-        content = export_to_markdown(session_id, session['username'], history)
-        return content, 200, {'Content-Type': 'text/markdown'}
-    
-    elif format == 'json':
-        content = export_to_json(session_id, session['username'], history)
-        return content, 200, {'Content-Type': 'application/json'}
+    # Markdown and JSON are streamed straight from the messages table
+    streamers = {
+        'markdown': (stream_markdown, 'text/markdown'),
+        'json': (stream_json, 'application/json'),
+    }
+    if format in streamers:
+        streamer, mimetype = streamers[format]
+        messages = iter_conversation_messages(session_id)
+        return Response(streamer(session_id, g.username, messages), mimetype=mimetype)
     
     elif format == 'pdf':
-        content = export_to_pdf(session_id, session['username'], history)
-        if content:
-            return content.getvalue(), 200, {'Content-Type': 'application/pdf'}
-        else:
+        # Rendered in a worker process, or read back from the disk cache
+        try:
+            content = get_pdf_renderer().render(session_id, g.username)
+        except PdfUnavailable:
             return jsonify({'error': 'PDF export not available'}), 400
+        except (PdfQueueFull, TimeoutError):
+            response = jsonify({'error': 'PDF export busy, retry later'})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        return Response(content, mimetype='application/pdf')
     
     else:
         return jsonify({'error': 'Invalid format'}), 400
@@ -407,9 +706,9 @@ def export(session_id, format):
 @login_required
 def get_tools(session_id):
     """Get enabled tools for conversation"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
     agent = get_agent()
@@ -422,9 +721,9 @@ def get_tools(session_id):
 @login_required
 def update_tool(session_id, tool_name):
     """Enable/disable a tool"""
-    conversation = get_conversation_by_id(session_id)
+    conversation = get_conversation_meta(session_id)
     
-    if not conversation or conversation['user_id'] != session['user_id']:
+    if not conversation or conversation['user_id'] != g.user_id:
         return jsonify({'error': 'Conversation not found'}), 404
     
     data = request.get_json()
@@ -441,4 +740,5 @@ def update_tool(session_id, tool_name):
 
 def register_routes(app):
     """Register all routes with Flask app"""
+    tokens.check_secret(app)
     app.register_blueprint(api)
@@ -0,0 +1,203 @@
+"""
+Production server mode for QUANTUM MIND
+
+Runs the Flask app under Gunicorn (several worker processes, each with a
+thread pool) or, where Gunicorn is unavailable (Windows), under Waitress.
+The app is built and warmed once in the master process before workers are
+forked, and a file-lock leader election makes sure a single process runs
+the background schedulers (MT-Bench refresh, conversation archiving).
+"""
+
+import logging
+import os
+import threading
+
+from .database import close_db_connection, get_db_connection, init_database, start_archive_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2 * (os.cpu_count() or 1) + 1
+DEFAULT_THREADS = 4
+DEFAULT_LOCK_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'scheduler.lock')
+LEADER_RETRY_SECONDS = 30
+
+_leader_lock_file = None
+_election_thread = None
+
+
+def build_app(config=None):
+    """Create the Flask app with the API routes registered"""
+    from . import create_app
+    from .routes import register_routes
+
+    app = create_app(config)
+    register_routes(app)
+    return app
+
+
+def warmup(app, refresh_mt_bench=True):
+    """Prepare everything a first request would otherwise pay for
+
+    Brings the schema up to date, instantiates the agent, optionally fetches
+    the MT-Bench leaderboard once and renders the main page. SQLite
+    connections opened here are closed again so none is shared with forked
+    workers.
+    """
+    from .agent import get_agent
+
+    init_database()
+    get_db_connection().execute('SELECT 1 FROM conversations LIMIT 1').fetchall()
+
+    agent = get_agent()
+    if refresh_mt_bench:
+        try:
+            agent.refresh_mt_bench_cache(force=True)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning('MT-Bench warmup failed: %s', exc)
+
+    with app.test_client() as client:
+        client.get('/')
+
+    close_db_connection()
+
+
+def try_acquire_leader_lock(path=None):
+    """Take the scheduler lock without blocking; True if this process owns it
+
+    The lock is an exclusive ``flock`` (``msvcrt.locking`` on Windows) held
+    for the lifetime of the process, so the OS releases it when the leader
+    exits and another process can take over.
+    """
+    global _leader_lock_file
+
+    if _leader_lock_file is not None:
+        return True
+
+    path = path or os.getenv('SCHEDULER_LOCK_FILE', DEFAULT_LOCK_FILE)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handle = open(path, 'a+')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _leader_lock_file = handle
+    return True
+
+
+def start_background_jobs():
+    """Start the schedulers in this process (call only from the leader)"""
+    from .agent import start_mt_bench_scheduler
+
+    started = []
+    if start_mt_bench_scheduler():
+        started.append('mt-bench-refresh')
+    if start_archive_scheduler():
+        started.append('conversation-archiver')
+    logger.info('Process %d is scheduler leader: %s', os.getpid(), ', '.join(started) or 'none')
+    return started
+
+
+def start_leader_election(lock_path=None, retry_seconds=LEADER_RETRY_SECONDS):
+    """Run the schedulers here once this process wins the scheduler lock
+
+    Losers keep retrying every ``retry_seconds`` so a replacement is elected
+    when the leader worker is recycled or crashes.
+    """
+    global _election_thread
+
+    if _election_thread is not None and _election_thread.is_alive():
+        return _election_thread
+
+    stop = threading.Event()
+
+    def _worker():
+        while not stop.is_set():
+            if try_acquire_leader_lock(lock_path):
+                start_background_jobs()
+                return
+            stop.wait(retry_seconds)
+
+    _election_thread = threading.Thread(target=_worker, name='scheduler-election', daemon=True)
+    _election_thread.start()
+    return _election_thread
+
+
+def run_gunicorn(app, host, port, workers, threads, timeout=120):
+    """Serve ``app`` with Gunicorn's gthread workers (app preloaded)"""
+    from gunicorn.app.base import BaseApplication
+
+    from . import metrics
+
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.REGISTRY.enable_multiprocess(metrics.METRICS_MULTIPROC_DIR)
+
+    def _post_fork(server, worker):
+        start_leader_election()
+        metrics.start_metrics_flusher()
+
+    class _QuantumMindServer(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'timeout': timeout,
+                'keepalive': 5,
+                'max_requests': 1000,
+                'max_requests_jitter': 50,
+                'post_fork': _post_fork,
+                'worker_exit': lambda server, worker: metrics.REGISTRY.flush(),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    _QuantumMindServer().run()
+
+
+def run_waitress(app, host, port, threads):
+    """Serve ``app`` with Waitress (single process, thread pool)"""
+    from waitress import serve
+
+    start_leader_election()
+    serve(app, host=host, port=port, threads=threads)
+
+
+def run_production(app, host, port, workers=None, threads=None):
+    """Serve ``app`` with the best production server available"""
+    workers = workers or int(os.getenv('WEB_WORKERS', DEFAULT_WORKERS))
+    threads = threads or int(os.getenv('WEB_THREADS', DEFAULT_THREADS))
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is not None and os.name != 'nt':
+        print(f"🏭 Gunicorn: {workers} worker(s) x {threads} thread(s)")
+        run_gunicorn(app, host, port, workers, threads)
+        return
+
+    try:
+        import waitress  # noqa: F401
+    except ImportError:
+        raise RuntimeError('Production mode requires gunicorn (or waitress on Windows)')
+
+    print(f"🏭 Waitress: 1 processus x {threads} thread(s)")
+    run_waitress(app, host, port, threads)
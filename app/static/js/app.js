@@ -0,0 +1,1099 @@
+let currentSessionId = null;
+let currentUser = null;
+let conversations = [];
+let currentStats = null;
+let subtitleRestoreTimer = null;
+const HISTORY_PAGE_SIZE = 50;
+let historyCursor = null;
+let historyLoading = false;
+
+const TOOL_LABELS = {
+    google_search: '🔍 Recherche',
+    code_execution: '💻 Code',
+    arxiv_lookup: '🧪 arXiv',
+    huggingface_models: '🤗 Hugging Face',
+    ai_benchmarks: '📊 Benchmarks',
+    arxiv_digest: '📰 Digest',
+    ai_research_trends: '🧠 Tendances IA'
+};
+
+// Animations dynamiques au chargement
+function initDynamicEffects() {
+    // Animation d'apparition progressive des éléments
+    const observerOptions = {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    };
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.style.opacity = '1';
+                entry.target.style.transform = 'translateY(0)';
+            }
+        });
+    }, observerOptions);
+
+    // Observer les messages
+    document.querySelectorAll('.message').forEach(el => {
+        el.style.opacity = '0';
+        el.style.transform = 'translateY(20px)';
+        el.style.transition = 'opacity 0.6s ease, transform 0.6s ease';
+        observer.observe(el);
+    });
+
+    // Effet de parallaxe sur le scroll
+    const chatMessages = document.getElementById('chatMessages');
+    if (chatMessages) {
+        chatMessages.addEventListener('scroll', () => {
+            const scrolled = chatMessages.scrollTop;
+            const messages = chatMessages.querySelectorAll('.message');
+            messages.forEach((msg, index) => {
+                const speed = 0.02 * (index % 3);
+                msg.style.transform = `translateY(${scrolled * speed}px)`;
+            });
+        });
+    }
+}
+
+// Effet ripple sur les boutons
+document.addEventListener('click', (e) => {
+    const btn = e.target.closest('.btn, button');
+    if (!btn) return;
+
+    const ripple = document.createElement('span');
+    const rect = btn.getBoundingClientRect();
+    const size = Math.max(rect.width, rect.height);
+    const x = e.clientX - rect.left - size / 2;
+    const y = e.clientY - rect.top - size / 2;
+
+    ripple.style.cssText = `
+        position: absolute;
+        width: ${size}px;
+        height: ${size}px;
+        left: ${x}px;
+        top: ${y}px;
+        background: rgba(255, 255, 255, 0.4);
+        border-radius: 50%;
+        transform: scale(0);
+        animation: ripple 0.6s ease-out;
+        pointer-events: none;
+    `;
+
+    btn.style.position = 'relative';
+    btn.style.overflow = 'hidden';
+    btn.appendChild(ripple);
+
+    setTimeout(() => ripple.remove(), 600);
+});
+
+// Animation CSS pour le ripple
+const rippleStyle = document.createElement('style');
+rippleStyle.textContent = `
+    @keyframes ripple {
+        to {
+            transform: scale(4);
+            opacity: 0;
+        }
+    }
+`;
+document.head.appendChild(rippleStyle);
+
+function formatUpdateTime(date = new Date()) {
+    return date.toLocaleTimeString('fr-FR', { hour: '2-digit', minute: '2-digit' });
+}
+
+function updateConversationStats(count) {
+    const countEl = document.getElementById('statConversations');
+    const trendEl = document.getElementById('statConversationsTrend');
+
+    if (!countEl || !trendEl) {
+        return;
+    }
+
+    const safeCount = Number.isFinite(count) ? count : 0;
+    countEl.textContent = safeCount;
+    trendEl.textContent = safeCount === 0
+        ? 'Aucune conversation active'
+        : `Mis à jour à ${formatUpdateTime()}`;
+}
+
+function updateMessageStats(stats) {
+    const messagesEl = document.getElementById('statMessages');
+    const trendEl = document.getElementById('statMessagesTrend');
+
+    if (!messagesEl || !trendEl) {
+        return;
+    }
+
+    if (!stats) {
+        messagesEl.textContent = '0';
+        trendEl.textContent = 'Aucun message pour le moment';
+        return;
+    }
+
+    const total = stats.total_messages ?? 0;
+    messagesEl.textContent = total;
+
+    const userMessages = stats.user_messages ?? 0;
+    const assistantMessages = stats.assistant_messages ?? 0;
+    trendEl.textContent = `${userMessages} utilisateur · ${assistantMessages} assistant`;
+}
+
+function updateChatSubtitle() {
+    const chatSubtitle = document.getElementById('chatSubtitle');
+    if (!chatSubtitle) {
+        return;
+    }
+
+    const totalMessages = currentStats?.total_messages ?? 0;
+    chatSubtitle.textContent = totalMessages === 0
+        ? 'Commencez à échanger pour voir les insights'
+        : `${totalMessages} message${totalMessages > 1 ? 's' : ''} dans cette session`;
+
+    if (!subtitleRestoreTimer) {
+        chatSubtitle.dataset.originalSubtitle = chatSubtitle.textContent;
+    }
+}
+
+function flashSubtitle(message, duration = 4000) {
+    const chatSubtitle = document.getElementById('chatSubtitle');
+    if (!chatSubtitle || !message) {
+        return;
+    }
+
+    if (!chatSubtitle.dataset.originalSubtitle) {
+        chatSubtitle.dataset.originalSubtitle = chatSubtitle.textContent || '';
+    }
+
+    chatSubtitle.textContent = message;
+
+    if (subtitleRestoreTimer) {
+        clearTimeout(subtitleRestoreTimer);
+    }
+
+    subtitleRestoreTimer = window.setTimeout(() => {
+        const fallback = chatSubtitle.dataset.originalSubtitle || '';
+        chatSubtitle.textContent = fallback;
+    }, duration);
+}
+
+function escapeHtml(str) {
+    return str
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function renderMarkdown(content) {
+    const text = content ?? '';
+    if (typeof marked === 'undefined' || typeof marked.parse !== 'function') {
+        return escapeHtml(text);
+    }
+    return marked.parse(text);
+}
+
+function updateToolStats(tools) {
+    const toolsEl = document.getElementById('statTools');
+    const trendEl = document.getElementById('statToolsTrend');
+
+    if (!toolsEl || !trendEl) {
+        return;
+    }
+
+    if (!tools) {
+        toolsEl.textContent = '0';
+        trendEl.textContent = 'Aucun outil actif';
+        return;
+    }
+
+    const toolNames = Array.isArray(tools)
+        ? tools
+        : Object.keys(tools).filter(name => tools[name]);
+
+    toolsEl.textContent = toolNames.length.toString();
+
+    if (toolNames.length === 0) {
+        trendEl.textContent = 'Activez un outil pour commencer';
+        return;
+    }
+
+    const labels = toolNames.map(name => TOOL_LABELS[name] || name);
+    trendEl.textContent = labels.join(', ');
+}
+
+async function refreshStatistics(sessionId) {
+    if (!sessionId) {
+        currentStats = null;
+        updateMessageStats(null);
+        updateChatSubtitle();
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/statistics/${sessionId}`);
+        if (response.ok) {
+            currentStats = await response.json();
+            updateMessageStats(currentStats);
+            updateChatSubtitle();
+        } else {
+            currentStats = null;
+            updateMessageStats(null);
+            updateChatSubtitle();
+        }
+    } catch (error) {
+        console.error('Error refreshing statistics:', error);
+        currentStats = null;
+        updateMessageStats(null);
+        updateChatSubtitle();
+    }
+}
+
+async function refreshToolStats(sessionId) {
+    if (!sessionId) {
+        updateToolStats(null);
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/tools/${sessionId}`);
+        if (response.ok) {
+            const data = await response.json();
+            updateToolStats(data.tools);
+        } else {
+            updateToolStats(null);
+        }
+    } catch (error) {
+        console.error('Error loading tools:', error);
+        updateToolStats(null);
+    }
+}
+
+function setPrompt(promptText) {
+    const input = document.getElementById('messageInput');
+    if (!input) {
+        return;
+    }
+
+    input.value = promptText;
+    input.focus();
+    input.dispatchEvent(new Event('input'));
+}
+
+function clearInput() {
+    const input = document.getElementById('messageInput');
+    if (!input) {
+        return;
+    }
+
+    input.value = '';
+    input.focus();
+    input.dispatchEvent(new Event('input'));
+}
+
+function setButtonLoading(button, isLoading) {
+    if (!button) {
+        return;
+    }
+
+    if (isLoading) {
+        if (!button.dataset.originalContent) {
+            button.dataset.originalContent = button.innerHTML;
+        }
+        button.innerHTML = '<span class="loading" aria-hidden="true"></span>';
+        button.disabled = true;
+    } else {
+        if (button.dataset.originalContent) {
+            button.innerHTML = button.dataset.originalContent;
+        }
+        button.disabled = false;
+    }
+}
+
+async function refreshMtBench() {
+    const button = document.getElementById('mtBenchRefreshBtn');
+    if (!currentUser) {
+        alert('Connectez-vous pour rafraîchir MT-Bench.');
+        return;
+    }
+    setButtonLoading(button, true);
+
+    try {
+        const response = await fetch('/api/mt-bench/refresh', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'include',
+        });
+
+        if (!response.ok) {
+            throw new Error(`Erreur ${response.status}`);
+        }
+
+        const data = await response.json();
+        const when = data.updated_at
+            ? new Date(data.updated_at).toLocaleString('fr-FR')
+            : 'à l\'instant';
+        flashSubtitle(`MT-Bench rafraîchi (${when})`);
+    } catch (error) {
+        console.error('MT-Bench refresh failed:', error);
+        alert("Impossible de rafraîchir MT-Bench actuellement. Vérifiez votre session ou réessayez plus tard.");
+    } finally {
+        setButtonLoading(button, false);
+    }
+}
+
+function handleInputKey(event) {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        sendMessage();
+    }
+}
+
+// Initialize app
+window.addEventListener('load', () => {
+    checkAuth();
+    if (document.body.classList.contains('dark-mode')) {
+        document.documentElement.style.colorScheme = 'dark';
+    } else {
+        document.documentElement.style.colorScheme = 'light';
+    }
+    requestAnimationFrame(() => {
+        document.body.classList.add('page-ready');
+        initDynamicEffects();
+        initAuthAnimations();
+        initTypingEffect();
+        initNeuralNetwork();
+    });
+
+    // Ajouter indicateur de frappe lors de la saisie
+    const messageInput = document.getElementById('messageInput');
+    if (messageInput) {
+        messageInput.addEventListener('input', (e) => {
+            // Animation du champ de saisie
+            if (e.target.value.length > 0) {
+                e.target.style.borderColor = 'var(--primary)';
+                e.target.style.boxShadow = '0 0 0 3px rgba(99, 102, 241, 0.1)';
+            } else {
+                e.target.style.borderColor = '';
+                e.target.style.boxShadow = '';
+            }
+        });
+    }
+
+    // Charger les messages plus anciens en remontant l'historique
+    const chatMessages = document.getElementById('chatMessages');
+    if (chatMessages) {
+        chatMessages.addEventListener('scroll', () => {
+            if (chatMessages.scrollTop < 80) {
+                loadOlderMessages();
+            }
+        });
+    }
+});
+
+// Auth functions
+async function login() {
+    const username = document.getElementById('loginUsername').value;
+    const password = document.getElementById('loginPassword').value;
+    const loginBtn = document.getElementById('loginBtn');
+    const authProgress = document.getElementById('authProgress');
+    const loginForm = document.getElementById('loginForm');
+
+    console.log('Login attempt with username:', username);
+
+    if (!username || !password) {
+        alert('Veuillez entrer votre nom d\'utilisateur et votre mot de passe');
+        loginForm.classList.add('shake');
+        setTimeout(() => loginForm.classList.remove('shake'), 500);
+        return;
+    }
+
+    // Show progress bar
+    loginBtn.disabled = true;
+    authProgress.classList.add('active');
+
+    try {
+        const response = await fetch('/api/login', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'include',
+            body: JSON.stringify({ username, password })
+        });
+
+        console.log('Login response status:', response.status);
+        const data = await response.json();
+        console.log('Login response data:', data);
+
+        if (response.ok) {
+            currentUser = data;
+            showChatScreen();
+            loadConversations();
+        } else {
+            alert('Nom d\'utilisateur ou mot de passe incorrect: ' + (data.error || ''));
+            loginForm.classList.add('shake');
+            setTimeout(() => loginForm.classList.remove('shake'), 500);
+        }
+    } catch (error) {
+        console.error('Login error:', error);
+        alert('Erreur de connexion: ' + error.message);
+        loginForm.classList.add('shake');
+        setTimeout(() => loginForm.classList.remove('shake'), 500);
+    } finally {
+        loginBtn.disabled = false;
+        authProgress.classList.remove('active');
+    }
+}
+
+async function register() {
+    const username = document.getElementById('registerUsername').value;
+    const password = document.getElementById('registerPassword').value;
+    const confirm = document.getElementById('registerPasswordConfirm').value;
+
+    console.log('Register attempt with username:', username);
+
+    if (!username || !password || !confirm) {
+        alert('Veuillez remplir tous les champs');
+        return;
+    }
+
+    if (password !== confirm) {
+        alert('Les mots de passe ne correspondent pas');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/register', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'include',
+            body: JSON.stringify({ username, password })
+        });
+
+        console.log('Register response status:', response.status);
+        const data = await response.json();
+        console.log('Register response data:', data);
+
+        if (response.ok) {
+            alert('Compte créé avec succès! Connectez-vous maintenant.');
+            toggleForm();
+            // Clear the form
+            document.getElementById('registerUsername').value = '';
+            document.getElementById('registerPassword').value = '';
+            document.getElementById('registerPasswordConfirm').value = '';
+        } else {
+            alert(data.error || 'Erreur lors de la création du compte');
+        }
+    } catch (error) {
+        console.error('Register error:', error);
+        alert('Erreur lors de la création du compte: ' + error.message);
+    }
+}
+
+async function logout() {
+    try {
+        await fetch('/api/logout', { method: 'POST' });
+        currentUser = null;
+        currentSessionId = null;
+        showAuthScreen();
+    } catch (error) {
+        console.error('Logout error:', error);
+    }
+}
+
+function checkAuth() {
+    // Check authentication status with server
+    fetch('/api/check-auth')
+        .then(r => r.json())
+        .then(data => {
+            if (data.authenticated) {
+                currentUser = data;
+                showChatScreen();
+                loadConversations();
+            } else {
+                showAuthScreen();
+            }
+        })
+        .catch(error => {
+            console.error('Auth check failed:', error);
+            showAuthScreen();
+        });
+}
+
+// UI functions
+function showAuthScreen() {
+    const authScreen = document.getElementById('authScreen');
+    const chatScreen = document.getElementById('chatScreen');
+    authScreen.classList.remove('hidden');
+    authScreen.style.display = 'flex';
+    chatScreen.classList.add('hidden');
+    chatScreen.style.display = 'none';
+}
+
+function showChatScreen() {
+    const authScreen = document.getElementById('authScreen');
+    const chatScreen = document.getElementById('chatScreen');
+    authScreen.classList.add('hidden');
+    authScreen.style.display = 'none';
+    chatScreen.classList.remove('hidden');
+    chatScreen.style.display = 'flex';
+}
+
+function toggleForm() {
+    const loginForm = document.getElementById('loginForm');
+    const registerForm = document.getElementById('registerForm');
+    const authCard = document.querySelector('.auth-card');
+    const showingLogin = !loginForm.classList.contains('hidden');
+
+    // Animation de flip
+    authCard.style.transform = 'rotateY(90deg)';
+    authCard.style.opacity = '0.5';
+
+    setTimeout(() => {
+        if (showingLogin) {
+            loginForm.classList.add('hidden');
+            loginForm.style.display = 'none';
+            registerForm.classList.remove('hidden');
+            registerForm.style.display = 'block';
+        } else {
+            registerForm.classList.add('hidden');
+            registerForm.style.display = 'none';
+            loginForm.classList.remove('hidden');
+            loginForm.style.display = 'block';
+        }
+
+        setTimeout(() => {
+            authCard.style.transform = 'rotateY(0deg)';
+            authCard.style.opacity = '1';
+        }, 50);
+    }, 300);
+}
+
+function initAuthAnimations() {
+    // Animation d'entrée pour les champs de formulaire
+    const inputs = document.querySelectorAll('.input-interactive');
+    inputs.forEach((input, index) => {
+        input.style.animationDelay = `${index * 0.1}s`;
+
+        // Effet de focus amélioré
+        input.addEventListener('focus', function() {
+            this.parentElement.classList.add('focused');
+            createFocusRipple(this);
+        });
+
+        input.addEventListener('blur', function() {
+            this.parentElement.classList.remove('focused');
+        });
+
+        // Validation en temps réel
+        input.addEventListener('input', function() {
+            if (this.value.length > 0) {
+                this.classList.add('has-value');
+            } else {
+                this.classList.remove('has-value');
+            }
+        });
+    });
+
+    // Animation des boutons
+    const authButtons = document.querySelectorAll('.btn-auth');
+    authButtons.forEach(btn => {
+        btn.addEventListener('mouseenter', function(e) {
+            const ripple = document.createElement('span');
+            ripple.className = 'button-ripple';
+            this.appendChild(ripple);
+
+            setTimeout(() => ripple.remove(), 600);
+        });
+    });
+}
+
+function createFocusRipple(element) {
+    const ripple = document.createElement('div');
+    ripple.className = 'focus-ripple';
+    element.parentElement.appendChild(ripple);
+
+    setTimeout(() => ripple.remove(), 600);
+}
+
+// Typing Effect for Title
+function initTypingEffect() {
+    const titleElement = document.getElementById('typingTitle');
+    const sloganElement = document.getElementById('authSlogan');
+    if (!titleElement) return;
+
+    const text = 'QUANTUM MIND';
+    const slogans = [
+        '🧠 Intelligence Artificielle de Nouvelle Génération',
+        '🚀 Explorez le Futur de l\'IA',
+        '⚡ Recherche IA Avancée',
+        '🌌 Votre Portail vers l\'Innovation IA'
+    ];
+    const randomSlogan = slogans[Math.floor(Math.random() * slogans.length)];
+
+    let index = 0;
+
+    function typeChar() {
+        if (index < text.length) {
+            titleElement.textContent += text.charAt(index);
+            index++;
+            setTimeout(typeChar, 100);
+        } else if (sloganElement) {
+            sloganElement.textContent = randomSlogan;
+        }
+    }
+
+    typeChar();
+}
+
+// Toggle Password Visibility
+function togglePasswordVisibility(inputId) {
+    const input = document.getElementById(inputId);
+    const icon = document.getElementById(inputId + '-icon');
+
+    if (input.type === 'password') {
+        input.type = 'text';
+        icon.classList.remove('fa-eye');
+        icon.classList.add('fa-eye-slash');
+    } else {
+        input.type = 'password';
+        icon.classList.remove('fa-eye-slash');
+        icon.classList.add('fa-eye');
+    }
+}
+
+// Neural Network Background
+function initNeuralNetwork() {
+    const canvas = document.getElementById('neuralCanvas');
+    if (!canvas) return;
+
+    const ctx = canvas.getContext('2d');
+    canvas.width = window.innerWidth;
+    canvas.height = window.innerHeight;
+
+    const particles = [];
+    const particleCount = 50;
+    const maxDistance = 150;
+
+    class Particle {
+        constructor() {
+            this.x = Math.random() * canvas.width;
+            this.y = Math.random() * canvas.height;
+            this.vx = (Math.random() - 0.5) * 0.5;
+            this.vy = (Math.random() - 0.5) * 0.5;
+            this.radius = 2;
+        }
+
+        update() {
+            this.x += this.vx;
+            this.y += this.vy;
+
+            if (this.x < 0 || this.x > canvas.width) this.vx *= -1;
+            if (this.y < 0 || this.y > canvas.height) this.vy *= -1;
+        }
+
+        draw() {
+            ctx.beginPath();
+            ctx.arc(this.x, this.y, this.radius, 0, Math.PI * 2);
+            ctx.fillStyle = 'rgba(99, 102, 241, 0.6)';
+            ctx.fill();
+        }
+    }
+
+    for (let i = 0; i < particleCount; i++) {
+        particles.push(new Particle());
+    }
+
+    function connectParticles() {
+        for (let i = 0; i < particles.length; i++) {
+            for (let j = i + 1; j < particles.length; j++) {
+                const dx = particles[i].x - particles[j].x;
+                const dy = particles[i].y - particles[j].y;
+                const distance = Math.sqrt(dx * dx + dy * dy);
+
+                if (distance < maxDistance) {
+                    const opacity = (1 - distance / maxDistance) * 0.5;
+                    ctx.beginPath();
+                    ctx.strokeStyle = `rgba(99, 102, 241, ${opacity})`;
+                    ctx.lineWidth = 1;
+                    ctx.moveTo(particles[i].x, particles[i].y);
+                    ctx.lineTo(particles[j].x, particles[j].y);
+                    ctx.stroke();
+                }
+            }
+        }
+    }
+
+    function animate() {
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+        particles.forEach(particle => {
+            particle.update();
+            particle.draw();
+        });
+
+        connectParticles();
+        requestAnimationFrame(animate);
+    }
+
+    animate();
+
+    window.addEventListener('resize', () => {
+        canvas.width = window.innerWidth;
+        canvas.height = window.innerHeight;
+    });
+}
+
+// Password Strength Checker
+function checkPasswordStrength(password) {
+    const strengthIndicator = document.getElementById('passwordStrength');
+    const strengthFill = document.getElementById('strengthFill');
+    const strengthText = document.getElementById('strengthText');
+
+    if (!password) {
+        strengthIndicator.classList.remove('active');
+        return;
+    }
+
+    strengthIndicator.classList.add('active');
+
+    let strength = 0;
+    if (password.length >= 8) strength++;
+    if (password.length >= 12) strength++;
+    if (/[a-z]/.test(password) && /[A-Z]/.test(password)) strength++;
+    if (/[0-9]/.test(password)) strength++;
+    if (/[^a-zA-Z0-9]/.test(password)) strength++;
+
+    strengthFill.className = 'strength-fill';
+    strengthText.className = 'strength-text';
+
+    if (strength <= 2) {
+        strengthFill.classList.add('weak');
+        strengthText.classList.add('weak');
+        strengthText.textContent = '🔴 Faible';
+    } else if (strength <= 4) {
+        strengthFill.classList.add('medium');
+        strengthText.classList.add('medium');
+        strengthText.textContent = '🟡 Moyen';
+    } else {
+        strengthFill.classList.add('strong');
+        strengthText.classList.add('strong');
+        strengthText.textContent = '🟢 Fort';
+    }
+}
+
+function toggleTheme() {
+    document.body.classList.toggle('dark-mode');
+    localStorage.setItem('theme', document.body.classList.contains('dark-mode') ? 'dark' : 'light');
+}
+
+// Conversation functions
+async function newConversation() {
+    try {
+        const response = await fetch('/api/conversations', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                model: document.getElementById('modelSelect')?.value || 'gemini-2.5-flash-lite',
+                temperature: parseFloat(document.getElementById('temperatureSlider')?.value || 0.5)
+            })
+        });
+
+        if (response.ok) {
+            const data = await response.json();
+            currentSessionId = data.session_id;
+            await loadConversations();
+            await loadConversation(currentSessionId);
+        }
+    } catch (error) {
+        console.error('Error creating conversation:', error);
+    }
+}
+
+async function loadConversations() {
+    try {
+        const response = await fetch('/api/conversations');
+        if (response.ok) {
+            const data = await response.json();
+            conversations = data.conversations;
+            renderConversations();
+            updateConversationStats(data.count ?? conversations.length);
+
+            if (!currentSessionId) {
+                updateMessageStats(null);
+                updateToolStats(null);
+            }
+        }
+    } catch (error) {
+        console.error('Error loading conversations:', error);
+    }
+}
+
+function renderConversations() {
+    const list = document.getElementById('conversationsList');
+    list.innerHTML = '';
+
+    conversations.forEach((conv, index) => {
+        const div = document.createElement('div');
+        div.className = 'conversation-item' + (conv.session_id === currentSessionId ? ' active' : '');
+
+        // Générer un nom élégant basé sur la date
+        const convDate = new Date(conv.created_at || Date.now());
+        const today = new Date();
+        const yesterday = new Date(today);
+        yesterday.setDate(yesterday.getDate() - 1);
+
+        let displayName;
+        if (convDate.toDateString() === today.toDateString()) {
+            displayName = `💬 Session ${convDate.toLocaleTimeString('fr-FR', {hour: '2-digit', minute: '2-digit'})}`;
+        } else if (convDate.toDateString() === yesterday.toDateString()) {
+            displayName = `📅 Hier ${convDate.toLocaleTimeString('fr-FR', {hour: '2-digit', minute: '2-digit'})}`;
+        } else {
+            displayName = `📆 ${convDate.toLocaleDateString('fr-FR', {day: '2-digit', month: 'short'})} ${convDate.toLocaleTimeString('fr-FR', {hour: '2-digit', minute: '2-digit'})}`;
+        }
+
+        div.innerHTML = `
+            <span>${displayName}</span>
+            <button class="conversation-delete" onclick="deleteConversation('${conv.session_id}')">
+                <i class="fas fa-trash"></i>
+            </button>
+        `;
+        div.addEventListener('click', () => loadConversation(conv.session_id));
+        list.appendChild(div);
+    });
+}
+
+async function loadConversation(sessionId) {
+    currentSessionId = sessionId;
+    historyCursor = null;
+    try {
+        // Only the newest page is loaded; older messages come on scroll
+        const response = await fetch(`/api/history/${sessionId}?limit=${HISTORY_PAGE_SIZE}`);
+        if (response.ok) {
+            const data = await response.json();
+            currentStats = data.statistics || null;
+            historyCursor = data.has_more ? data.next_before_id : null;
+            renderMessages(data.messages || []);
+            updateMessageStats(currentStats);
+            updateChatSubtitle();
+
+            const chatTitle = document.getElementById('chatTitle');
+            if (chatTitle) {
+                chatTitle.textContent = 'Conversation';
+            }
+
+            const modelSelect = document.getElementById('modelSelect');
+            const temperatureSlider = document.getElementById('temperatureSlider');
+            if (modelSelect && data.model) {
+                modelSelect.value = data.model;
+            }
+            if (temperatureSlider && typeof data.temperature === 'number') {
+                temperatureSlider.value = data.temperature;
+                const tempValue = document.getElementById('tempValue');
+                if (tempValue) {
+                    tempValue.textContent = data.temperature.toString();
+                }
+            }
+
+            await refreshToolStats(sessionId);
+        }
+    } catch (error) {
+        console.error('Error loading conversation:', error);
+    }
+    renderConversations();
+}
+
+function createMessageElement(msg) {
+    const div = document.createElement('div');
+    div.className = 'message ' + msg.role;
+    div.innerHTML = `
+        <div class="message-avatar">${msg.role === 'user' ? '👤' : '🤖'}</div>
+        <div class="message-content">${msg.html || renderMarkdown(msg.content)}</div>
+    `;
+    return div;
+}
+
+function renderMessages(messages) {
+    const chatMessages = document.getElementById('chatMessages');
+    chatMessages.innerHTML = '';
+
+    if (messages.length === 0) {
+        chatMessages.innerHTML = '<div class="empty-state"><p>Commencez une nouvelle conversation</p></div>';
+        return;
+    }
+
+    messages.forEach(msg => chatMessages.appendChild(createMessageElement(msg)));
+
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+async function loadOlderMessages() {
+    if (!currentSessionId || historyCursor === null || historyLoading) {
+        return;
+    }
+    historyLoading = true;
+    const sessionId = currentSessionId;
+    try {
+        const response = await fetch(`/api/history/${sessionId}?before_id=${historyCursor}&limit=${HISTORY_PAGE_SIZE}`);
+        if (response.ok && sessionId === currentSessionId) {
+            const data = await response.json();
+            const chatMessages = document.getElementById('chatMessages');
+            const previousHeight = chatMessages.scrollHeight;
+            const fragment = document.createDocumentFragment();
+            (data.messages || []).forEach(msg => fragment.appendChild(createMessageElement(msg)));
+            chatMessages.insertBefore(fragment, chatMessages.firstChild);
+            // Keep the viewport on the message the user was reading
+            chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+            historyCursor = data.has_more ? data.next_before_id : null;
+        }
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        historyLoading = false;
+    }
+}
+
+async function sendMessage() {
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+
+    if (!message || !currentSessionId) {
+        alert('Sélectionnez une conversation d\'abord');
+        return;
+    }
+
+    input.value = '';
+    input.focus();
+
+    // Add user message to display
+    const chatMessages = document.getElementById('chatMessages');
+    const userDiv = document.createElement('div');
+    userDiv.className = 'message user';
+    userDiv.innerHTML = `
+        <div class="message-avatar">👤</div>
+        <div class="message-content">${renderMarkdown(message)}</div>
+    `;
+    chatMessages.appendChild(userDiv);
+
+    // Indicateur de frappe animé
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'message assistant';
+    typingDiv.innerHTML = `
+        <div class="message-avatar">🤖</div>
+        <div class="typing-indicator">
+            <span></span>
+            <span></span>
+            <span></span>
+        </div>
+    `;
+    chatMessages.appendChild(typingDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    const removeTypingPlaceholder = () => {
+        if (typingDiv && typingDiv.parentNode) {
+            typingDiv.parentNode.removeChild(typingDiv);
+        }
+    };
+
+    try {
+        // Job mode: the turn runs server-side, we poll for the result
+        const response = await fetch(`/api/chat/${currentSessionId}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message, async: true })
+        });
+
+        let data = null;
+        if (response.status === 202) {
+            const job = await response.json();
+            data = await waitForChatJob(job.job_id);
+        } else if (response.ok) {
+            data = await response.json();
+        }
+
+        if (data) {
+            removeTypingPlaceholder();
+            const assistantDiv = document.createElement('div');
+            assistantDiv.className = 'message assistant';
+            assistantDiv.innerHTML = `
+                <div class="message-avatar">🤖</div>
+                <div class="message-content">${data.html || renderMarkdown(data.message)}</div>
+            `;
+            chatMessages.appendChild(assistantDiv);
+            await refreshStatistics(currentSessionId);
+        } else {
+            removeTypingPlaceholder();
+            alert('Réponse indisponible pour le moment, réessayez plus tard.');
+        }
+    } catch (error) {
+        removeTypingPlaceholder();
+        console.error('Error sending message:', error);
+        alert('Erreur lors de l\'appel au serveur.');
+    }
+
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+async function waitForChatJob(jobId) {
+    let delay = 500;
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        delay = Math.min(delay * 1.5, 2000);
+        const response = await fetch(`/api/jobs/${jobId}`);
+        if (!response.ok) return null;
+        const job = await response.json();
+        if (job.status === 'done') return job.result;
+        if (job.status === 'error') return null;
+    }
+}
+
+async function deleteConversation(sessionId) {
+    if (!confirm('Êtes-vous sûr de vouloir supprimer cette conversation?')) return;
+
+    try {
+        const response = await fetch(`/api/delete/${sessionId}`, { method: 'DELETE' });
+        if (response.ok) {
+            if (currentSessionId === sessionId) {
+                currentSessionId = null;
+                document.getElementById('chatMessages').innerHTML = 
+                    '<div class="empty-state"><p>Sélectionnez une conversation</p></div>';
+                refreshStatistics(null);
+                updateToolStats(null);
+            }
+            loadConversations();
+        }
+    } catch (error) {
+        console.error('Error deleting conversation:', error);
+    }
+}
+
+// Settings
+function showSettings() {
+    document.getElementById('settingsModal').classList.add('active');
+}
+
+function closeModal(id) {
+    document.getElementById(id).classList.remove('active');
+}
+
+function updateSettings() {
+    const tempSlider = document.getElementById('temperatureSlider');
+    document.getElementById('tempValue').textContent = tempSlider.value;
+
+    if (currentSessionId) {
+        fetch(`/api/settings/${currentSessionId}`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                model: document.getElementById('modelSelect').value,
+                temperature: parseFloat(tempSlider.value)
+            })
+        }).catch(error => console.error('Error updating settings:', error));
+    }
+}
+
+// Load theme preference
+if (localStorage.getItem('theme') === 'dark') {
+    document.body.classList.add('dark-mode');
+}
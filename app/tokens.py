@@ -0,0 +1,108 @@
+"""
+Stateless access tokens for QUANTUM MIND
+
+Optional alternative to the session cookie (AUTH_TOKENS=true): login also
+returns a short-lived HS256 access token carrying the user id, username and
+account creation date, plus a longer-lived refresh token. Verifying an
+access token is a signature and expiry check with no database access, so
+any API node sharing the signing secret can serve the request.
+"""
+
+import os
+import time
+import uuid
+
+import jwt
+from flask import current_app
+
+AUTH_TOKENS = os.getenv('AUTH_TOKENS', 'false').lower() in ('1', 'true', 'yes')
+AUTH_TOKEN_SECRET = os.getenv('AUTH_TOKEN_SECRET', '')
+ACCESS_TOKEN_TTL = int(os.getenv('ACCESS_TOKEN_TTL', '900'))
+REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', '604800'))
+
+ALGORITHM = 'HS256'
+ISSUER = 'quantum-mind'
+# Tolerated clock skew between API nodes, in seconds
+LEEWAY = 10
+# Shortest signing secret accepted for HS256 (RFC 7518 section 3.2)
+MIN_SECRET_BYTES = 32
+# Placeholders from config/config.py and .env.example: anyone could forge tokens
+_PLACEHOLDER_SECRETS = frozenset({
+    'dev-secret-key-change-in-production',
+    'your-secret-key-here-change-in-production',
+})
+
+
+class InvalidToken(Exception):
+    """Token is malformed, expired, of the wrong type or wrongly signed"""
+
+
+def check_secret(app):
+    """Refuse to serve tokens signed with a missing, placeholder or short secret
+
+    Called once when the routes are registered; raises RuntimeError so a
+    misconfigured node fails at startup instead of issuing forgeable tokens.
+    """
+    if not AUTH_TOKENS:
+        return
+    secret = AUTH_TOKEN_SECRET or app.config.get('SECRET_KEY') or ''
+    if secret in _PLACEHOLDER_SECRETS or len(secret.encode('utf-8')) < MIN_SECRET_BYTES:
+        raise RuntimeError(
+            f'AUTH_TOKENS=true requires AUTH_TOKEN_SECRET (or SECRET_KEY) set to a random value '
+            f'of at least {MIN_SECRET_BYTES} bytes'
+        )
+
+
+def _secret():
+    # Every node must share it: set AUTH_TOKEN_SECRET or a common SECRET_KEY
+    return AUTH_TOKEN_SECRET or current_app.config['SECRET_KEY']
+
+
+def _encode(user, kind, ttl):
+    now = int(time.time())
+    claims = {
+        'iss': ISSUER,
+        'sub': str(user['id']),
+        'name': user['username'],
+        'created': str(user['created_at']) if user.get('created_at') else None,
+        'typ': kind,
+        'iat': now,
+        'exp': now + ttl,
+        'jti': uuid.uuid4().hex,
+    }
+    return jwt.encode(claims, _secret(), algorithm=ALGORITHM)
+
+
+def issue_tokens(user):
+    """Access and refresh tokens for ``user`` (a dict with id, username, created_at)"""
+    return {
+        'access_token': _encode(user, 'access', ACCESS_TOKEN_TTL),
+        'refresh_token': _encode(user, 'refresh', REFRESH_TOKEN_TTL),
+        'token_type': 'Bearer',
+        'expires_in': ACCESS_TOKEN_TTL,
+    }
+
+
+def decode_token(token, kind='access'):
+    """Verified claims of a ``kind`` token as {'id', 'username', 'created_at'}
+
+    Raises InvalidToken.
+    """
+    try:
+        claims = jwt.decode(
+            token, _secret(), algorithms=[ALGORITHM], issuer=ISSUER, leeway=LEEWAY,
+            options={'require': ['exp', 'iat', 'sub', 'typ']},
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e)) from e
+    if claims['typ'] != kind:
+        raise InvalidToken(f'Expected a {kind} token')
+    return {'id': int(claims['sub']), 'username': claims.get('name'), 'created_at': claims.get('created')}
+
+
+def bearer_token(request):
+    """Token from an ``Authorization: Bearer`` header, or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
@@ -0,0 +1,191 @@
+"""
+Request tracing for QUANTUM MIND
+
+Lightweight spans (name, duration, attributes, parent) grouped under a
+trace id created by ``start_trace``; code further down the call chain
+opens child spans with ``span`` without knowing whether the trace is
+sampled. Only a ``TRACE_SAMPLE_RATE`` fraction of traces is recorded,
+unsampled ones cost a context variable lookup per span. Finished spans
+are appended as JSON lines to ``TRACE_FILE``.
+"""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.getenv('TRACE_FILE', os.path.join(os.path.dirname(__file__), '..', 'data', 'traces.jsonl'))
+
+_current = ContextVar('quantum_mind_span', default=None)
+
+
+class Span:
+    """One timed operation of a sampled trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes', 'start', 'duration', 'status', '_started')
+
+    sampled = True
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.status = 'ok'
+        self._started = time.perf_counter()
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'pid': os.getpid(),
+        }
+
+
+class _UnsampledSpan:
+    """Stand-in for spans of a trace that is not recorded"""
+
+    __slots__ = ('trace_id',)
+
+    sampled = False
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id
+
+    def set(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _UnsampledSpan()
+
+
+class JsonLinesExporter:
+    """Append finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path=None):
+        self.path = path or TRACE_FILE
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._handle is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._handle = open(self.path, 'a', encoding='utf-8')
+            self._handle.write(line)
+            self._handle.flush()
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Return the process-wide span exporter"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = JsonLinesExporter()
+        return _exporter
+
+
+@contextmanager
+def _recording(name, trace_id, parent_id, attributes):
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = 'error'
+        current.attributes['error'] = type(exc).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._started
+        _current.reset(token)
+        get_exporter().export(current)
+
+
+@contextmanager
+def start_trace(name, sample_rate=None, **attributes):
+    """Open the root span of a new trace, sampled with ``sample_rate``"""
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    trace_id = uuid.uuid4().hex
+    if rate <= 0 or random.random() >= rate:
+        token = _current.set(_UnsampledSpan(trace_id))
+        try:
+            yield _current.get()
+        finally:
+            _current.reset(token)
+        return
+
+    with _recording(name, trace_id, None, attributes) as root:
+        yield root
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child of the current span; a no-op outside sampled traces"""
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        yield _NOOP_SPAN
+        return
+
+    with _recording(name, parent.trace_id, parent.span_id, attributes) as child:
+        yield child
+
+
+def current_context():
+    """The active span, to hand over to work continuing on another thread"""
+    return _current.get()
+
+
+@contextmanager
+def attach(context):
+    """Make ``context`` (from ``current_context``) the active span"""
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def trace_route(name):
+    """Run a Flask view inside a new trace and return its id in X-Trace-Id"""
+    from flask import make_response
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with start_trace(name, **kwargs) as root:
+                response = make_response(view(*args, **kwargs))
+                if root.sampled:
+                    root.set('status', response.status_code)
+                    response.headers['X-Trace-Id'] = root.trace_id
+                return response
+        return wrapper
+    return decorator
@@ -3,35 +3,44 @@ Utility Functions Module for QUANTUM MIND
 Handles exports, formatting, and other utilities
 """
 
+import importlib.util
 import json
 import re
 
-try:
-    import markdown
-except ImportError:  # pragma: no cover - optional dependency
-    markdown = None
 from io import BytesIO
 from datetime import datetime
 from .database import get_statistics, get_conversation_history
+from .rendering import MARKDOWN_AVAILABLE, render_markdown
 
-try:
-    from reportlab.lib.pagesizes import letter, A4  # type: ignore[import]
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle  # type: ignore[import]
-    from reportlab.lib.units import inch  # type: ignore[import]
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle  # type: ignore[import]
-    from reportlab.lib import colors  # type: ignore[import]
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
+# ReportLab is only imported by render_pdf, which runs in the PDF worker processes
+REPORTLAB_AVAILABLE = importlib.util.find_spec('reportlab') is not None
 
 
-def export_to_markdown(session_id, user_name, conversation_data):
-    """Export conversation to Markdown format"""
-    
+# Streamed exports are sent in chunks of about this many characters
+EXPORT_CHUNK_SIZE = 16 * 1024
+
+
+def _buffered(parts, size=EXPORT_CHUNK_SIZE):
+    """Join small string parts into chunks of roughly ``size`` characters"""
+    buffer = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _markdown_parts(session_id, user_name, messages):
     stats = get_statistics(session_id)
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    md_content = f"""# Conversation - QUANTUM MIND
+    # The header goes out on its own so the first bytes leave at once
+    yield f"""# Conversation - QUANTUM MIND
 
 **Exported by:** {user_name}  
 **Exported on:** {now}
@@ -50,35 +59,67 @@ def export_to_markdown(session_id, user_name, conversation_data):
 
 """
     
-    for message in conversation_data:
+    for message in messages:
         role = "👤 **You**" if message['role'] == 'user' else "🤖 **Agent**"
-        content = message['content']
         timestamp = message.get('timestamp', 'N/A')
-        
-        md_content += f"\n### {role}\n\n"
-        md_content += f"{content}\n\n"
-        md_content += f"*{timestamp}*\n\n"
-        md_content += "---\n"
+        yield f"\n### {role}\n\n{message['content']}\n\n*{timestamp}*\n\n---\n"
+
+
+def stream_markdown(session_id, user_name, messages):
+    """Yield a conversation as Markdown, in chunks
+
+    ``messages`` may be any iterable, typically
+    ``iter_conversation_messages(session_id)``, so memory stays flat
+    whatever the conversation length.
+    """
+    parts = _markdown_parts(session_id, user_name, messages)
+    yield next(parts)
+    yield from _buffered(parts)
+
+
+def _indented_json(value, indent):
+    # json.dumps escapes newlines inside strings, so indenting lines is safe
+    return json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n' + ' ' * indent)
+
+
+def _json_parts(session_id, user_name, messages):
+    metadata = {
+        'session_id': session_id,
+        'user_name': user_name,
+        'exported_at': datetime.now().isoformat(),
+        'statistics': get_statistics(session_id),
+    }
+    yield '{\n  "metadata": ' + _indented_json(metadata, 2) + ',\n  "messages": ['
+    
+    separator = '\n    '
+    empty = True
+    for message in messages:
+        yield separator + _indented_json(message, 4)
+        separator = ',\n    '
+        empty = False
     
-    return md_content
+    yield ']\n}' if empty else '\n  ]\n}'
+
+
+def stream_json(session_id, user_name, messages):
+    """Yield a conversation as JSON, in chunks
+
+    The output is the same document ``json.dumps(..., indent=2)`` would
+    produce, written one message at a time.
+    """
+    parts = _json_parts(session_id, user_name, messages)
+    yield next(parts)
+    yield from _buffered(parts)
+
+
+def export_to_markdown(session_id, user_name, conversation_data):
+    """Export conversation to Markdown format"""
+    return ''.join(stream_markdown(session_id, user_name, conversation_data))
 
 
 def export_to_json(session_id, user_name, conversation_data):
     """Export conversation to JSON format"""
-    
-    stats = get_statistics(session_id)
-    
-    export_data = {
-        'metadata': {
-            'session_id': session_id,
-            'user_name': user_name,
-            'exported_at': datetime.now().isoformat(),
-            'statistics': stats
-        },
-        'messages': conversation_data
-    }
-    
-    return json.dumps(export_data, indent=2, ensure_ascii=False)
+    return ''.join(stream_json(session_id, user_name, conversation_data))
 
 
 def export_to_pdf(session_id, user_name, conversation_data):
@@ -88,7 +129,23 @@ def export_to_pdf(session_id, user_name, conversation_data):
         return None
     
     stats = get_statistics(session_id)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return BytesIO(render_pdf(user_name, stats, conversation_data))
+
+
+def render_pdf(user_name, stats, conversation_data, exported_on=None, timestamped=True):
+    """Render the PDF document and return its bytes
+
+    Takes plain data only (no database access), so it can run in a worker
+    process, see app/pdf.py. Cached renders pass ``timestamped=False``: the
+    header then shows the time of the last message, which is part of the
+    cache key, instead of the export time.
+    """
+    from reportlab.lib import colors  # type: ignore[import]
+    from reportlab.lib.pagesizes import letter  # type: ignore[import]
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle  # type: ignore[import]
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle  # type: ignore[import]
+
+    now = exported_on or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -109,7 +166,11 @@ def export_to_pdf(session_id, user_name, conversation_data):
     
     # Metadata
     story.append(Paragraph(f"<b>Exported by:</b> {user_name}", styles['Normal']))
-    story.append(Paragraph(f"<b>Exported on:</b> {now}", styles['Normal']))
+    if timestamped:
+        story.append(Paragraph(f"<b>Exported on:</b> {now}", styles['Normal']))
+    else:
+        last_message = conversation_data[-1].get('timestamp', 'N/A') if conversation_data else 'N/A'
+        story.append(Paragraph(f"<b>Last message:</b> {last_message}", styles['Normal']))
     story.append(Spacer(1, 12))
     
     # Statistics
@@ -155,9 +216,8 @@ def export_to_pdf(session_id, user_name, conversation_data):
             story.append(PageBreak())
     
     doc.build(story)
-    buffer.seek(0)
     
-    return buffer
+    return buffer.getvalue()
 
 
 def format_message_for_display(content, role='user'):
@@ -166,9 +226,9 @@ def format_message_for_display(content, role='user'):
     formatted = content
     
     # Convert markdown to HTML if needed
-    if markdown and ('```' in formatted or '#' in formatted):
+    if MARKDOWN_AVAILABLE and ('```' in formatted or '#' in formatted):
         try:
-            formatted = markdown.markdown(formatted, extensions=['extra', 'codehilite'])
+            formatted = render_markdown(formatted) or formatted
         except Exception:
             pass
     
@@ -35,6 +35,9 @@ class Config:
     # Limites
     MAX_MESSAGE_LENGTH = 5000
     MAX_CONVERSATION_MESSAGES = 1000
+    MAX_CONTEXT_MESSAGES = int(os.getenv('MAX_CONTEXT_MESSAGES', '20'))  # Historique envoyé au modèle
+    HISTORY_PAGE_SIZE = 50
+    MAX_HISTORY_PAGE_SIZE = 200
     
     # Modèles disponibles
     AVAILABLE_MODELS = [
@@ -3,6 +3,7 @@ QUANTUM MIND - Main Application Entry Point
 Run this file to start the application
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -20,17 +21,52 @@ else:
 
 from app import create_app
 from app.agent import start_mt_bench_scheduler
-from app.database import init_database  # type: ignore[import]
+from app.database import init_database, start_archive_scheduler  # type: ignore[import]
 from config import get_config  # type: ignore[import]
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="QUANTUM MIND")
+    parser.add_argument("--production", action="store_true",
+                        default=os.getenv('SERVER_MODE', '').lower() == 'production',
+                        help="Serveur WSGI multi-processus (Gunicorn/Waitress) au lieu du serveur de développement")
+    parser.add_argument("--workers", type=int, help="Nombre de processus (défaut: WEB_WORKERS ou 2*CPU+1)")
+    parser.add_argument("--threads", type=int, help="Threads par processus (défaut: WEB_THREADS ou 4)")
+    return parser.parse_args()
+
+
+def run_production_server(config, host, port, workers=None, threads=None):
+    """Build, warm up and serve the app with a production WSGI server"""
+    from app.server import build_app, run_production, warmup
+
+    print("🚀 Creating Flask app (production)...")
+    app = build_app(config)
+    print("🔥 Warming up agent, caches and database...")
+    warmup(app, refresh_mt_bench=os.getenv('MT_BENCH_REFRESH_INTERVAL', '14400') != '0')
+    print("✅ Warmup done")
+    print(f"Server: http://{host}:{port}")
+
+    try:
+        run_production(app, host, port, workers=workers, threads=threads)
+    except RuntimeError as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
+
+
 def main():
     """Main entry point"""
+    args = parse_args()
     
     # Get configuration based on environment
     env = os.getenv('FLASK_ENV', 'development')
     config = get_config()
     
+    if args.production:
+        host = os.getenv('FLASK_HOST', '127.0.0.1')
+        port = int(os.getenv('FLASK_PORT', 5000))
+        run_production_server(config, host, port, args.workers, args.threads)
+        return
+    
     # Initialize database
     print("🔄 Initializing database...")
     init_database()
@@ -66,6 +102,8 @@ def main():
             print("⏱️  MT-Bench auto-refresh démarré")
         else:
             print("⚠️  MT-Bench auto-refresh désactivé (intervalle <= 0)")
+        if start_archive_scheduler():
+            print("🗄️  Archivage des conversations inactives démarré")
     
     # Print startup info
     print("\n" + "="*60)
@@ -0,0 +1,61 @@
+"""Archive cold conversations into compressed blobs and reclaim free pages.
+
+The application does the same in the background (ARCHIVE_AFTER_DAYS,
+ARCHIVE_INTERVAL_SECONDS); use this script for a one-off run, or with
+--enable-incremental-vacuum once to convert a database created before
+incremental auto-vacuum was enabled.
+
+Usage: python scripts/archive_conversations.py [--days N] [--codec zlib|lzma]
+       [--enable-incremental-vacuum]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import (  # noqa: E402
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_CODECS,
+    archive_cold_conversations,
+    enable_incremental_vacuum,
+    init_database,
+)
+from app import database  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="Inactivité minimale avant archivage (jours)")
+    parser.add_argument("--codec", choices=sorted(ARCHIVE_CODECS), default=None,
+                        help="Algorithme de compression")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convertir la base en auto_vacuum INCREMENTAL (VACUUM complet)")
+    args = parser.parse_args()
+
+    init_database()
+    if args.enable_incremental_vacuum:
+        if enable_incremental_vacuum():
+            print("✅ auto_vacuum INCREMENTAL activé")
+        else:
+            print("ℹ️  auto_vacuum INCREMENTAL déjà actif")
+
+    size_before = os.path.getsize(database.DB_PATH)
+    start = time.perf_counter()
+    result = archive_cold_conversations(args.days, args.codec)
+    elapsed = time.perf_counter() - start
+    size_after = os.path.getsize(database.DB_PATH)
+    print(
+        f"✅ {result['conversations']} conversation(s) / {result['messages']} message(s) "
+        f"archivé(s) en {elapsed:.2f}s, {result['pages_reclaimed']} page(s) libérée(s) "
+        f"({size_before / 1024:.0f} Ko → {size_after / 1024:.0f} Ko)"
+    )
+
+
+if __name__ == "__main__":
+    main()
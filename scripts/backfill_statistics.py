@@ -0,0 +1,33 @@
+"""Recompute per-conversation statistics counters from stored messages.
+
+Migration 5 already runs this once when it adds the counters; use this
+script to repair counters after manual edits to the messages table.
+
+Usage: python scripts/backfill_statistics.py [--session SESSION_ID]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import backfill_statistics, init_database  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--session", help="Limiter le recalcul à une conversation")
+    args = parser.parse_args()
+
+    init_database()
+    start = time.perf_counter()
+    refreshed = backfill_statistics(args.session)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {refreshed} conversation(s) recalculée(s) en {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: per-call sqlite3.connect vs the thread-local connection manager.
+
+Replays the database traffic of one /api/chat turn (ownership check, user
+message, history load, assistant message, statistics) against a temporary
+database, once with the historical connect-per-call pattern and once with
+``app.database.get_db_connection``.
+
+Usage: python scripts/bench_db_connections.py [--turns 500] [--history 40]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import database  # noqa: E402
+
+SESSION_ID = "bench-session"
+
+
+def _legacy_connect(path: str) -> sqlite3.Connection:
+    """Reproduce the old get_db_connection(): mkdir + fresh connect every call."""
+    Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _legacy_turn(path: str) -> None:
+    conn = _legacy_connect(path)
+    conn.execute("SELECT * FROM conversations WHERE session_id = ?", (SESSION_ID,)).fetchone()
+    conn.close()
+
+    for role in ("user", "assistant"):
+        conn = _legacy_connect(path)
+        conn.execute(
+            "INSERT INTO messages (session_id, role, content, tokens_used) VALUES (?, ?, ?, ?)",
+            (SESSION_ID, role, "bench message " * 20, 40),
+        )
+        conn.execute(
+            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE session_id = ?",
+            (SESSION_ID,),
+        )
+        conn.commit()
+        conn.close()
+
+        if role == "user":
+            conn = _legacy_connect(path)
+            conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY timestamp ASC",
+                (SESSION_ID,),
+            ).fetchall()
+            conn.close()
+
+    conn = _legacy_connect(path)
+    conn.execute("SELECT role, tokens_used FROM messages WHERE session_id = ?", (SESSION_ID,)).fetchall()
+    conn.execute("SELECT response_time_avg FROM statistics WHERE session_id = ?", (SESSION_ID,)).fetchone()
+    conn.close()
+
+
+def _managed_turn() -> None:
+    database.get_conversation_by_id(SESSION_ID)
+    database.save_message(SESSION_ID, "user", "bench message " * 20, tokens_used=40)
+    database.get_conversation_history(SESSION_ID)
+    database.save_message(SESSION_ID, "assistant", "bench message " * 20, tokens_used=40)
+    database.get_statistics(SESSION_ID)
+
+
+def _prepare(path: str, history: int) -> None:
+    database.DB_PATH = path
+    database.init_database()
+    database.create_conversation(1, "bench", SESSION_ID)
+    for idx in range(history):
+        database.save_message(SESSION_ID, "user" if idx % 2 == 0 else "assistant", "seed " * 50, 50)
+    database.close_db_connection()
+
+
+def _run(label: str, turns: int, func) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        func()
+    elapsed = time.perf_counter() - start
+    per_turn = elapsed / turns * 1000
+    print(f"{label:<28} {elapsed:8.3f}s total  {per_turn:8.3f} ms/turn")
+    return per_turn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--history", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        managed_path = os.path.join(tmp, "managed.db")
+
+        # The legacy database must keep the default rollback journal
+        _prepare(legacy_path, args.history)
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        _prepare(managed_path, args.history)
+
+        print(f"{args.turns} tours simulés, {args.history} messages initiaux\n")
+        legacy = _run("connect() par appel", args.turns, lambda: _legacy_turn(legacy_path))
+        database.DB_PATH = managed_path
+        managed = _run("connexion thread-local + WAL", args.turns, _managed_turn)
+        database.close_db_connection()
+
+        print(f"\nGain : x{legacy / managed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Micro-benchmarks of the hot paths, with JSON baselines.
+
+Runs offline against synthetic data: tool selection
+(``_normalize_for_matching``, ``_assess_tool_query`` over every tool), each
+``_format_*_results`` formatter, ``_query_arxiv_feed`` parsing of Atom feeds
+shaped like arXiv API responses, ``get_conversation_history`` and
+``get_statistics`` on a large temporary database, and every exporter.
+
+Each benchmark reports the best per-call time over ``--repeat`` rounds.
+``--save`` writes the results as a JSON baseline; ``--compare`` reads one
+and flags every benchmark slower than the baseline by more than
+``--threshold`` (exit status 1), so a run can gate a change.
+
+Usage: python scripts/bench_hot_paths.py [--filter db.] [--repeat 5]
+       [--save scripts/bench_baseline.json]
+       [--compare scripts/bench_baseline.json] [--threshold 0.25]
+       [--conversations 40] [--turns 250]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import database, utils  # noqa: E402
+from app.agent import QuantumMindAgent  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+
+QUERIES = [
+    "Quels sont les derniers papers arXiv sur les modèles de diffusion ?",
+    "Compare les scores MT-Bench de Llama 3.1 405B et Qwen2.5 72B",
+    "Trouve un modèle Hugging Face pour la traduction français-anglais en production",
+    "Quelles sont les tendances IA cette semaine sur GitHub ?",
+    "Donne-moi un résumé des benchmarks MMLU et GSM8K les plus utilisés",
+    "Bonjour, peux-tu m'expliquer ce qu'est un transformer ?",
+    "Recherche web : dernières annonces de Mistral AI",
+    "Digest arXiv des preprints cs.CL publiés aujourd'hui avec résumé TL;DR",
+]
+
+
+class _RecordedResponse:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def _atom_feed(entries: int) -> str:
+    """An arXiv API response with ``entries`` papers"""
+    parts = ["<?xml version='1.0' encoding='UTF-8'?>", "<feed xmlns='http://www.w3.org/2005/Atom'>"]
+    for idx in range(entries):
+        arxiv_id = f"2510.{10000 + idx:05d}"
+        summary = (
+            f"We propose method {idx}, a scalable approach to efficient training of large language models. "
+            "Our experiments on reasoning, code and multilingual benchmarks show consistent gains over strong "
+            "baselines while reducing inference cost & memory. Code and checkpoints are released. " * 2
+        )
+        authors = "".join(f"<author><name>Author {idx}-{a}</name></author>" for a in range(5))
+        parts.append(
+            f"<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id>"
+            f"<published>2025-10-{idx % 28 + 1:02d}T17:59:{idx % 60:02d}Z</published>"
+            f"<title>Efficient Scaling of Transformers, Part {idx}</title>"
+            f"<summary>{escape(summary)}</summary>{authors}"
+            f"<link href='http://arxiv.org/abs/{arxiv_id}v1' rel='alternate' type='text/html'/>"
+            f"<link title='pdf' href='http://arxiv.org/pdf/{arxiv_id}v1' rel='related' type='application/pdf'/>"
+            "<category term='cs.CL' scheme='http://arxiv.org/schemas/atom'/></entry>"
+        )
+    parts.append("</feed>")
+    return "".join(parts)
+
+
+def _formatter_inputs(papers: list[dict]) -> dict[str, object]:
+    models = [
+        {
+            "modelId": f"org-{idx}/model-{idx}-7b-instruct",
+            "pipeline_tag": "text-generation",
+            "downloads": 1000 * (idx + 1) ** 2,
+            "likes": 10 * idx,
+            "lastModified": "2025-10-01T12:00:00.000Z",
+            "tags": ["transformers", "safetensors", "license:apache-2.0", "fr", "en"],
+            "_quality_score": idx % 5,
+        }
+        for idx in range(10)
+    ]
+    datasets = [
+        {
+            "id": ("openai/" if idx % 4 == 0 else "community/") + f"benchmark-{idx}",
+            "tags": ["task:question-answering", "task:text-generation", "modality:text", "language:en"],
+            "downloads": 500 * (idx + 1) ** 2,
+            "likes": 5 * idx,
+            "lastModified": "2025-09-15T08:00:00.000Z",
+            "description": "Evaluation suite for reasoning and knowledge across many domains.",
+        }
+        for idx in range(10)
+    ]
+    search = [
+        {
+            "title": f"Résultat {idx} : annonce modèle open-weight",
+            "link": ("https://en.wikipedia.org/wiki/LLM" if idx % 3 == 0 else f"https://news.example.org/{idx}"),
+            "snippet": "Le nouveau modèle atteint l'état de l'art sur plusieurs benchmarks publics. " * 2,
+        }
+        for idx in range(10)
+    ]
+    trends = {
+        "github_trending": [
+            {"name": f"org/repo-{idx}", "url": f"https://github.com/org/repo-{idx}", "stars": 8000 * idx,
+             "description": "Framework for efficient LLM inference and serving", "language": "Python",
+             "updated": "2025-10-10"}
+            for idx in range(8)
+        ],
+        "papers_with_code": [
+            {"title": f"SOTA paper {idx}", "url": f"https://paperswithcode.com/paper/{idx}", "stars": 300,
+             "date": "2025-10-01", "abstract": "A new state of the art on ImageNet and COCO. " * 5}
+            for idx in range(5)
+        ],
+        "arxiv_hot_topics": [
+            {"category": cat, "activity": "🔥", "recent_count": 120}
+            for cat in ("cs.AI", "cs.LG", "cs.CL", "cs.CV", "stat.ML")
+        ],
+        "timestamp": 1760000000.0,
+    }
+    return {
+        "huggingface": models,
+        "ai_benchmark": datasets,
+        "search": search,
+        "arxiv": papers[:10],
+        "arxiv_digest": papers[:10],
+        "ai_trends": trends,
+    }
+
+
+def _populate(conversations: int, turns: int) -> str:
+    """Fill the database with ``conversations`` x ``turns`` chat turns, return the last session id"""
+    with database.get_db_connection() as conn:
+        conn.execute("INSERT INTO users (username, password_hash) VALUES ('bench', 'x')")
+    session_id = ""
+    for conv in range(conversations):
+        session_id = f"bench-{conv}"
+        database.create_conversation(1, "bench", session_id)
+        for turn in range(turns):
+            database.save_chat_turn(
+                session_id,
+                f"Question {turn} : quels sont les derniers résultats sur **MMLU** ? " * 2,
+                f"## Réponse {turn}\n\n| Modèle | Score |\n|---|---|\n| A | 9.1 |\n\n" + "Détail de l'analyse. " * 40,
+                user_tokens=30, assistant_tokens=250, response_time=1.5,
+            )
+    return session_id
+
+
+def _benchmarks(agent: QuantumMindAgent, session_id: str) -> dict[str, object]:
+    tools = list(agent.tool_configs)
+    normalized = [agent._normalize_for_matching(query) for query in QUERIES]
+
+    def assess_all() -> None:
+        for query, text in zip(QUERIES, normalized):
+            tokens = set(text.split())
+            for tool in tools:
+                agent._assess_tool_query(tool, query, text, tokens, consider_cooldown=False)
+
+    feeds = {size: _atom_feed(size) for size in (10, 100)}
+
+    def parse_feed(size: int):
+        def run():
+            agent._http_get = lambda url, **kwargs: _RecordedResponse(feeds[size])
+            return agent._query_arxiv_feed("cat:cs.CL", size)
+        return run
+
+    papers = parse_feed(100)()
+    inputs = _formatter_inputs(papers)
+    history = database.get_conversation_history(session_id)
+    stats = database.get_statistics(session_id)
+
+    benchmarks: dict[str, object] = {
+        "agent.normalize_for_matching": lambda: [agent._normalize_for_matching(q) for q in QUERIES],
+        "agent.assess_tool_query.all_tools": assess_all,
+        "arxiv.parse_feed.10": parse_feed(10),
+        "arxiv.parse_feed.100": parse_feed(100),
+    }
+    for name, payload in inputs.items():
+        formatter = getattr(agent, f"_format_{name}_results")
+        benchmarks[f"format.{name}"] = lambda formatter=formatter, payload=payload: formatter(payload)
+
+    def uncached(func):
+        def run():
+            database.invalidate_conversation_cache()
+            return func()
+        return run
+
+    benchmarks.update({
+        "db.history.full": uncached(lambda: database.get_conversation_history(session_id)),
+        "db.history.page50": uncached(lambda: database.get_conversation_history(session_id, limit=50)),
+        "db.statistics": uncached(lambda: database.get_statistics(session_id)),
+        "export.markdown": lambda: "".join(utils.stream_markdown(session_id, "bench", history)),
+        "export.json": lambda: "".join(utils.stream_json(session_id, "bench", history)),
+        "export.markdown.from_db": lambda: sum(
+            len(part) for part in utils.stream_markdown(
+                session_id, "bench", database.iter_conversation_messages(session_id)
+            )
+        ),
+    })
+    if utils.REPORTLAB_AVAILABLE:
+        benchmarks["export.pdf"] = lambda: utils.render_pdf("bench", stats, history[:200], exported_on="-")
+    return benchmarks
+
+
+def _measure(func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} µs"
+    return f"{seconds * 1e3:8.2f} ms"
+
+
+def _compare(results: dict[str, float], baseline: dict, args: argparse.Namespace) -> int:
+    reference = baseline["results"]
+    meta = baseline["meta"]
+    threshold = args.threshold
+    regressions = 0
+    print(f"\nComparaison avec la référence du {meta['created']} (seuil ±{threshold:.0%})")
+    if (meta["conversations"], meta["turns"]) != (args.conversations, args.turns):
+        print(
+            f"attention : référence mesurée sur {meta['conversations']} x {meta['turns']} tours, "
+            "les temps db.* et export.* ne sont pas comparables"
+        )
+    for name, seconds in results.items():
+        if name not in reference:
+            print(f"{name:<36} {_format_time(seconds)}  (absent de la référence)")
+            continue
+        ratio = seconds / reference[name]
+        status = ""
+        if ratio > 1 + threshold:
+            status = "RÉGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            status = "amélioration"
+        print(f"{name:<36} {_format_time(reference[name])} -> {_format_time(seconds)}  x{ratio:5.2f}  {status}")
+    for name in sorted(set(reference) - set(results)):
+        if args.filter in name:
+            print(f"{name:<36} non mesuré dans cette exécution")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=250, help="chat turns per synthetic conversation")
+    parser.add_argument("--save", nargs="?", const=str(DEFAULT_BASELINE), help="write the results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=str(DEFAULT_BASELINE), help="compare with a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="tolerated slowdown ratio (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        database.DB_PATH = os.path.join(db_dir, "bench.db")
+        database.init_database()
+        started = time.perf_counter()
+        session_id = _populate(args.conversations, args.turns)
+        print(
+            f"Base synthétique : {args.conversations} conversations x {args.turns} tours "
+            f"({args.conversations * args.turns * 2} messages) en {time.perf_counter() - started:.1f}s"
+        )
+
+        agent = QuantumMindAgent(api_key="")
+        results: dict[str, float] = {}
+        for name, func in _benchmarks(agent, session_id).items():
+            if args.filter in name:
+                results[name] = _measure(func, args.repeat)
+                print(f"{name:<36} {_format_time(results[name])}")
+        database.close_db_connection()
+
+    regressions = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = _compare(results, json.load(handle), args)
+
+    if args.save:
+        baseline = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "conversations": args.conversations,
+                "turns": args.turns,
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"\nRéférence enregistrée dans {args.save}")
+
+    if regressions:
+        print(f"\n{regressions} régression(s) au-delà de {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark: login throughput under concurrent load.
+
+Drives ``POST /api/login`` from many threads against a temporary database
+while other threads keep reading the conversation list, once per password
+hasher pool size. Reports logins/s, login latency, and the latency of the
+concurrent reads, which shows how much CPU the hashing burst takes from
+the rest of the API. A pool as large as the client count approximates the
+previous behaviour of hashing on every request thread.
+
+Usage: python scripts/bench_login.py [--clients 16] [--readers 4]
+       [--duration 5] [--pools 16,4,2]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import auth, database  # noqa: E402
+
+
+def _summary(latencies: list[float], duration: float) -> dict:
+    latencies = sorted(latencies) or [0.0]
+    return {
+        "count": len(latencies),
+        "rate": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def _load(app, users: int, clients: int, readers: int, duration: float) -> tuple[dict, dict, int]:
+    logins: list[float] = []
+    reads: list[float] = []
+    rejected = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def login_worker(offset: int) -> None:
+        client = app.test_client()
+        local, busy, idx = [], 0, offset
+        while time.monotonic() < stop_at:
+            credentials = {"username": f"bench{idx % users}", "password": "bench-password"}
+            started = time.perf_counter()
+            status = client.post("/api/login", json=credentials).status_code
+            if status == 503:
+                busy += 1
+            else:
+                local.append(time.perf_counter() - started)
+            idx += 1
+        with lock:
+            logins.extend(local)
+            rejected[0] += busy
+
+    def read_worker() -> None:
+        client = app.test_client()
+        client.post("/api/login", json={"username": "bench0", "password": "bench-password"})
+        local = []
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            client.get("/api/conversations")
+            local.append(time.perf_counter() - started)
+        with lock:
+            reads.extend(local)
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(clients)]
+    threads += [threading.Thread(target=read_worker) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summary(logins, duration), _summary(reads, duration), rejected[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--pools", default="16,4,2", help="password hasher pool sizes to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        database.DB_PATH = os.path.join(db_dir, "bench.db")
+        database.init_database()
+        from app.server import build_app
+
+        app = build_app()
+        for idx in range(args.users):
+            auth.create_user(f"bench{idx}", "bench-password")
+
+        print(
+            f"{args.clients} login clients, {args.readers} readers, {args.duration:.0f}s, "
+            f"{auth.PASSWORD_HASH_ALGORITHM} ({auth.PASSWORD_HASH_ITERATIONS} it.), {os.cpu_count()} CPU"
+        )
+        for size in (int(value) for value in args.pools.split(",")):
+            hasher = auth.PasswordHasher(max_workers=size, max_queue=args.clients + args.readers)
+            with mock.patch.object(auth, "_hasher", hasher):
+                login, read, rejected = _load(app, args.users, args.clients, args.readers, args.duration)
+            hasher.shutdown()
+            print(
+                f"pool {size:>3}  login {login['rate']:7.1f}/s  p50 {login['p50_ms']:7.1f} ms  "
+                f"p95 {login['p95_ms']:7.1f} ms  ({rejected} 503)  |  lectures {read['rate']:7.1f}/s  "
+                f"p95 {read['p95_ms']:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
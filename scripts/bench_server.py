@@ -0,0 +1,150 @@
+"""Benchmark: Flask development server vs the production server mode.
+
+Starts ``main.py`` twice against a temporary database, once as the
+development server and once with ``--production``, then drives both with
+the same concurrent load on authenticated read endpoints (conversation
+list, paginated history, statistics) and reports throughput and latency.
+
+Usage: python scripts/bench_server.py [--clients 16] [--duration 10]
+       [--workers 3] [--threads 4]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/api/check-auth", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def _prepare(base_url: str) -> tuple[requests.Session, str]:
+    client = requests.Session()
+    credentials = {"username": "bench", "password": "bench-password"}
+    client.post(f"{base_url}/api/register", json=credentials)
+    client.post(f"{base_url}/api/login", json=credentials).raise_for_status()
+    session_id = client.post(f"{base_url}/api/conversations", json={}).json()["session_id"]
+    return client, session_id
+
+
+def _run_load(base_url: str, cookies, session_id: str, clients: int, duration: float) -> dict:
+    paths = [
+        "/api/conversations",
+        f"/api/history/{session_id}?limit=50",
+        f"/api/statistics/{session_id}",
+    ]
+    latencies: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(offset: int) -> None:
+        client = requests.Session()
+        client.cookies.update(cookies)
+        local, failed, idx = [], 0, offset
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = client.get(base_url + paths[idx % len(paths)]).status_code == 200
+            except requests.RequestException:
+                # Keep-alive connection closed by a recycled worker
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += not ok
+            idx += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def bench(mode: str, args: argparse.Namespace, db_dir: str) -> dict:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        FLASK_ENV="production",
+        FLASK_PORT=str(port),
+        DATABASE_PATH=os.path.join(db_dir, f"{mode}.db"),
+        SCHEDULER_LOCK_FILE=os.path.join(db_dir, f"{mode}.lock"),
+        MT_BENCH_REFRESH_INTERVAL="0",
+        ARCHIVE_AFTER_DAYS="0",
+    )
+    command = [sys.executable, str(ROOT / "main.py")]
+    if mode == "production":
+        command += ["--production", "--workers", str(args.workers), "--threads", str(args.threads)]
+
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base_url)
+        client, session_id = _prepare(base_url)
+        _run_load(base_url, client.cookies, session_id, args.clients, 1.0)  # warm connections
+        return _run_load(base_url, client.cookies, session_id, args.clients, args.duration)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.duration:.0f}s, {os.cpu_count()} CPU")
+    with tempfile.TemporaryDirectory() as db_dir:
+        for mode in ("development", "production"):
+            result = bench(mode, args, db_dir)
+            print(
+                f"{mode:<12} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:6.1f} ms  "
+                f"p95 {result['p95_ms']:6.1f} ms  ({result['requests']} req, {result['errors']} erreurs)"
+            )
+
+
+if __name__ == "__main__":
+    main()
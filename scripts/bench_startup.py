@@ -0,0 +1,95 @@
+"""Benchmark: cold start of the application.
+
+Each run starts a fresh interpreter against a temporary database and times
+the import of the app, ``build_app()``, schema initialization of the new
+database, a second ``init_database()`` (the already-current fast path) and
+the first requests served (``/api/check-auth``, then the main page). It
+also lists which heavy optional modules were imported along the way.
+
+Usage: python scripts/bench_startup.py [--runs 5] [--max-ms 1500]
+
+With ``--max-ms`` the script exits with status 1 when the median time to
+the first request exceeds the budget, so CI can catch regressions.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("google.generativeai", "markdown", "reportlab")
+
+CHILD = f"""
+import json, sys, time
+started = time.perf_counter()
+timings = {{}}
+
+def mark(name):
+    timings[name] = (time.perf_counter() - started) * 1000
+
+from app.server import build_app
+from app import database
+mark("import")
+app = build_app()
+mark("build_app")
+database.init_database()
+mark("init_database")
+database.init_database()
+mark("init_database_again")
+client = app.test_client()
+assert client.get("/api/check-auth").status_code == 200
+mark("first_request")
+assert client.get("/").status_code == 200
+mark("main_page")
+timings["heavy_modules"] = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps(timings))
+"""
+
+PHASES = ("import", "build_app", "init_database", "init_database_again", "first_request", "main_page")
+
+
+def _run_once(db_dir: str, idx: int) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(db_dir, f"startup-{idx}.db"),
+        MT_BENCH_REFRESH_INTERVAL="0",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="budget for the median time to the first request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        _run_once(db_dir, -1)  # populate __pycache__ so every measured run is comparable
+        runs = [_run_once(db_dir, idx) for idx in range(args.runs)]
+
+    print(f"{args.runs} démarrages à froid, temps cumulés depuis le lancement de l'interpréteur")
+    previous = 0.0
+    medians = {}
+    for phase in PHASES:
+        medians[phase] = statistics.median(run[phase] for run in runs)
+        print(f"{phase:<20} {medians[phase]:8.1f} ms  (+{medians[phase] - previous:6.1f} ms)")
+        previous = medians[phase]
+    print(f"modules lourds importés : {', '.join(runs[-1]['heavy_modules']) or 'aucun'}")
+
+    if args.max_ms is not None and medians["first_request"] > args.max_ms:
+        print(f"première requête après {medians['first_request']:.0f} ms > budget {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import sqlite3
+import threading
+import unittest
+from unittest import mock
+
+from app import auth, database, metrics
+
+from tests.test_routes import RouteTestCase
+
+
+def _legacy_hash(password, salt='0123456789abcdef'):
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
+    return f'{salt}${digest.hex()}'
+
+
+def _stored_hash(username):
+    row = database.get_db_connection().execute(
+        'SELECT password_hash FROM users WHERE username = ?', (username,)
+    ).fetchone()
+    return row[0]
+
+
+class TestPasswordHashes(unittest.TestCase):
+    def test_hash_records_algorithm_and_cost(self) -> None:
+        with mock.patch.object(auth, 'PASSWORD_HASH_ITERATIONS', 1000):
+            stored = auth.hash_password('secret1')
+            self.assertTrue(stored.startswith('pbkdf2_sha256$1000$'))
+            self.assertTrue(auth.verify_password('secret1', stored))
+            self.assertFalse(auth.verify_password('secret2', stored))
+            self.assertFalse(auth.needs_rehash(stored))
+
+    def test_legacy_hash_verifies_and_needs_rehash(self) -> None:
+        stored = _legacy_hash('secret1')
+        self.assertTrue(auth.verify_password('secret1', stored))
+        self.assertTrue(auth.needs_rehash(stored))
+
+    def test_scrypt_hashes(self) -> None:
+        with mock.patch.multiple(auth, PASSWORD_HASH_ALGORITHM='scrypt', PASSWORD_HASH_SCRYPT_N=1024):
+            stored = auth.hash_password('secret1')
+            self.assertTrue(stored.startswith('scrypt$1024$8$1$'))
+            self.assertTrue(auth.verify_password('secret1', stored))
+        self.assertTrue(auth.needs_rehash(stored))
+
+    def test_malformed_hash_is_rejected(self) -> None:
+        for stored in ('', 'nonsense', 'md5$1$2$3', 'pbkdf2_sha256$many$salt$hash'):
+            self.assertFalse(auth.verify_password('secret1', stored))
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def test_work_runs_on_pool_threads(self) -> None:
+        hasher = auth.PasswordHasher(max_workers=1, max_queue=0)
+        self.addCleanup(hasher.shutdown)
+        name = hasher.run(lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('password-hash'))
+
+    def test_full_pool_rejects_work(self) -> None:
+        hasher = auth.PasswordHasher(max_workers=1, max_queue=0)
+        self.addCleanup(hasher.shutdown)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=hasher.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(auth.PasswordHasherBusy):
+                hasher.run(len, 'x')
+            self.assertEqual(hasher.running, 1)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(hasher.run(len, 'x'), 1)
+
+    def test_timed_out_call_keeps_its_slot(self) -> None:
+        hasher = auth.PasswordHasher(max_workers=1, max_queue=0, timeout=0.01)
+        self.addCleanup(hasher.shutdown)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with self.assertRaises(auth.PasswordHasherBusy):
+            hasher.run(release.wait, 5)
+        rejected = metrics.PASSWORD_HASH_DECISIONS.value(outcome='rejected')
+        with self.assertRaises(auth.PasswordHasherBusy):
+            hasher.run(len, 'x')
+        self.assertEqual(metrics.PASSWORD_HASH_DECISIONS.value(outcome='rejected'), rejected + 1)
+
+        release.set()
+        hasher.shutdown()
+        self.assertEqual(hasher.run(len, 'x'), 1)
+
+
+class TestLogin(RouteTestCase):
+    def test_legacy_hash_is_upgraded_on_login(self) -> None:
+        with database.get_db_connection() as conn:
+            conn.execute(
+                'INSERT INTO users (username, password_hash) VALUES (?, ?)', ('bob', _legacy_hash('secret1'))
+            )
+        credentials = {'username': 'bob', 'password': 'secret1'}
+
+        self.assertEqual(self.client.post('/api/login', json=credentials).status_code, 200)
+        upgraded = _stored_hash('bob')
+        self.assertTrue(upgraded.startswith(f'pbkdf2_sha256${auth.PASSWORD_HASH_ITERATIONS}$'))
+
+        self.assertEqual(self.client.post('/api/login', json=credentials).status_code, 200)
+        self.assertEqual(_stored_hash('bob'), upgraded)
+
+    def test_failed_login_keeps_the_stored_hash(self) -> None:
+        stored = _stored_hash('alice')
+        with mock.patch.object(auth, 'PASSWORD_HASH_ITERATIONS', 1000):
+            response = self.client.post('/api/login', json={'username': 'alice', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(_stored_hash('alice'), stored)
+
+    def test_cost_change_is_applied_on_next_login(self) -> None:
+        with mock.patch.object(auth, 'PASSWORD_HASH_ITERATIONS', 1000):
+            self.client.post('/api/login', json={'username': 'alice', 'password': 'secret1'})
+        self.assertTrue(_stored_hash('alice').startswith('pbkdf2_sha256$1000$'))
+
+    def test_failed_hash_upgrade_still_logs_in(self) -> None:
+        stored = _stored_hash('alice')
+        credentials = {'username': 'alice', 'password': 'secret1'}
+        real_run = auth.get_password_hasher().run
+
+        def busy_rehash(func, *args):
+            if func is auth.hash_password:
+                raise auth.PasswordHasherBusy()
+            return real_run(func, *args)
+
+        for patcher in (
+            mock.patch.object(auth.get_password_hasher(), 'run', side_effect=busy_rehash),
+            mock.patch.object(auth, 'run_write', side_effect=sqlite3.OperationalError('database is locked')),
+        ):
+            with self.subTest(failure=patcher.attribute), \
+                    mock.patch.object(auth, 'PASSWORD_HASH_ITERATIONS', 1000), patcher, \
+                    self.assertLogs('app.auth', 'WARNING'):
+                self.assertEqual(self.client.post('/api/login', json=credentials).status_code, 200)
+            self.assertEqual(_stored_hash('alice'), stored)
+
+    def test_saturated_hasher_returns_503(self) -> None:
+        hasher = mock.Mock(run=mock.Mock(side_effect=auth.PasswordHasherBusy()))
+        with mock.patch.object(auth, '_hasher', hasher):
+            login = self.client.post('/api/login', json={'username': 'alice', 'password': 'secret1'})
+            register = self.client.post('/api/register', json={'username': 'carol', 'password': 'secret1'})
+        for response in (login, register):
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
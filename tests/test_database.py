@@ -0,0 +1,439 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import zlib
+
+from app import database
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Point app.database at a throwaway file for the duration of a test."""
+
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self._tmpdir.name, 'test.db')
+        database.init_database()
+
+    def tearDown(self) -> None:
+        database.close_db_connection()
+        database.DB_PATH = self._original_path
+        self._tmpdir.cleanup()
+
+
+class TestConnectionManager(DatabaseTestCase):
+    def test_connection_is_reused_within_a_thread(self) -> None:
+        self.assertIs(database.get_db_connection(), database.get_db_connection())
+
+    def test_each_thread_gets_its_own_connection(self) -> None:
+        main_conn = database.get_db_connection()
+        seen = []
+
+        def worker() -> None:
+            seen.append(database.get_db_connection())
+            database.close_db_connection()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(len(seen), 1)
+        self.assertIsNot(seen[0], main_conn)
+
+    def test_pragmas_are_applied(self) -> None:
+        conn = database.get_db_connection()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        # 1 == NORMAL
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(
+            conn.execute('PRAGMA busy_timeout').fetchone()[0],
+            database.SQLITE_BUSY_TIMEOUT_MS,
+        )
+
+    def test_changing_db_path_opens_a_new_connection(self) -> None:
+        first = database.get_db_connection()
+        database.DB_PATH = os.path.join(self._tmpdir.name, 'other.db')
+        self.assertIsNot(database.get_db_connection(), first)
+
+    def test_failed_write_is_rolled_back(self) -> None:
+        database.create_conversation(1, 'alice', 'session-1')
+        with self.assertRaises(Exception):
+            database.create_conversation(1, 'alice', 'session-1')
+
+        # The connection is still usable and not stuck in a transaction
+        self.assertFalse(database.get_db_connection().in_transaction)
+        database.save_message('session-1', 'user', 'hello')
+        self.assertEqual(len(database.get_conversation_history('session-1')), 1)
+
+
+class TestChatTurnWrites(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'turns')
+
+    def _response_stats(self):
+        return database.get_db_connection().execute(
+            'SELECT response_count, response_time_avg FROM statistics WHERE session_id = ?',
+            ('turns',),
+        ).fetchone()
+
+    def test_turn_is_saved_in_one_commit(self) -> None:
+        conn = database.get_db_connection()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            ids = database.save_chat_turn('turns', 'question', 'answer', 1, 1, response_time=2.0)
+        finally:
+            conn.set_trace_callback(None)
+
+        self.assertEqual(sum(1 for sql in statements if sql.strip().upper() == 'COMMIT'), 1)
+        history = database.get_conversation_history('turns')
+        self.assertEqual([(m['id'], m['role']) for m in history], [
+            (ids['user_message_id'], 'user'),
+            (ids['assistant_message_id'], 'assistant'),
+        ])
+
+    def test_failed_reply_does_not_leave_orphan_user_message(self) -> None:
+        with self.assertRaises(sqlite3.IntegrityError):
+            database.save_chat_turn('turns', 'question', None)
+        self.assertEqual(database.get_conversation_history('turns'), [])
+
+    def test_response_time_is_averaged(self) -> None:
+        database.save_chat_turn('turns', 'q1', 'a1', response_time=1.0)
+        database.save_chat_turn('turns', 'q2', 'a2', response_time=3.0)
+        count, average = self._response_stats()
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(average, 2.0)
+
+
+class TestStatistics(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'stats')
+
+    def test_counters_follow_writes(self) -> None:
+        database.save_message('stats', 'user', 'hello', tokens_used=3)
+        database.save_chat_turn('stats', 'q', 'a', user_tokens=2, assistant_tokens=10, response_time=1.5)
+        stats = database.get_statistics('stats')
+        self.assertEqual(stats['total_messages'], 3)
+        self.assertEqual(stats['user_messages'], 2)
+        self.assertEqual(stats['assistant_messages'], 1)
+        self.assertEqual(stats['total_tokens'], 15)
+        self.assertAlmostEqual(stats['response_time_avg'], 1.5)
+        self.assertAlmostEqual(stats['response_time_max'], 1.5)
+
+    def test_unknown_conversation_has_zero_statistics(self) -> None:
+        self.assertEqual(database.get_statistics('missing')['total_messages'], 0)
+
+    def test_backfill_matches_incremental_counters(self) -> None:
+        for idx in range(5):
+            database.save_chat_turn('stats', f'q{idx}', f'a{idx}', user_tokens=idx, assistant_tokens=2 * idx)
+        expected = database.get_statistics('stats')
+
+        conn = database.get_db_connection()
+        with conn:
+            conn.execute('UPDATE statistics SET total_messages = 0, user_messages = 0, total_tokens = 0')
+
+        self.assertEqual(database.backfill_statistics(), 1)
+        self.assertEqual(database.get_statistics('stats'), expected)
+
+
+class TestGroupCommit(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'busy')
+        self.writer = database.start_group_commit_writer(max_delay_ms=20)
+
+    def tearDown(self) -> None:
+        database.stop_group_commit_writer()
+        super().tearDown()
+
+    def test_concurrent_turns_share_commits(self) -> None:
+        barrier = threading.Barrier(16)
+        errors = []
+
+        def worker(idx: int) -> None:
+            try:
+                barrier.wait()
+                database.save_chat_turn('busy', f'q{idx}', f'a{idx}', response_time=0.5)
+            except Exception as exc:  # pragma: no cover - surfaced below
+                errors.append(exc)
+            finally:
+                database.close_db_connection()
+
+        threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(database.get_conversation_history('busy')), 32)
+        self.assertEqual(self.writer.writes, 16)
+        self.assertLess(self.writer.commits, 16)
+
+    def test_failing_write_does_not_poison_the_batch(self) -> None:
+        with self.assertRaises(sqlite3.IntegrityError):
+            database.save_chat_turn('busy', 'question', None)
+        database.save_chat_turn('busy', 'question', 'answer')
+        self.assertEqual(len(database.get_conversation_history('busy')), 2)
+
+
+class TestHistoryPagination(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'long')
+        for idx in range(7):
+            database.save_message('long', 'user' if idx % 2 == 0 else 'assistant', f'message {idx}')
+
+    def test_full_history_is_unchanged_without_arguments(self) -> None:
+        contents = [m['content'] for m in database.get_conversation_history('long')]
+        self.assertEqual(contents, [f'message {idx}' for idx in range(7)])
+
+    def test_last_page_is_newest_messages_in_order(self) -> None:
+        page = database.get_conversation_history('long', limit=3)
+        self.assertEqual([m['content'] for m in page], ['message 4', 'message 5', 'message 6'])
+
+    def test_before_id_walks_back_without_overlap(self) -> None:
+        seen = []
+        before_id = None
+        while True:
+            page = database.get_conversation_history('long', before_id=before_id, limit=3)
+            if not page:
+                break
+            seen = page + seen
+            before_id = page[0]['id']
+        self.assertEqual([m['content'] for m in seen], [f'message {idx}' for idx in range(7)])
+
+    def test_streamed_messages_match_full_history(self) -> None:
+        streamed = list(database.iter_conversation_messages('long', batch_size=3))
+        self.assertEqual(streamed, database.get_conversation_history('long'))
+
+
+class TestFullTextSearch(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'rag')
+        database.save_message('rag', 'user', 'Explique le retrieval augmented generation')
+        database.save_message('rag', 'assistant', 'Le RAG combine un retriever et un générateur. Retrieval retrieval!')
+        database.create_conversation(1, 'alice', 'vision')
+        database.save_message('vision', 'user', 'Quels modèles de vision pour la détection ?')
+        database.save_message('vision', 'assistant', 'YOLO reste populaire; le retrieval est rare ici.')
+        database.create_conversation(2, 'bob', 'bob-rag')
+        database.save_message('bob-rag', 'user', 'retrieval augmented generation')
+
+    def test_results_are_ranked_and_scoped_to_user(self) -> None:
+        results = database.search_conversations(1, 'retrieval')
+        self.assertEqual([r['session_id'] for r in results], ['rag', 'vision'])
+
+    def test_snippet_is_highlighted_and_escaped(self) -> None:
+        database.create_conversation(1, 'alice', 'html')
+        database.save_message('html', 'user', '<script>quantization</script> tricks')
+        result = database.search_conversations(1, 'quantization')[0]
+        self.assertIn('<mark>quantization</mark>', result['snippet'])
+        self.assertIn('&lt;script&gt;', result['snippet'])
+
+    def test_accents_and_prefixes_match(self) -> None:
+        self.assertEqual(database.search_conversations(1, 'generateur')[0]['session_id'], 'rag')
+        self.assertEqual(database.search_conversations(1, 'détec')[0]['session_id'], 'vision')
+
+    def test_pagination(self) -> None:
+        first = database.search_conversations(1, 'retrieval', limit=1, offset=0)
+        second = database.search_conversations(1, 'retrieval', limit=1, offset=1)
+        self.assertEqual([first[0]['session_id'], second[0]['session_id']], ['rag', 'vision'])
+
+    def test_index_follows_deletes(self) -> None:
+        database.delete_conversation('rag')
+        results = database.search_conversations(1, 'retrieval')
+        self.assertEqual([r['session_id'] for r in results], ['vision'])
+
+    def test_query_syntax_is_neutralised(self) -> None:
+        self.assertEqual(database.search_conversations(1, '"NEAR( OR *'), [])
+        self.assertEqual(database.search_conversations(1, '???'), [])
+
+    def test_migration_backfills_existing_messages(self) -> None:
+        conn = database.get_db_connection()
+        with conn:
+            for trigger in ('insert', 'delete', 'update'):
+                conn.execute(f'DROP TRIGGER messages_fts_{trigger}')
+            conn.execute('DROP TABLE messages_fts')
+        self.assertEqual(database.search_conversations(1, 'yolo')[0]['snippet'], None)
+
+        with conn:
+            database._migration_002_messages_fts(conn.cursor())
+        self.assertIn('<mark>', database.search_conversations(1, 'yolo')[0]['snippet'])
+
+
+class TestArchival(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'cold')
+        database.create_conversation(1, 'alice', 'warm')
+        for idx in range(20):
+            database.save_chat_turn('cold', f'question {idx}', 'réponse détaillée ' * 50, 3, 40)
+        database.save_chat_turn('warm', 'question', 'réponse')
+        conn = database.get_db_connection()
+        with conn:
+            conn.execute(
+                "UPDATE conversations SET updated_at = datetime('now', '-60 days') WHERE session_id = 'cold'"
+            )
+        self.expected = database.get_conversation_history('cold')
+
+    def _hot_count(self, session_id: str) -> int:
+        return database.get_db_connection().execute(
+            'SELECT COUNT(*) FROM messages WHERE session_id = ?', (session_id,)
+        ).fetchone()[0]
+
+    def test_only_cold_conversations_are_archived(self) -> None:
+        result = database.archive_cold_conversations(30)
+        self.assertEqual((result['conversations'], result['messages']), (1, 40))
+        self.assertEqual(self._hot_count('cold'), 0)
+        self.assertEqual(self._hot_count('warm'), 2)
+        self.assertTrue(database.is_conversation_archived('cold'))
+
+        payload_size = database.get_db_connection().execute(
+            'SELECT raw_bytes, length(payload) FROM archived_conversations'
+        ).fetchone()
+        self.assertLess(payload_size[1], payload_size[0] / 5)
+
+    def test_history_is_rehydrated_transparently(self) -> None:
+        database.archive_cold_conversations(30, codec='lzma')
+        self.assertEqual(database.get_conversation_history('cold'), self.expected)
+        self.assertFalse(database.is_conversation_archived('cold'))
+        self.assertEqual(self._hot_count('cold'), 40)
+
+    def test_new_turn_rehydrates_the_archive(self) -> None:
+        database.archive_cold_conversations(30)
+        database.save_chat_turn('cold', 'encore', 'une réponse')
+        database.save_message('cold', 'user', 'et aussi')
+
+        history = database.get_conversation_history('cold')
+        self.assertEqual(history[:40], self.expected)
+        self.assertEqual([m['content'] for m in history[40:]], ['encore', 'une réponse', 'et aussi'])
+        self.assertFalse(database.is_conversation_archived('cold'))
+        self.assertEqual(database.get_statistics('cold')['total_messages'], 43)
+
+    def test_rendered_html_survives_archival(self) -> None:
+        database.save_chat_turn('cold', 'tableau', 'réponse', assistant_html='<p>réponse</p>')
+        conn = database.get_db_connection()
+        with conn:
+            conn.execute(
+                "UPDATE conversations SET updated_at = datetime('now', '-60 days') WHERE session_id = 'cold'"
+            )
+        database.archive_cold_conversations(30)
+
+        history = database.get_conversation_history('cold', with_html=True)
+        self.assertEqual(history[-1]['html'], '<p>réponse</p>')
+
+    def test_archives_without_html_are_rehydrated(self) -> None:
+        conn = database.get_db_connection()
+        rows = [tuple(row) for row in conn.execute(
+            "SELECT id, role, content, tokens_used, timestamp FROM messages WHERE session_id = 'cold' ORDER BY id"
+        )]
+        raw = json.dumps(rows, ensure_ascii=False).encode('utf-8')
+        with conn:
+            conn.execute(
+                'INSERT INTO archived_conversations (session_id, codec, message_count, raw_bytes, payload)'
+                " VALUES ('cold', 'zlib', ?, ?, ?)",
+                (len(rows), len(raw), zlib.compress(raw)),
+            )
+            conn.execute("DELETE FROM messages WHERE session_id = 'cold'")
+
+        self.assertEqual(database.get_conversation_history('cold'), self.expected)
+        self.assertIsNone(database.get_conversation_history('cold', with_html=True)[1]['html'])
+
+    def test_streamed_export_rehydrates(self) -> None:
+        database.archive_cold_conversations(30)
+        self.assertEqual(list(database.iter_conversation_messages('cold', batch_size=7)), self.expected)
+
+    def test_paginated_history_and_search_after_rehydration(self) -> None:
+        database.archive_cold_conversations(30)
+        page = database.get_conversation_history('cold', limit=4)
+        self.assertEqual(page, self.expected[-4:])
+        self.assertIn('cold', [r['session_id'] for r in database.search_conversations(1, 'question')])
+
+    def test_statistics_survive_archival(self) -> None:
+        before = database.get_statistics('cold')
+        database.archive_cold_conversations(30)
+        self.assertEqual(database.get_statistics('cold'), before)
+
+    def test_delete_removes_archive(self) -> None:
+        database.archive_cold_conversations(30)
+        database.delete_conversation('cold')
+        self.assertFalse(database.is_conversation_archived('cold'))
+
+    def test_free_pages_are_reclaimed(self) -> None:
+        conn = database.get_db_connection()
+        self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+        result = database.archive_cold_conversations(30)
+        self.assertGreater(result['pages_reclaimed'], 0)
+        self.assertEqual(conn.execute('PRAGMA freelist_count').fetchone()[0], 0)
+
+
+class TestDeletedConversation(DatabaseTestCase):
+    def test_writes_to_a_deleted_conversation_are_rolled_back(self) -> None:
+        database.create_conversation(1, 'alice', 'gone')
+        self.assertIsNotNone(database.get_conversation_meta('gone'))
+        # Deleted by another process: this one still has the metadata cached
+        with database.get_db_connection() as conn:
+            conn.execute("DELETE FROM conversations WHERE session_id = 'gone'")
+
+        timings = {'total': 1.0}
+        with self.assertRaises(database.ConversationNotFound):
+            database.save_chat_turn('gone', 'q', 'a', response_time=1.0, model='m', timings=timings)
+        with self.assertRaises(database.ConversationNotFound):
+            database.save_message('gone', 'user', 'q')
+
+        conn = database.get_db_connection()
+        for table in ('messages', 'statistics', 'turn_latencies'):
+            with self.subTest(table=table):
+                self.assertEqual(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0], 0)
+        self.assertIsNone(database.get_conversation_meta('gone'))
+
+
+class TestConversationCache(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.invalidate_conversation_cache()
+        database.create_conversation(1, 'alice', 'cached', model='gemini-pro', temperature=0.2)
+
+    def tearDown(self) -> None:
+        database.invalidate_conversation_cache()
+        super().tearDown()
+
+    def _count_selects(self, func, *args) -> int:
+        conn = database.get_db_connection()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            func(*args)
+        finally:
+            conn.set_trace_callback(None)
+        return sum(1 for sql in statements if 'FROM conversations' in sql)
+
+    def test_second_lookup_skips_the_database(self) -> None:
+        self.assertEqual(self._count_selects(database.get_conversation_meta, 'cached'), 1)
+        self.assertEqual(self._count_selects(database.get_conversation_meta, 'cached'), 0)
+        meta = database.get_conversation_meta('cached')
+        self.assertEqual((meta['user_id'], meta['model'], meta['temperature']), (1, 'gemini-pro', 0.2))
+
+    def test_settings_update_invalidates(self) -> None:
+        database.get_conversation_meta('cached')
+        database.update_conversation_settings('cached', temperature=0.9)
+        self.assertEqual(database.get_conversation_meta('cached')['temperature'], 0.9)
+
+    def test_delete_invalidates(self) -> None:
+        database.get_conversation_meta('cached')
+        database.delete_conversation('cached')
+        self.assertIsNone(database.get_conversation_meta('cached'))
+
+    def test_callers_cannot_poison_the_cache(self) -> None:
+        database.get_conversation_meta('cached')['user_id'] = 2
+        self.assertEqual(database.get_conversation_meta('cached')['user_id'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import random
+import unittest
+from unittest import mock
+
+from app import database
+from app.latency import LatencySketch
+
+from tests.test_database import DatabaseTestCase
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class TestLatencySketch(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(42)
+        self.values = [rng.lognormvariate(6, 1) for _ in range(5000)]
+
+    def test_quantiles_are_within_relative_accuracy(self) -> None:
+        sketch = LatencySketch()
+        for value in self.values:
+            sketch.add(value)
+
+        for q in (0.5, 0.95, 0.99):
+            expected = exact_quantile(self.values, q)
+            self.assertAlmostEqual(sketch.quantile(q), expected, delta=expected * 0.02)
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertEqual(sketch.max, max(self.values))
+
+    def test_merge_matches_single_sketch(self) -> None:
+        whole, left, right = LatencySketch(), LatencySketch(), LatencySketch()
+        for idx, value in enumerate(self.values):
+            whole.add(value)
+            (left if idx % 2 else right).add(value)
+        left.merge(right)
+        self.assertEqual(left.buckets, whole.buckets)
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(left.quantile(q), whole.quantile(q))
+        self.assertAlmostEqual(left.mean, whole.mean)
+
+    def test_json_round_trip(self) -> None:
+        sketch = LatencySketch()
+        for value in self.values[:100] + [0]:
+            sketch.add(value)
+        restored = LatencySketch.from_json(sketch.to_json())
+        self.assertEqual(restored.summary(), sketch.summary())
+
+    def test_empty_sketch(self) -> None:
+        self.assertIsNone(LatencySketch().quantile(0.5))
+
+
+class TestLatencyRecording(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        database.create_conversation(1, 'alice', 'timed')
+
+    def test_chat_turn_records_latency(self) -> None:
+        database.save_chat_turn(
+            'timed', 'q', 'a', response_time=1.2, model='gemini-pro',
+            timings={'total': 1.2, 'tools': 0.4, 'llm': 0.7, 'tool_calls': {'arxiv': 0.4}},
+        )
+        row = database.get_db_connection().execute(
+            'SELECT total_ms, tools_ms, llm_ms, tool_ms FROM turn_latencies'
+        ).fetchone()
+        self.assertEqual(tuple(row), (1200, 400, 700, '{"arxiv": 400}'))
+
+        groups = database.get_latency_percentiles('tool', group_by='tool')
+        self.assertEqual([g['key'] for g in groups], ['arxiv'])
+        self.assertEqual(groups[0]['count'], 1)
+
+    def test_percentiles_per_model(self) -> None:
+        for idx in range(1, 101):
+            database.record_turn_latency('timed', 'fast', {'total': idx / 1000}, recorded_at=1000)
+            database.record_turn_latency('timed', 'slow', {'total': idx / 100}, recorded_at=1000)
+
+        groups = {g['key']: g for g in database.get_latency_percentiles('turn', group_by='model')}
+        self.assertEqual(set(groups), {'fast', 'slow'})
+        self.assertAlmostEqual(groups['fast']['p50'], 50, delta=1)
+        self.assertAlmostEqual(groups['slow']['p99'], 990, delta=20)
+        self.assertEqual(groups['slow']['count'], 100)
+
+    def test_windows_and_time_range(self) -> None:
+        window = database.LATENCY_WINDOW_SECONDS
+        database.record_turn_latency('timed', 'm', {'total': 0.1}, recorded_at=window * 10)
+        database.record_turn_latency('timed', 'm', {'total': 0.2}, recorded_at=window * 11)
+        database.record_turn_latency('timed', 'm', {'total': 0.3}, recorded_at=window * 12)
+
+        groups = database.get_latency_percentiles('turn', group_by='window')
+        self.assertEqual([g['key'] for g in groups], [window * 10, window * 11, window * 12])
+
+        recent = database.get_latency_percentiles('turn', group_by=None, since=window * 11)
+        self.assertEqual(recent[0]['count'], 2)
+
+    def test_old_latencies_are_swept_on_write(self) -> None:
+        day = 86400
+        database.record_turn_latency('timed', 'm', {'total': 0.1}, recorded_at=day)
+        database.record_turn_latency('timed', 'm', {'total': 0.2}, recorded_at=day * 20)
+        with mock.patch.object(database, 'LATENCY_RETENTION_DAYS', 30):
+            database.record_turn_latency('timed', 'm', {'total': 0.3}, recorded_at=day * 40)
+
+        conn = database.get_db_connection()
+        recorded = [row[0] for row in conn.execute('SELECT recorded_at FROM turn_latencies ORDER BY id')]
+        self.assertEqual(recorded, [day * 20, day * 40])
+        groups = database.get_latency_percentiles('turn', group_by='window', since=0)
+        self.assertEqual([g['key'] for g in groups], [day * 20, day * 40])
+
+    def test_turn_without_timings_records_nothing(self) -> None:
+        database.save_chat_turn('timed', 'q', 'a', response_time=1.0)
+        self.assertEqual(database.get_latency_percentiles(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
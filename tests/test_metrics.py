@@ -0,0 +1,191 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app import database, metrics
+from app.agent import QuantumMindAgent
+
+from tests.test_routes import RouteTestCase
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = metrics.Registry()
+
+    def test_histogram_renders_cumulative_buckets(self) -> None:
+        histogram = self.registry.histogram('demo_seconds', 'Demo', ('route',), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, route='/a')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE demo_seconds histogram', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="1"} 3', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="+Inf"} 4', text)
+        self.assertIn('demo_seconds_sum{route="/a"} 4.05', text)
+        self.assertIn('demo_seconds_count{route="/a"} 4', text)
+
+    def test_counter_labels_are_escaped(self) -> None:
+        counter = self.registry.counter('demo_total', 'Demo', ('name',))
+        counter.inc(name='a"b')
+        counter.inc(2, name='a"b')
+        self.assertIn('demo_total{name="a\\"b"} 3', self.registry.render())
+
+    def test_wrong_labels_are_rejected(self) -> None:
+        counter = self.registry.counter('demo_total', 'Demo', ('name',))
+        with self.assertRaises(ValueError):
+            counter.inc(other='x')
+
+    def test_collectors_run_at_scrape_time(self) -> None:
+        gauge = self.registry.gauge('demo_value', 'Demo')
+        self.registry.add_collector(lambda: gauge.set(7))
+        self.assertIn('demo_value 7', self.registry.render())
+
+
+class TestMultiprocess(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = metrics.Registry()
+        self.requests = self.registry.counter('demo_total', 'Demo', ('route',))
+        self.latency = self.registry.histogram('demo_seconds', 'Demo', buckets=(1,))
+        self.busy = self.registry.gauge('demo_busy', 'Demo')
+        self.last_run = self.registry.gauge('demo_last_run', 'Demo', multiprocess_mode='max')
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.directory = self._tmpdir.name
+        self.registry.enable_multiprocess(self.directory)
+
+    def _worker_snapshot(self, pid, route_hits, busy, last_run):
+        snapshot = {
+            'demo_total': [[['/a'], route_hits]],
+            'demo_seconds': [[[], [route_hits, 0, 0.5 * route_hits]]],
+            'demo_busy': [[[], busy]],
+            'demo_last_run': [[[], last_run]],
+        }
+        with open(os.path.join(self.directory, f'{pid}-1.json'), 'w', encoding='utf-8') as handle:
+            json.dump(snapshot, handle)
+
+    def test_scrape_sums_every_worker_and_keeps_dead_counters(self) -> None:
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        self._worker_snapshot(os.getppid(), route_hits=2, busy=1, last_run=50)
+        self._worker_snapshot(exited.pid, route_hits=5, busy=4, last_run=90)
+        self.requests.inc(route='/a')
+        self.latency.observe(0.2)
+        self.busy.set(1)
+        self.last_run.set(70)
+
+        for _ in range(2):
+            text = self.registry.render()
+            self.assertIn('demo_total{route="/a"} 8', text)
+            self.assertIn('demo_seconds_count 8', text)
+            self.assertIn('demo_busy 2', text)
+            self.assertIn('demo_last_run 90', text)
+        self.assertFalse(any(name.startswith(f'{exited.pid}-') for name in os.listdir(self.directory)))
+
+    def test_enabling_drops_values_recorded_before_the_fork(self) -> None:
+        self.requests.inc(route='/warmup')
+        self._worker_snapshot(os.getppid(), route_hits=3, busy=0, last_run=0)
+        self.registry.enable_multiprocess(self.directory)
+        self.assertNotIn('demo_total{', self.registry.render())
+
+
+class TestAgentMetrics(unittest.TestCase):
+    def test_tool_outcomes_and_latency_are_recorded(self) -> None:
+        agent = QuantumMindAgent()
+        agent.tool_configs = {
+            'fake_tool': {
+                'label': 'Fake',
+                'handler': lambda query: [],
+                'formatter': lambda results: None,
+            },
+        }
+        agent.tools_enabled = {'fake_tool': True}
+        before_calls = metrics.TOOL_CALLS.value(tool='fake_tool', outcome='no_data')
+        before_timed = metrics.TOOL_SECONDS.count(tool='fake_tool')
+
+        with mock.patch.object(agent, '_assess_tool_query', return_value={'should_run': True}):
+            agent._maybe_search([{'role': 'user', 'content': 'bonjour'}])
+            agent.tool_configs['fake_tool']['handler'] = mock.Mock(side_effect=RuntimeError('down'))
+            with self.assertRaises(RuntimeError):
+                agent._maybe_search([{'role': 'user', 'content': 'bonjour'}])
+
+        self.assertEqual(metrics.TOOL_CALLS.value(tool='fake_tool', outcome='no_data'), before_calls + 1)
+        self.assertGreaterEqual(metrics.TOOL_CALLS.value(tool='fake_tool', outcome='error'), 1)
+        self.assertEqual(metrics.TOOL_SECONDS.count(tool='fake_tool'), before_timed + 2)
+
+    def test_gemini_usage_is_counted(self) -> None:
+        agent = QuantumMindAgent(model='test-model')
+        before = metrics.GEMINI_TOKENS.value(model='test-model', kind='completion')
+        usage = mock.Mock(prompt_token_count=12, candidates_token_count=30, total_token_count=42)
+        agent._record_token_usage(usage)
+        self.assertEqual(metrics.GEMINI_TOKENS.value(model='test-model', kind='completion'), before + 30)
+
+
+class TestMetricsEndpoint(RouteTestCase):
+    def test_scrape_exposes_route_cache_and_sqlite_metrics(self) -> None:
+        self.client.get('/api/conversations')
+        self.client.get(f'/api/history/{self.session_id}')
+        self.client.get(f'/api/history/{self.session_id}')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn(
+            'quantum_mind_http_request_duration_seconds_count'
+            '{method="GET",route="/api/history/<session_id>",status="200"}',
+            text,
+        )
+        self.assertIn('quantum_mind_cache_requests_total{cache="conversation_meta",result="hit"}', text)
+        self.assertIn('quantum_mind_sqlite_query_duration_seconds_count{operation="read_history",kind="read"}', text)
+        self.assertIn('quantum_mind_chat_admission{state="in_flight"} 0', text)
+        self.assertIn('quantum_mind_scheduler_leader', text)
+
+    def test_account_and_conversation_writes_are_timed(self) -> None:
+        self.client.put(f'/api/settings/{self.session_id}', json={'temperature': 0.2})
+        self.client.delete(f'/api/delete/{self.session_id}')
+
+        text = self.client.get('/metrics').get_data(as_text=True)
+        for operation in ('insert_user', 'create_conversation', 'update_conversation_settings',
+                          'delete_conversation'):
+            with self.subTest(operation=operation):
+                self.assertIn(
+                    f'quantum_mind_sqlite_query_duration_seconds_count{{operation="{operation}",kind="write"}}',
+                    text,
+                )
+
+    def test_record_job_run_tracks_success_and_failure(self) -> None:
+        metrics.record_job_run('demo-job', time.perf_counter())
+        metrics.record_job_run('demo-job', time.perf_counter(), error='boom')
+        text = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('quantum_mind_scheduler_runs_total{job="demo-job",status="ok"} 1', text)
+        self.assertIn('quantum_mind_scheduler_runs_total{job="demo-job",status="error"} 1', text)
+        self.assertIn('quantum_mind_scheduler_last_success_timestamp_seconds{job="demo-job"}', text)
+
+    def test_token_protects_endpoint(self) -> None:
+        with mock.patch.object(metrics, 'METRICS_TOKEN', 's3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+            self.assertEqual(response.status_code, 200)
+
+    def test_latency_percentiles_are_served_behind_the_metrics_token(self) -> None:
+        database.record_turn_latency(self.session_id, 'gemini-pro', {'total': 1.5})
+        self.assertEqual(self.client.get('/api/latency').status_code, 404)
+
+        with mock.patch.object(metrics, 'METRICS_TOKEN', 's3cret'):
+            self.assertEqual(self.client.get('/metrics/latency').status_code, 401)
+            response = self.client.get(
+                '/metrics/latency?group_by=all', headers={'Authorization': 'Bearer s3cret'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['groups'][0]['count'], 1)
+        self.assertEqual(self.client.get('/metrics/latency?metric=nope').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
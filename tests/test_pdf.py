@@ -0,0 +1,110 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app import database, pdf
+
+from tests.test_routes import RouteTestCase
+
+
+def fake_render(user_name, stats, messages, timestamped=True):
+    body = '|'.join(message['content'] for message in messages)
+    return f'%PDF-fake {user_name} {stats["total_messages"]} {os.getpid()} {body}'.encode('utf-8')
+
+
+def slow_render(user_name, stats, messages, timestamped=True):
+    time.sleep(2)
+    return b'%PDF-slow'
+
+
+class TestPdfCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.cache = pdf.PdfCache(self._tmpdir.name, max_bytes=1000)
+
+    def test_new_version_replaces_old_one(self) -> None:
+        self.cache.put('s1', 4, b'a' * 10)
+        self.cache.put('s1', 6, b'b' * 10)
+        self.assertIsNone(self.cache.get('s1', 4))
+        self.assertEqual(self.cache.get('s1', 6), b'b' * 10)
+
+    def test_least_recently_used_files_are_trimmed(self) -> None:
+        for idx, session_id in enumerate(('old', 'used', 'new')):
+            self.cache.put(session_id, 1, b'x' * 100)
+            os.utime(self.cache.path(session_id, 1), (1000 + idx, 1000 + idx))
+        self.cache.get('old', 1)
+        self.cache.max_bytes = 250
+        self.cache.trim()
+
+        self.assertIsNotNone(self.cache.get('old', 1))
+        self.assertIsNone(self.cache.get('used', 1))
+        self.assertLessEqual(self.cache.size(), 250)
+
+
+class TestPdfExport(RouteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._cache_dir.cleanup)
+        self.renderer = pdf.PdfRenderer(
+            max_workers=1, max_queue=0, cache=pdf.PdfCache(self._cache_dir.name), render_func=fake_render
+        )
+        self.addCleanup(self.renderer.shutdown)
+        patcher = mock.patch.object(pdf, '_renderer', self.renderer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        database.save_chat_turn(self.session_id, 'question', 'réponse')
+
+    def _export(self):
+        return self.client.get(f'/api/export/{self.session_id}/pdf')
+
+    def test_render_runs_in_another_process_and_is_cached(self) -> None:
+        first = self._export()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.mimetype, 'application/pdf')
+        self.assertTrue(first.data.startswith(b'%PDF-fake alice 2 '))
+        self.assertNotEqual(first.data.split()[3], str(os.getpid()).encode())
+
+        self.assertEqual(self._export().data, first.data)
+        self.assertEqual(self.renderer.renders, 1)
+
+    def test_new_message_invalidates_the_cached_file(self) -> None:
+        self._export()
+        database.save_chat_turn(self.session_id, 'encore', 'une réponse')
+        self.assertIn('une réponse'.encode('utf-8'), self._export().data)
+        self.assertEqual(self.renderer.renders, 2)
+        self.assertEqual(len(os.listdir(self._cache_dir.name)), 1)
+
+    def test_delete_removes_cached_file(self) -> None:
+        self._export()
+        self.client.delete(f'/api/delete/{self.session_id}')
+        self.assertEqual(os.listdir(self._cache_dir.name), [])
+
+    def test_busy_pool_returns_503(self) -> None:
+        self.renderer.render_func = slow_render
+        self.renderer.timeout = 0.1
+        response = self._export()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_timed_out_render_keeps_its_slot_until_the_worker_ends(self) -> None:
+        self.renderer.render_func = slow_render
+        self.renderer.timeout = 0.1
+        self.assertEqual(self._export().status_code, 503)
+        # The worker is still busy: a second render must not start
+        with self.assertRaises(pdf.PdfQueueFull):
+            self.renderer.render(self.session_id, 'alice')
+        self.assertTrue(self.renderer._slots.acquire(timeout=30))
+        self.renderer._slots.release()
+
+    def test_missing_reportlab_is_reported(self) -> None:
+        self.renderer.render_func = pdf.render_pdf
+        with mock.patch.object(pdf, 'REPORTLAB_AVAILABLE', False):
+            self.assertEqual(self._export().status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
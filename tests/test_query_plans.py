@@ -0,0 +1,137 @@
+"""Query-plan regression tests for the chat database.
+
+Each test runs a real helper from app.database, captures the SQL it sends
+through the connection trace callback and checks ``EXPLAIN QUERY PLAN`` for
+that exact statement, so a rewritten query or a dropped index shows up here.
+"""
+
+import os
+import re
+import tempfile
+import unittest
+from typing import Callable, Dict, List
+from unittest import mock
+
+from app import database
+
+FULL_SCAN = re.compile(r'^SCAN (messages|conversations|statistics|users)\b')
+
+
+class TestQueryPlans(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self._tmpdir.name, 'plans.db')
+        database.init_database()
+
+        for user_id in (1, 2):
+            for idx in range(3):
+                session_id = f'u{user_id}-s{idx}'
+                database.create_conversation(user_id, f'user{user_id}', session_id)
+                for turn in range(4):
+                    database.save_message(session_id, 'user', f'question {turn}', 2)
+                    database.save_message(session_id, 'assistant', f'answer {turn}', 2)
+
+    def tearDown(self) -> None:
+        database.close_db_connection()
+        database.DB_PATH = self._original_path
+        self._tmpdir.cleanup()
+
+    def _plans_for(self, func: Callable, *args) -> Dict[str, List[str]]:
+        conn = database.get_db_connection()
+        statements: List[str] = []
+        conn.set_trace_callback(statements.append)
+        try:
+            func(*args)
+        finally:
+            conn.set_trace_callback(None)
+
+        plans: Dict[str, List[str]] = {}
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                continue
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            plans[sql] = [row['detail'] for row in rows]
+        self.assertTrue(plans, 'no statement captured')
+        return plans
+
+    def assertNoFullScan(self, plans: Dict[str, List[str]]) -> None:
+        for sql, details in plans.items():
+            for detail in details:
+                self.assertIsNone(FULL_SCAN.match(detail), f'{detail!r} in plan for: {sql.strip()}')
+
+    def assertUsesIndex(self, plans: Dict[str, List[str]], index_name: str) -> None:
+        used = any(index_name in detail for details in plans.values() for detail in details)
+        self.assertTrue(used, f'{index_name} not used: {plans}')
+
+    def test_schema_version_is_current(self) -> None:
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+
+    def test_migrations_are_idempotent(self) -> None:
+        self.assertEqual(database.apply_migrations(), database.SCHEMA_VERSION)
+        database.init_database()
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+
+    def test_migration_applied_by_another_process_is_skipped(self) -> None:
+        # This process read the version before another one migrated the file
+        real_version = database.get_schema_version
+        stale = iter([database.SCHEMA_VERSION - 2])
+
+        def version(conn=None):
+            return next(stale, None) or real_version(conn)
+
+        with mock.patch.object(database, 'get_schema_version', side_effect=version):
+            self.assertEqual(database.apply_migrations(), database.SCHEMA_VERSION)
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+
+    def test_conversation_history_uses_session_index(self) -> None:
+        plans = self._plans_for(database.get_conversation_history, 'u1-s0')
+        self.assertNoFullScan(plans)
+        self.assertUsesIndex(plans, 'idx_messages_session_timestamp')
+        for details in plans.values():
+            self.assertFalse(any('TEMP B-TREE' in detail for detail in details), details)
+
+    def test_paginated_history_uses_keyset_index(self) -> None:
+        plans = self._plans_for(database.get_conversation_history, 'u1-s0', 10**6, 5)
+        self.assertNoFullScan(plans)
+        self.assertUsesIndex(plans, 'idx_messages_session_id')
+        for details in plans.values():
+            self.assertFalse(any('TEMP B-TREE' in detail for detail in details), details)
+
+    def test_all_conversations_uses_user_index(self) -> None:
+        plans = self._plans_for(database.get_all_conversations, 1)
+        self.assertNoFullScan(plans)
+        self.assertUsesIndex(plans, 'idx_conversations_user_updated')
+        for details in plans.values():
+            self.assertFalse(any('TEMP B-TREE' in detail for detail in details), details)
+
+    def test_statistics_is_a_single_row_lookup(self) -> None:
+        plans = self._plans_for(database.get_statistics, 'u1-s0')
+        self.assertNoFullScan(plans)
+        self.assertUsesIndex(plans, 'ux_statistics_session')
+        self.assertFalse(any(re.search(r'\bFROM messages\b', sql) for sql in plans), plans)
+
+    def test_delete_conversation_avoids_full_scans(self) -> None:
+        plans = self._plans_for(database.delete_conversation, 'u2-s2')
+        self.assertNoFullScan(plans)
+        self.assertUsesIndex(plans, 'ux_statistics_session')
+
+    def test_save_message_avoids_full_scans(self) -> None:
+        self.assertNoFullScan(self._plans_for(database.save_message, 'u1-s1', 'user', 'hi', 1))
+
+    def test_search_uses_fts_index(self) -> None:
+        plans = self._plans_for(database.search_conversations, 1, 'answer')
+        self.assertNoFullScan(plans)
+        self.assertTrue(
+            any('VIRTUAL TABLE' in detail for details in plans.values() for detail in details),
+            plans,
+        )
+
+    def test_conversation_lookup_avoids_full_scans(self) -> None:
+        self.assertNoFullScan(self._plans_for(database.get_conversation_by_id, 'u1-s1'))
+        database.invalidate_conversation_cache()
+        self.assertNoFullScan(self._plans_for(database.get_conversation_meta, 'u1-s1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
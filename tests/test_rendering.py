@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+import unittest
+from unittest import mock
+
+from app import database, rendering
+
+from tests.test_routes import RouteTestCase
+
+TABLE = '| Modèle | Score |\n|---|---|\n| A | 9.1 |\n\n[lien](https://example.org)'
+
+
+class TestRenderMarkdown(unittest.TestCase):
+    def setUp(self) -> None:
+        rendering.clear_render_cache()
+
+    def test_extra_syntax_is_rendered(self) -> None:
+        html = rendering.render_markdown(TABLE)
+        self.assertIn('<table>', html)
+        self.assertIn('<a href="https://example.org">lien</a>', html)
+
+    def test_repeat_content_is_served_from_the_cache(self) -> None:
+        first = rendering.render_markdown(TABLE)
+        with mock.patch.object(rendering, '_get_markdown') as get_markdown:
+            self.assertEqual(rendering.render_markdown(TABLE), first)
+        get_markdown.assert_not_called()
+
+    def test_converter_state_does_not_leak_between_documents(self) -> None:
+        rendering.render_markdown('Texte[^1]\n\n[^1]: note de bas de page')
+        self.assertNotIn('footnote', rendering.render_markdown('Sans note'))
+
+    def test_each_thread_uses_its_own_converter(self) -> None:
+        converters = []
+
+        def work() -> None:
+            converters.append(rendering._get_markdown())
+
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsNot(converters[0], converters[1])
+        self.assertIs(rendering._get_markdown(), rendering._get_markdown())
+
+    def test_cache_is_bounded_in_bytes(self) -> None:
+        size = len(rendering.render_markdown('# Titre 0').encode('utf-8'))
+        rendering.clear_render_cache()
+        with mock.patch.object(rendering, 'RENDER_CACHE_MAX_BYTES', size * 3):
+            for idx in range(5):
+                rendering.render_markdown(f'# Titre {idx}')
+            self.assertEqual(len(rendering._cache), 3)
+            self.assertEqual(rendering._cache_bytes, size * 3)
+
+            # One large document evicts several small ones; a too large one is not kept
+            rendering.render_markdown('# ' + 'x' * (size * 2 - 20))
+            self.assertLessEqual(rendering._cache_bytes, size * 3)
+            self.assertLess(len(rendering._cache), 3)
+            rendering.render_markdown('y' * size * 4)
+            self.assertLessEqual(rendering._cache_bytes, size * 3)
+
+
+class TestStoredHtml(RouteTestCase):
+    def test_chat_reply_is_stored_with_its_html(self) -> None:
+        response = self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'})
+        reply = response.get_json()
+        self.assertEqual(reply['html'], rendering.render_markdown(reply['message']))
+
+        history = self.client.get(f'/api/history/{self.session_id}').get_json()['messages']
+        self.assertIsNone(history[0]['html'])
+        self.assertEqual(history[1]['html'], reply['html'])
+
+        with mock.patch.object(rendering, 'render_markdown') as render:
+            self.client.get(f'/api/history/{self.session_id}?limit=10')
+        render.assert_not_called()
+
+    def test_messages_without_stored_html_are_rendered_on_read(self) -> None:
+        database.save_chat_turn(self.session_id, 'question', TABLE)
+        history = self.client.get(f'/api/history/{self.session_id}').get_json()['messages']
+        self.assertIn('<table>', history[1]['html'])
+
+        stored = database.get_conversation_history(self.session_id, with_html=True)
+        self.assertEqual(stored[1]['html'], history[1]['html'])
+        with mock.patch.object(rendering, 'render_markdown') as render:
+            self.client.get(f'/api/history/{self.session_id}?limit=10')
+        render.assert_not_called()
+
+    def test_failed_html_write_still_serves_the_html(self) -> None:
+        database.save_chat_turn(self.session_id, 'question', TABLE)
+        with mock.patch.object(database, 'run_write', side_effect=sqlite3.OperationalError('database is locked')), \
+                self.assertLogs('app.database', 'WARNING'):
+            history = self.client.get(f'/api/history/{self.session_id}').get_json()['messages']
+        self.assertIn('<table>', history[1]['html'])
+        self.assertIsNone(database.get_conversation_history(self.session_id, with_html=True)[1]['html'])
+
+
+if __name__ == '__main__':
+    unittest.main()
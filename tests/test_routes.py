@@ -0,0 +1,455 @@
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app import admission, database, jobs, routes
+from app.agent import QuantumMindAgent
+
+
+class RouteTestCase(unittest.TestCase):
+    """Flask test client logged in as a fresh user on a throwaway database."""
+
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self._tmpdir.name, 'routes.db')
+        database.init_database()
+        database.invalidate_conversation_cache()
+
+        from app.server import build_app
+
+        self.app = build_app()
+        self.client = self.app.test_client()
+        credentials = {'username': 'alice', 'password': 'secret1'}
+        self.client.post('/api/register', json=credentials)
+        self.client.post('/api/login', json=credentials)
+        self.session_id = self.client.post('/api/conversations', json={}).get_json()['session_id']
+
+    def tearDown(self) -> None:
+        database.invalidate_conversation_cache()
+        database.close_db_connection()
+        database.DB_PATH = self._original_path
+        self._tmpdir.cleanup()
+
+
+class TestConditionalGet(RouteTestCase):
+    def _revalidate(self, url: str):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.headers['ETag'].startswith('W/'))
+        return first, self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    def test_unchanged_resources_return_304(self) -> None:
+        for url in (
+            '/api/conversations',
+            f'/api/history/{self.session_id}',
+            f'/api/history/{self.session_id}?limit=10',
+            f'/api/statistics/{self.session_id}',
+            '/api/mt-bench/local-mirror',
+        ):
+            with self.subTest(url=url):
+                first, second = self._revalidate(url)
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second.data, b'')
+                self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_mt_bench_etag_follows_the_data_not_the_process(self) -> None:
+        agent = QuantumMindAgent()
+        etag, payload = routes._build_mt_bench_mirror(agent)
+        self.assertEqual(routes._build_mt_bench_mirror(agent), (etag, payload))
+
+        edited = [dict(entry) for entry in agent.CURATED_MT_BENCH]
+        edited[0]['mt_bench'] = 1.0
+        with mock.patch.object(agent, 'CURATED_MT_BENCH', edited):
+            self.assertNotEqual(routes._build_mt_bench_mirror(agent)[0], etag)
+
+    def test_new_message_changes_history_and_statistics_etags(self) -> None:
+        urls = [f'/api/history/{self.session_id}', f'/api/statistics/{self.session_id}']
+        etags = {url: self.client.get(url).headers['ETag'] for url in urls}
+
+        database.save_chat_turn(self.session_id, 'question', 'answer')
+
+        for url in urls:
+            response = self.client.get(url, headers={'If-None-Match': etags[url]})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etags[url])
+
+    def test_conversation_list_etag_follows_changes(self) -> None:
+        etag = self.client.get('/api/conversations').headers['ETag']
+        self.client.post('/api/conversations', json={})
+        response = self.client.get('/api/conversations', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['count'], 2)
+
+    def test_settings_change_within_the_same_second_changes_the_list_etag(self) -> None:
+        etag = self.client.get('/api/conversations').headers['ETag']
+        self.client.put(f'/api/settings/{self.session_id}', json={'temperature': 0.9})
+        response = self.client.get('/api/conversations', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['conversations'][0]['temperature'], 0.9)
+
+    def test_history_pages_have_distinct_etags(self) -> None:
+        first = self.client.get(f'/api/history/{self.session_id}?limit=5').headers['ETag']
+        second = self.client.get(f'/api/history/{self.session_id}?limit=6').headers['ETag']
+        self.assertNotEqual(first, second)
+
+
+class TestCompression(RouteTestCase):
+    def test_large_json_is_gzipped_when_accepted(self) -> None:
+        for idx in range(10):
+            database.save_chat_turn(self.session_id, f'question {idx}', 'réponse ' * 100)
+        url = f'/api/history/{self.session_id}'
+
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+        compressed = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+
+    def test_small_responses_are_left_alone(self) -> None:
+        response = self.client.get('/api/check-auth', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_markdown_export_is_compressed(self) -> None:
+        database.save_chat_turn(self.session_id, 'question', 'réponse ' * 300)
+        response = self.client.get(
+            f'/api/export/{self.session_id}/markdown', headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('réponse', gzip.decompress(response.data).decode('utf-8'))
+
+
+class TestStreamingExport(RouteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for idx in range(30):
+            database.save_chat_turn(self.session_id, f'question {idx}', f'réponse "{idx}"\nsuite')
+
+    def test_json_export_streams_the_whole_conversation(self) -> None:
+        response = self.client.get(f'/api/export/{self.session_id}/json')
+        self.assertTrue(response.is_streamed)
+        document = json.loads(response.get_data(as_text=True))
+        self.assertEqual(document['messages'], database.get_conversation_history(self.session_id))
+        self.assertEqual(document['metadata']['statistics']['total_messages'], 60)
+
+    def test_markdown_export_starts_with_the_header(self) -> None:
+        response = self.client.get(f'/api/export/{self.session_id}/markdown')
+        chunks = [chunk.decode('utf-8') for chunk in response.iter_encoded()]
+        self.assertTrue(chunks[0].startswith('# Conversation - QUANTUM MIND'))
+        self.assertNotIn('question 0', chunks[0])
+        body = ''.join(chunks)
+        self.assertEqual(body.count('### 👤 **You**'), 30)
+        self.assertIn('réponse "29"', body)
+
+    def test_streamed_export_is_gzipped_incrementally(self) -> None:
+        response = self.client.get(
+            f'/api/export/{self.session_id}/json', headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        document = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(document['messages']), 60)
+
+
+class TestChatJobs(RouteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.pool = jobs.ChatJobPool(max_workers=1, max_queue=1)
+        for target, attribute, value in (
+            (jobs, '_job_pool', self.pool),
+            (admission, '_controller', admission.AdmissionController(max_per_user=10)),
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+
+    def tearDown(self) -> None:
+        # Jobs write to the database: let them finish before DB_PATH is restored
+        self.release.set()
+        self.pool.shutdown(wait=True)
+        super().tearDown()
+
+    def _submit(self, message: str = 'bonjour'):
+        return self.client.post(f'/api/chat/{self.session_id}', json={'message': message, 'async': True})
+
+    def test_job_runs_in_background_and_returns_result(self) -> None:
+        response = self._submit()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+
+        self.pool.wait(job_id, 10)
+        job = self.client.get(f'/api/jobs/{job_id}').get_json()
+        self.assertEqual(job['status'], 'done')
+        self.assertTrue(job['result']['message'])
+        self.assertEqual(len(database.get_conversation_history(self.session_id)), 2)
+
+    def test_event_stream_ends_with_final_status(self) -> None:
+        job_id = self._submit().get_json()['job_id']
+        response = self.client.get(f'/api/jobs/{job_id}/events')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertIn('event: done', body)
+
+    def test_failed_turn_is_reported(self) -> None:
+        with mock.patch.object(jobs, 'run_chat_turn', side_effect=jobs.ChatTurnError('boom')):
+            job_id = self._submit().get_json()['job_id']
+            self.pool.wait(job_id, 10)
+        job = self.client.get(f'/api/jobs/{job_id}').get_json()
+        self.assertEqual((job['status'], job['error']), ('error', 'boom'))
+
+    def test_full_queue_is_rejected(self) -> None:
+        with mock.patch.object(jobs, 'run_chat_turn', side_effect=lambda *args: self.release.wait(10) and {}):
+            self.assertEqual(self._submit().status_code, 202)
+            self.assertEqual(self._submit().status_code, 202)
+            rejected = self._submit()
+            self.release.set()
+            self.pool.shutdown(wait=True)
+        self.assertEqual(rejected.status_code, 503)
+        self.assertIn('Retry-After', rejected.headers)
+
+    def test_failed_submission_releases_the_admission_slot(self) -> None:
+        with mock.patch.object(jobs, 'create_chat_job', side_effect=sqlite3.OperationalError('disk I/O error')):
+            with self.assertRaises(sqlite3.OperationalError):
+                self._submit()
+        self.assertEqual(admission.get_admission_controller().stats()['in_flight'], 0)
+
+    def test_jobs_are_private(self) -> None:
+        job_id = self._submit().get_json()['job_id']
+        self.pool.wait(job_id, 10)
+        other = self.app.test_client()
+        credentials = {'username': 'bob', 'password': 'secret2'}
+        other.post('/api/register', json=credentials)
+        other.post('/api/login', json=credentials)
+        self.assertEqual(other.get(f'/api/jobs/{job_id}').status_code, 404)
+
+
+class TestChatBatch(RouteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.object(admission, '_controller', admission.AdmissionController())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _batch(self, prompts, session_id=None):
+        return self.client.post(
+            '/api/chat/batch', json={'session_id': session_id or self.session_id, 'prompts': prompts}
+        )
+
+    def _lines(self, response):
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        response.close()
+        return lines
+
+    def test_results_stream_as_ndjson_with_per_item_errors(self) -> None:
+        response = self._batch(['bonjour', '', 'merci', 'au revoir'])
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = self._lines(response)
+
+        items, summary = lines[:-1], lines[-1]
+        self.assertEqual(sorted(item['index'] for item in items), [0, 1, 2, 3])
+        by_index = {item['index']: item for item in items}
+        self.assertEqual(by_index[1]['status'], 'error')
+        self.assertTrue(all(by_index[idx]['message'] for idx in (0, 2, 3)))
+        self.assertEqual((summary['done'], summary['count'], summary['errors']), (True, 4, 1))
+        self.assertEqual(len(database.get_conversation_history(self.session_id)), 6)
+        self.assertEqual(admission.get_admission_controller().stats()['in_flight'], 0)
+
+    def test_failing_prompt_does_not_abort_the_batch(self) -> None:
+        original = jobs.run_chat_turn
+
+        def flaky(session_id, message, *args):
+            if message == 'boom':
+                raise jobs.ChatTurnError('upstream down')
+            return original(session_id, message, *args)
+
+        with mock.patch.object(jobs, 'run_chat_turn', side_effect=flaky):
+            lines = self._lines(self._batch(['un', 'boom', 'deux']))
+        failed = [line for line in lines if line.get('status') == 'error']
+        self.assertEqual(failed, [{'index': 1, 'status': 'error', 'error': 'upstream down'}])
+        self.assertEqual(lines[-1]['errors'], 1)
+
+    def test_prompts_share_the_context_snapshot(self) -> None:
+        database.save_chat_turn(self.session_id, 'contexte', 'réponse')
+        seen = []
+
+        def record(session_id, message, conversation, context_size, history):
+            seen.append(len(history))
+            return {'message': message, 'html': None, 'tokens_used': 1}
+
+        with mock.patch.object(jobs, 'run_chat_turn', side_effect=record):
+            self._lines(self._batch(['a', 'b', 'c']))
+        self.assertEqual(seen, [2, 2, 2])
+
+    def test_items_hold_admission_slots_within_the_user_limit(self) -> None:
+        controller = admission.AdmissionController(max_in_flight=16, max_per_user=2)
+        peaks = []
+        lock = threading.Lock()
+
+        def record(session_id, message, *args):
+            with lock:
+                peaks.append(controller.stats()['in_flight'])
+            time.sleep(0.02)
+            return {'message': message, 'html': None, 'tokens_used': 1}
+
+        with mock.patch.object(admission, '_controller', controller), \
+                mock.patch.object(jobs, 'run_chat_turn', side_effect=record):
+            lines = self._lines(self._batch(['a', 'b', 'c', 'd', 'e', 'f']))
+        self.assertEqual(lines[-1]['errors'], 0)
+        self.assertEqual(len(peaks), 6)
+        self.assertTrue(all(1 <= peak <= 2 for peak in peaks))
+        self.assertEqual(controller.stats()['in_flight'], 0)
+
+    def test_batch_is_rejected_when_the_user_is_at_the_limit(self) -> None:
+        controller = admission.get_admission_controller()
+        with self.client.session_transaction() as session:
+            user_id = session['user_id']
+        for _ in range(controller.max_per_user):
+            controller.acquire(user_id)
+        try:
+            self.assertEqual(self._batch(['a']).status_code, 429)
+        finally:
+            for _ in range(controller.max_per_user):
+                controller.release(user_id)
+
+    def test_invalid_batches_are_rejected(self) -> None:
+        self.assertEqual(self._batch([]).status_code, 400)
+        with mock.patch('app.routes.CHAT_BATCH_MAX_PROMPTS', 2):
+            self.assertEqual(self._batch(['a', 'b', 'c']).status_code, 400)
+        self.assertEqual(self._batch(['a'], session_id='unknown').status_code, 404)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def test_per_user_limit_rejects_immediately(self) -> None:
+        controller = admission.AdmissionController(max_in_flight=10, max_per_user=1)
+        controller.acquire('alice')
+        with self.assertRaises(admission.AdmissionRejected) as ctx:
+            controller.acquire('alice')
+        self.assertEqual(ctx.exception.reason, 'user_limit')
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        controller.acquire('bob')
+
+    def test_queued_request_gets_released_slot(self) -> None:
+        controller = admission.AdmissionController(max_in_flight=1, max_per_user=1, max_queue=1)
+        controller.acquire('alice')
+        admitted = threading.Event()
+
+        def waiter() -> None:
+            controller.acquire('bob', timeout=5)
+            admitted.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        while controller.stats()['queued'] == 0:
+            threading.Event().wait(0.01)
+        with self.assertRaises(admission.AdmissionRejected) as ctx:
+            controller.acquire('carol')
+        self.assertEqual(ctx.exception.reason, 'queue_full')
+
+        controller.release('alice', duration=1.0)
+        thread.join(5)
+        self.assertTrue(admitted.is_set())
+        stats = controller.stats()
+        self.assertEqual((stats['in_flight'], stats['queued'], stats['max_queued_seen']), (1, 0, 1))
+
+    def test_wait_times_out(self) -> None:
+        controller = admission.AdmissionController(max_in_flight=1, max_per_user=1, max_queue=4)
+        controller.acquire('alice')
+        with self.assertRaises(admission.AdmissionRejected) as ctx:
+            controller.acquire('bob', timeout=0.05)
+        self.assertEqual(ctx.exception.reason, 'timeout')
+        self.assertEqual(controller.stats()['rejected']['timeout'], 1)
+
+
+class TestChatAdmission(RouteTestCase):
+    def test_overflow_returns_429_with_retry_after(self) -> None:
+        controller = admission.AdmissionController(max_in_flight=4, max_per_user=1)
+        controller.acquire(1)
+        with mock.patch.object(admission, '_controller', controller):
+            response = self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'})
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response.headers)
+
+            controller.release(1)
+            self.assertEqual(
+                self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'}).status_code, 200
+            )
+            stats = self.client.get('/api/admission').get_json()
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['rejected']['user_limit'], 1)
+
+    def test_conversation_deleted_by_another_process_returns_404(self) -> None:
+        database.get_conversation_meta(self.session_id)
+        with database.get_db_connection() as conn:
+            conn.execute('DELETE FROM conversations WHERE session_id = ?', (self.session_id,))
+        response = self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(database.get_conversation_history(self.session_id), [])
+        self.assertEqual(admission.get_admission_controller().stats()['in_flight'], 0)
+
+
+class TestStaticShell(unittest.TestCase):
+    def setUp(self) -> None:
+        from app.server import build_app
+        from config.config import ProductionConfig
+
+        self.client = build_app(ProductionConfig).test_client()
+
+    def test_shell_is_precompressed_with_content_hash(self) -> None:
+        plain = self.client.get('/')
+        compressed = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertEqual(compressed.headers['ETag'], plain.headers['ETag'])
+        self.assertIn('max-age=', compressed.headers['Cache-Control'])
+
+    def test_repeat_visit_gets_304(self) -> None:
+        etag = self.client.get('/').headers['ETag']
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def _asset_urls(self):
+        return re.findall(r'/static/[^"]+', self.client.get('/').get_data(as_text=True))
+
+    def test_shell_links_fingerprinted_assets(self) -> None:
+        urls = self._asset_urls()
+        self.assertEqual(len(urls), 2)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertRegex(url, r'\.[0-9a-f]{12}\.(css|js)$')
+                response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                self.assertIn('immutable', response.headers['Cache-Control'])
+
+    def test_fingerprint_follows_content(self) -> None:
+        from app.compression import StaticAssets
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'app.css')
+            with open(path, 'w', encoding='utf-8') as handle:
+                handle.write('body { color: red; }')
+            first = StaticAssets(tmpdir).url('app.css')
+            with open(path, 'w', encoding='utf-8') as handle:
+                handle.write('body { color: blue; }')
+            self.assertNotEqual(StaticAssets(tmpdir).url('app.css'), first)
+
+    def test_unversioned_and_unknown_assets(self) -> None:
+        self.assertEqual(self.client.get('/static/js/app.js').headers['Cache-Control'], 'no-cache')
+        self.assertEqual(self.client.get('/static/js/app.000000000000.js').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
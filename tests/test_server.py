@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from app import database, server
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ('google.generativeai', 'markdown', 'reportlab')
+IMPORT_APP = (
+    'import sys; from app.server import build_app; build_app(); '
+    f'print([name for name in {HEAVY_MODULES!r} if name in sys.modules])'
+)
+
+TRY_LOCK = 'import sys; from app import server; print(server.try_acquire_leader_lock(sys.argv[1]))'
+
+
+class TestLeaderElection(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.lock_path = os.path.join(self._tmpdir.name, 'scheduler.lock')
+
+    def tearDown(self) -> None:
+        if server._leader_lock_file is not None:
+            server._leader_lock_file.close()
+            server._leader_lock_file = None
+        self._tmpdir.cleanup()
+
+    def _other_process_wins(self) -> bool:
+        result = subprocess.run(
+            [sys.executable, '-c', TRY_LOCK, self.lock_path],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        return result.stdout.strip() == 'True'
+
+    def test_only_one_process_is_leader(self) -> None:
+        self.assertTrue(server.try_acquire_leader_lock(self.lock_path))
+        self.assertTrue(server.try_acquire_leader_lock(self.lock_path))
+        self.assertFalse(self._other_process_wins())
+
+    def test_lock_is_released_with_its_owner(self) -> None:
+        self.assertTrue(self._other_process_wins())
+        self.assertTrue(server.try_acquire_leader_lock(self.lock_path))
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self._tmpdir.name, 'warmup.db')
+
+    def tearDown(self) -> None:
+        database.close_db_connection()
+        database.DB_PATH = self._original_path
+        self._tmpdir.cleanup()
+
+    def test_warmup_prepares_schema_and_releases_connection(self) -> None:
+        app = server.build_app()
+        self.assertIn('api', app.blueprints)
+
+        server.warmup(app, refresh_mt_bench=False)
+
+        self.assertIsNone(getattr(database._local, 'conn', None))
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+
+    def test_current_schema_is_not_initialized_again(self) -> None:
+        database.init_database()
+        with mock.patch.object(database, '_create_tables') as create_tables, \
+                mock.patch.object(database, 'apply_migrations') as apply_migrations:
+            database.init_database()
+        create_tables.assert_not_called()
+        apply_migrations.assert_not_called()
+
+
+class TestStartup(unittest.TestCase):
+    def test_building_the_app_skips_heavy_imports_and_the_database(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'startup.db')
+            result = subprocess.run(
+                [sys.executable, '-c', IMPORT_APP],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+                env=dict(os.environ, DATABASE_PATH=db_path),
+            )
+            self.assertEqual(result.stdout.strip(), '[]')
+            self.assertFalse(os.path.exists(db_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+
+from app import database, routes, tokens
+
+from tests.test_routes import RouteTestCase
+
+CREDENTIALS = {'username': 'alice', 'password': 'secret1'}
+
+
+SECRET = 'f' * 64
+
+
+class TokenTestCase(RouteTestCase):
+    def setUp(self) -> None:
+        for attribute, value in (('AUTH_TOKENS', True), ('AUTH_TOKEN_SECRET', SECRET)):
+            patcher = mock.patch.object(tokens, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        super().setUp()
+        self.tokens = self.client.post('/api/login', json=CREDENTIALS).get_json()
+        # No session cookie: every request below authenticates with its header only
+        self.bearer = self.app.test_client()
+
+    def _get(self, url, token):
+        return self.bearer.get(url, headers={'Authorization': f'Bearer {token}'})
+
+
+class TestAccessTokens(TokenTestCase):
+    def test_login_returns_a_token_pair(self) -> None:
+        self.assertEqual(self.tokens['token_type'], 'Bearer')
+        self.assertEqual(self.tokens['expires_in'], tokens.ACCESS_TOKEN_TTL)
+        self.assertNotEqual(self.tokens['access_token'], self.tokens['refresh_token'])
+
+    def test_access_token_authenticates_without_a_session(self) -> None:
+        self.assertEqual(self.bearer.get('/api/conversations').status_code, 401)
+        response = self._get('/api/conversations', self.tokens['access_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['count'], 1)
+
+        check = self._get('/api/check-auth', self.tokens['access_token']).get_json()
+        self.assertEqual(check['username'], 'alice')
+
+    def test_user_route_is_served_from_the_token(self) -> None:
+        with mock.patch.object(routes, 'get_user_by_id') as get_user_by_id:
+            user = self._get('/api/user', self.tokens['access_token']).get_json()
+        get_user_by_id.assert_not_called()
+        self.assertEqual(user['username'], 'alice')
+        self.assertIsNotNone(user['created_at'])
+
+    def test_invalid_tokens_are_rejected(self) -> None:
+        access = self.tokens['access_token']
+        tampered = access[:-4] + ('AAAA' if not access.endswith('AAAA') else 'BBBB')
+        for token in (tampered, self.tokens['refresh_token'], 'not-a-token'):
+            with self.subTest(token=token[:16]):
+                self.assertEqual(self._get('/api/conversations', token).status_code, 401)
+
+    def test_expired_token_is_rejected(self) -> None:
+        with mock.patch.object(tokens, 'ACCESS_TOKEN_TTL', -60):
+            expired = self.client.post('/api/login', json=CREDENTIALS).get_json()['access_token']
+        self.assertEqual(self._get('/api/conversations', expired).status_code, 401)
+
+    def test_other_secret_is_rejected(self) -> None:
+        with mock.patch.object(tokens, 'AUTH_TOKEN_SECRET', 'another-node-secret-of-sufficient-length'):
+            self.assertEqual(self._get('/api/conversations', self.tokens['access_token']).status_code, 401)
+
+
+class TestRefresh(TokenTestCase):
+    def test_refresh_issues_a_new_pair(self) -> None:
+        response = self.bearer.post('/api/token/refresh', json={'refresh_token': self.tokens['refresh_token']})
+        self.assertEqual(response.status_code, 200)
+        refreshed = response.get_json()
+        self.assertNotEqual(refreshed['access_token'], self.tokens['access_token'])
+        self.assertEqual(self._get('/api/conversations', refreshed['access_token']).status_code, 200)
+
+    def test_access_token_cannot_refresh(self) -> None:
+        response = self.bearer.post('/api/token/refresh', json={'refresh_token': self.tokens['access_token']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_cannot_refresh(self) -> None:
+        with database.get_db_connection() as conn:
+            conn.execute('DELETE FROM conversations')
+            conn.execute('DELETE FROM users')
+        response = self.bearer.post('/api/token/refresh', json={'refresh_token': self.tokens['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+
+
+class TestSigningSecret(unittest.TestCase):
+    def _check(self, secret_key, token_secret=''):
+        app = mock.Mock(config={'SECRET_KEY': secret_key})
+        with mock.patch.multiple(tokens, AUTH_TOKENS=True, AUTH_TOKEN_SECRET=token_secret):
+            tokens.check_secret(app)
+
+    def test_token_mode_refuses_weak_secrets(self) -> None:
+        for secret_key in ('dev-secret-key-change-in-production', 'your-secret-key-here-change-in-production',
+                           'short', ''):
+            with self.subTest(secret_key=secret_key), self.assertRaises(RuntimeError):
+                self._check(secret_key)
+
+    def test_strong_secret_is_accepted(self) -> None:
+        self._check('dev-secret-key-change-in-production', token_secret=SECRET)
+        self._check(SECRET)
+
+    def test_app_does_not_start_without_a_secret(self) -> None:
+        from app.server import build_app
+
+        with mock.patch.multiple(tokens, AUTH_TOKENS=True, AUTH_TOKEN_SECRET=''), \
+                self.assertRaises(RuntimeError):
+            build_app()
+
+    def test_session_mode_needs_no_secret(self) -> None:
+        with mock.patch.object(tokens, 'AUTH_TOKENS', False):
+            tokens.check_secret(mock.Mock(config={'SECRET_KEY': ''}))
+
+
+class TestTokensDisabled(RouteTestCase):
+    def test_session_only_mode(self) -> None:
+        login = self.client.post('/api/login', json=CREDENTIALS).get_json()
+        self.assertNotIn('access_token', login)
+        self.assertEqual(self.client.post('/api/token/refresh', json={}).status_code, 404)
+
+        with mock.patch.object(tokens, 'AUTH_TOKENS', True):
+            token = self.client.post('/api/login', json=CREDENTIALS).get_json()['access_token']
+        response = self.app.test_client().get('/api/conversations', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
-from app.agent import QuantumMindAgent
+from app.agent import QuantumMindAgent, ToolLookupScope, use_lookup_scope
 
 
 class TestToolSelectionStrategy(unittest.TestCase):
@@ -52,5 +54,60 @@ class TestToolSelectionStrategy(unittest.TestCase):
             self.assertIn(assessment['reason'], {'cooldown_override', 'recent_repeat_allowed'})
 
 
+class TestToolLookupScope(unittest.TestCase):
+    @patch('app.agent.requests.get')
+    def test_identical_lookups_are_fetched_once(self, mock_get: Mock) -> None:
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return Mock(status_code=200)
+
+        mock_get.side_effect = slow_get
+        agent = QuantumMindAgent()
+        scope = ToolLookupScope()
+        responses = []
+
+        def lookup(terms: str) -> None:
+            with use_lookup_scope(scope):
+                responses.append(agent._http_get('https://example.org/api', params={'q': terms}, timeout=5))
+
+        threads = [threading.Thread(target=lookup, args=(terms,)) for terms in ('llm', 'llm', 'llm', 'rag')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual((scope.requested, scope.deduplicated), (4, 2))
+        self.assertEqual(len({id(response) for response in responses}), 2)
+
+    @patch('app.agent.requests.get')
+    def test_lookups_outside_a_scope_are_not_shared(self, mock_get: Mock) -> None:
+        agent = QuantumMindAgent()
+        agent._http_get('https://example.org/api', params={'q': 'llm'})
+        agent._http_get('https://example.org/api', params={'q': 'llm'})
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_failures_reach_every_waiter(self) -> None:
+        scope = ToolLookupScope()
+        with self.assertRaises(RuntimeError):
+            scope.fetch('key', Mock(side_effect=RuntimeError('down')))
+        loader = Mock()
+        with self.assertRaises(RuntimeError):
+            scope.fetch('key', loader)
+        loader.assert_not_called()
+
+    def test_cooldown_is_ignored_inside_a_scope(self) -> None:
+        agent = QuantumMindAgent()
+        agent.tool_configs = {'fake': {'label': 'Fake', 'handler': Mock(return_value=[1]),
+                                       'formatter': Mock(return_value='ok')}}
+        agent.tools_enabled = {'fake': True}
+        with patch.object(agent, '_assess_tool_query', return_value={
+            'should_run': True, 'strong_hits': set(), 'weak_hits': set(),
+        }) as assess:
+            with use_lookup_scope(ToolLookupScope()):
+                agent._maybe_search([{'role': 'user', 'content': 'question'}])
+        self.assertFalse(assess.call_args.kwargs['consider_cooldown'])
+
+
 if __name__ == '__main__':
     unittest.main()
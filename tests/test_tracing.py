@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app import admission, jobs, tracing
+
+from tests.test_routes import RouteTestCase
+
+
+class _CollectingExporter:
+    def __init__(self) -> None:
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span) -> None:
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.exporter = _CollectingExporter()
+        patcher = mock.patch.object(tracing, '_exporter', self.exporter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def by_name(self):
+        return {span['name']: span for span in self.exporter.spans}
+
+
+class TestSpans(TracingTestCase):
+    def test_children_share_trace_and_link_to_parent(self) -> None:
+        with tracing.start_trace('root', sample_rate=1, user=1) as root:
+            with tracing.span('child', step='a') as child:
+                child.set('rows', 3)
+                with tracing.span('grandchild'):
+                    pass
+
+        spans = self.by_name()
+        self.assertEqual(set(spans), {'root', 'child', 'grandchild'})
+        self.assertEqual({span['trace_id'] for span in spans.values()}, {root.trace_id})
+        self.assertIsNone(spans['root']['parent_id'])
+        self.assertEqual(spans['child']['parent_id'], spans['root']['span_id'])
+        self.assertEqual(spans['grandchild']['parent_id'], spans['child']['span_id'])
+        self.assertEqual(spans['child']['attributes'], {'step': 'a', 'rows': 3})
+
+    def test_unsampled_trace_records_nothing(self) -> None:
+        with tracing.start_trace('root', sample_rate=0) as root:
+            with tracing.span('child') as child:
+                child.set('ignored', True)
+        self.assertFalse(root.sampled)
+        self.assertTrue(root.trace_id)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_spans_outside_a_trace_are_noops(self) -> None:
+        with tracing.span('orphan') as orphan:
+            self.assertFalse(orphan.sampled)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_errors_are_marked_and_propagated(self) -> None:
+        with self.assertRaises(ValueError):
+            with tracing.start_trace('root', sample_rate=1):
+                with tracing.span('failing'):
+                    raise ValueError('boom')
+        spans = self.by_name()
+        self.assertEqual(spans['failing']['status'], 'error')
+        self.assertEqual(spans['failing']['attributes']['error'], 'ValueError')
+        self.assertEqual(spans['root']['status'], 'error')
+
+    def test_context_can_be_attached_on_another_thread(self) -> None:
+        with tracing.start_trace('root', sample_rate=1) as root:
+            context = tracing.current_context()
+
+            def work() -> None:
+                with tracing.attach(context), tracing.span('background'):
+                    pass
+
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(self.by_name()['background']['parent_id'], root.span_id)
+
+
+class TestJsonLinesExporter(unittest.TestCase):
+    def test_spans_are_appended_as_json_lines(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exporter = tracing.JsonLinesExporter(os.path.join(tmpdir, 'traces', 'spans.jsonl'))
+            with mock.patch.object(tracing, '_exporter', exporter):
+                with tracing.start_trace('root', sample_rate=1):
+                    with tracing.span('child'):
+                        pass
+            exporter.close()
+
+            with open(exporter.path, encoding='utf-8') as handle:
+                lines = [json.loads(line) for line in handle]
+        self.assertEqual([line['name'] for line in lines], ['child', 'root'])
+        self.assertGreaterEqual(lines[1]['duration_ms'], lines[0]['duration_ms'])
+
+
+class TestChatTracing(RouteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.exporter = _CollectingExporter()
+        for attribute, value in (('_exporter', self.exporter), ('TRACE_SAMPLE_RATE', 1.0)):
+            patcher = mock.patch.object(tracing, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_chat_turn_is_traced_through_agent_and_database(self) -> None:
+        response = self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'})
+        self.assertEqual(response.status_code, 200)
+        trace_id = response.headers['X-Trace-Id']
+
+        names = {span['name'] for span in self.exporter.spans if span['trace_id'] == trace_id}
+        self.assertTrue({'chat', 'agent.chat', 'agent.tools', 'sqlite.read', 'sqlite.write'} <= names)
+        writes = [span for span in self.exporter.spans if span['name'] == 'sqlite.write']
+        self.assertIn('write_chat_turn', {span['attributes']['operation'] for span in writes})
+
+    def test_chat_job_continues_the_request_trace(self) -> None:
+        pool = jobs.ChatJobPool(max_workers=1, max_queue=1)
+        self.addCleanup(pool.shutdown)
+        with mock.patch.object(jobs, '_job_pool', pool), \
+                mock.patch.object(admission, '_controller', admission.AdmissionController()):
+            response = self.client.post(
+                f'/api/chat/{self.session_id}', json={'message': 'bonjour', 'async': True}
+            )
+            pool.wait(response.get_json()['job_id'], 10)
+            pool.shutdown()
+
+        job_spans = [span for span in self.exporter.spans if span['name'] == 'chat.job']
+        self.assertEqual(len(job_spans), 1)
+        self.assertEqual(job_spans[0]['trace_id'], response.headers['X-Trace-Id'])
+
+    def test_streamed_batch_continues_the_request_trace(self) -> None:
+        with mock.patch.object(admission, '_controller', admission.AdmissionController()):
+            response = self.client.post(
+                '/api/chat/batch', json={'session_id': self.session_id, 'prompts': ['un', 'deux']}
+            )
+            response.get_data()
+            response.close()
+        trace_id = response.headers['X-Trace-Id']
+
+        names = [span['name'] for span in self.exporter.spans if span['trace_id'] == trace_id]
+        self.assertEqual(names.count('chat.batch_item'), 2)
+        self.assertTrue({'chat.batch', 'agent.chat', 'sqlite.write'} <= set(names))
+
+    def test_unsampled_chat_has_no_trace_header(self) -> None:
+        with mock.patch.object(tracing, 'TRACE_SAMPLE_RATE', 0.0):
+            response = self.client.post(f'/api/chat/{self.session_id}', json={'message': 'bonjour'})
+        self.assertNotIn('X-Trace-Id', response.headers)
+        self.assertEqual(self.exporter.spans, [])
+
+
+if __name__ == '__main__':
+    unittest.main()